@@ -7,9 +7,12 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 import os
-import time
 from utils.data_generator import DataGenerator
 from utils.data_manager import DataManager
+from utils.downsampling import downsample, decimate
+from utils.segments import state_runs
+from utils.scheduler import DataRefreshScheduler
+from utils.anomalies import ANOMALY_TYPES
 
 # Configuration de la page
 st.set_page_config(
@@ -311,8 +314,45 @@ def init_data_manager():
     return DataManager()
 
 # Initialisation sans cache pour le générateur (pour avoir les nouvelles méthodes)
-data_generator = DataGenerator()
 data_manager = init_data_manager()
+data_generator = DataGenerator(storage=data_manager.storage)
+
+@st.cache_resource
+def init_scheduler():
+    scheduler = DataRefreshScheduler(
+        data_manager,
+        DataGenerator(storage=data_manager.storage),
+        data_manager.config.get('refresh_interval_seconds', 60)
+    )
+    scheduler.start()
+    return scheduler
+
+def live_window(hours_back, incremental=False):
+    """Fenêtre glissante des données du suivi instantané, conservée en session.
+
+    En mode incrémental, seules les lignes postérieures au dernier horodatage affiché sont lues
+    et ajoutées à la fenêtre, dont on retire les lignes sorties de la période.
+    """
+    cutoff_time = datetime.now() - timedelta(hours=hours_back)
+    window = st.session_state.get('suivi_fenetre')
+    if incremental and window is not None and window['hours_back'] == hours_back and len(window['data']) > 0:
+        data = window['data']
+        nouvelles_donnees = data_manager.load_data_since(data['timestamp'].iloc[-1])
+        if len(nouvelles_donnees) > 0:
+            data = pd.concat([data, nouvelles_donnees], ignore_index=True)
+        debut = data['timestamp'].searchsorted(cutoff_time)
+        if debut > 0:
+            data = data.iloc[debut:].reset_index(drop=True)
+    else:
+        data = data_manager.load_data(start=cutoff_time)
+    st.session_state['suivi_fenetre'] = {'hours_back': hours_back, 'data': data}
+    return data.copy(deep=False)
+
+def scatter_trace(n_points):
+    """Classe de trace Plotly: rendu WebGL (Scattergl) au-delà du seuil de points configuré"""
+    if n_points > data_manager.config.get('seuil_webgl_points', 5000):
+        return go.Scattergl
+    return go.Scatter
 
 import os
 import base64
@@ -365,17 +405,22 @@ if st.sidebar.button("⚙️ Configuration"):
 # Récupère la page actuelle
 page = st.session_state.page
 
-# Génération et mise à jour des données
-if not os.path.exists("data/machine_data.csv"):
+# Mise à jour des données et détection des arrêts en arrière-plan (un seul thread par processus):
+# les pages lisent l'instantané publié sans attendre la génération ni les lectures disque.
+# Les écritures de l'interface passent par scheduler.run_exclusive pour ne pas chevaucher un cycle.
+scheduler = init_scheduler()
+
+# Génération des données initiales (premier lancement uniquement; sans effet si le
+# planificateur les a déjà générées)
+if not data_manager.storage.exists():
     with st.spinner("Génération des données initiales..."):
-        data_generator.generate_initial_data()
-else:
-    # Mise à jour automatique des données jusqu'au moment présent
-    with st.spinner("Mise à jour des données..."):
-        data_generator.update_to_current_time()
+        scheduler.run_exclusive(data_generator.update_to_current_time)
+        data_manager.refresh_snapshot()
+if scheduler.status['last_run'] is not None:
+    st.sidebar.caption(f"🔄 Données mises à jour à {scheduler.status['last_run'].strftime('%H:%M:%S')}")
 
-# Chargement des données
-df = data_manager.load_data()
+# Résumé des données (lu dans les métadonnées, sans charger l'historique)
+data_summary = data_manager.get_data_summary()
 
 # PAGE 1: SUIVI INSTANTANÉ AMÉLIORÉ
 if page == "📊 Suivi Instantané":
@@ -401,17 +446,17 @@ if page == "📊 Suivi Instantané":
     with col4:
         real_time = st.checkbox("Temps réel", value=True)
     
-    # Données récentes
+    # Données récentes (seules les partitions de la période sont lues)
     cutoff_time = datetime.now() - timedelta(hours=hours_back)
-    recent_data = df[pd.to_datetime(df['timestamp']) >= cutoff_time].copy()
+    recent_data = live_window(hours_back)
 
     # Debug: affichage des informations sur les données
-    if len(df) > 0:
-        first_timestamp = pd.to_datetime(df['timestamp']).min()
-        last_timestamp = pd.to_datetime(df['timestamp']).max()
+    if data_summary['rows'] > 0:
+        first_timestamp = data_summary['first']
+        last_timestamp = data_summary['last']
         st.sidebar.markdown(f"""
         **📊 Informations sur les données:**
-        - Total: {len(df)} enregistrements
+        - Total: {data_summary['rows']} enregistrements
         - Première donnée: {first_timestamp.strftime('%Y-%m-%d %H:%M')}
         - Dernière donnée: {last_timestamp.strftime('%Y-%m-%d %H:%M')}
         - Période demandée: {hours_back}h (depuis {cutoff_time.strftime('%Y-%m-%d %H:%M')})
@@ -425,23 +470,15 @@ if page == "📊 Suivi Instantané":
         # Bouton pour forcer la génération de nouvelles données
         if st.button("🔄 Générer de nouvelles données"):
             with st.spinner("Génération de nouvelles données..."):
-                data_generator.generate_additional_data(hours=hours_back + 1)
+                scheduler.run_exclusive(data_generator.generate_additional_data, hours=hours_back + 1)
+                data_manager.refresh_snapshot()
                 st.rerun()
         st.stop()
     
-    # État actuel
-    current_state = recent_data.iloc[-1]
-    
-    # Calcul des métriques
+    # Paramètres partagés par les sections temps réel et le reste de la page
     vibration_threshold = data_manager.config.get('seuil_vibration_alerte', 2.0)
-    max_vibration = max(current_state['vibration_x'], current_state['vibration_y'], current_state['vibration_z'])
-    
-    # Métriques principales avec design moderne
-    st.markdown("### 📊 Métriques Principales")
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    # État machine avec indicateur animé
+    max_points_graphique = data_manager.config.get('max_points_graphique', 1000)
+
     status_colors = {
         'en_marche': '#28a745',
         'panne': '#dc3545', 
@@ -455,318 +492,332 @@ if page == "📊 Suivi Instantané":
         'arret_production': 'Arrêt Production', 
         'probleme_qualite': 'Problème Qualité'
     }
+
+    # Sections temps réel (métriques, timeline, vibrations): avec l'auto-refresh, ce fragment est
+    # réexécuté seul à chaque intervalle et ne lit que les lignes postérieures au dernier affichage
+    refresh_interval = data_manager.config.get('refresh_interval_seconds', 60)
+
+    @st.fragment(run_every=refresh_interval if auto_refresh else None)
+    def live_sections():
+        # État actuel
+        recent_data = live_window(hours_back, incremental=True)
+        if len(recent_data) == 0:
+            return
+        current_state = recent_data.iloc[-1]
     
-    current_status = current_state['etat_machine']
-    status_color = status_colors.get(current_status, '#6c757d')
+        # Métriques principales avec design moderne
+        st.markdown("### 📊 Métriques Principales")
     
-    with col1:
-        card_class = "metric-card-green" if current_status == 'en_marche' else "metric-card-red" if current_status == 'panne' else "metric-card-blue"
-        st.markdown(f"""
-        <div class="metric-card {card_class}">
-            <div class="metric-label">État Machine</div>
-            <div class="metric-value">
-                <span class="status-indicator" style="background-color: {status_color};"></span>
-                {status_labels.get(current_status, 'Inconnu')}
+        col1, col2, col3, col4 = st.columns(4)
+    
+        # État machine avec indicateur animé
+        current_status = current_state['etat_machine']
+        status_color = status_colors.get(current_status, '#6c757d')
+    
+        with col1:
+            card_class = "metric-card-green" if current_status == 'en_marche' else "metric-card-red" if current_status == 'panne' else "metric-card-blue"
+            st.markdown(f"""
+            <div class="metric-card {card_class}">
+                <div class="metric-label">État Machine</div>
+                <div class="metric-value">
+                    <span class="status-indicator" style="background-color: {status_color};"></span>
+                    {status_labels.get(current_status, 'Inconnu')}
+                </div>
             </div>
-        </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
     
-    with col2:
-        delta_x = current_state['vibration_x'] - recent_data['vibration_x'].mean()
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Vibration X</div>
-            <div class="metric-value">{current_state['vibration_x']:.2f}</div>
-            <div class="metric-delta">mm/s (Δ {delta_x:+.2f})</div>
-        </div>
-        """, unsafe_allow_html=True)
+        with col2:
+            delta_x = current_state['vibration_x'] - recent_data['vibration_x'].mean()
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-label">Vibration X</div>
+                <div class="metric-value">{current_state['vibration_x']:.2f}</div>
+                <div class="metric-delta">mm/s (Δ {delta_x:+.2f})</div>
+            </div>
+            """, unsafe_allow_html=True)
     
-    with col3:
-        delta_y = current_state['vibration_y'] - recent_data['vibration_y'].mean()
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Vibration Y</div>
-            <div class="metric-value">{current_state['vibration_y']:.2f}</div>
-            <div class="metric-delta">mm/s (Δ {delta_y:+.2f})</div>
-        </div>
-        """, unsafe_allow_html=True)
+        with col3:
+            delta_y = current_state['vibration_y'] - recent_data['vibration_y'].mean()
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-label">Vibration Y</div>
+                <div class="metric-value">{current_state['vibration_y']:.2f}</div>
+                <div class="metric-delta">mm/s (Δ {delta_y:+.2f})</div>
+            </div>
+            """, unsafe_allow_html=True)
     
-    with col4:
-        delta_z = current_state['vibration_z'] - recent_data['vibration_z'].mean()
-        st.markdown(f"""
-        <div class="metric-card">
-            <div class="metric-label">Vibration Z</div>
-            <div class="metric-value">{current_state['vibration_z']:.2f}</div>
-            <div class="metric-delta">mm/s (Δ {delta_z:+.2f})</div>
-        </div>
-        """, unsafe_allow_html=True)
+        with col4:
+            delta_z = current_state['vibration_z'] - recent_data['vibration_z'].mean()
+            st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-label">Vibration Z</div>
+                <div class="metric-value">{current_state['vibration_z']:.2f}</div>
+                <div class="metric-delta">mm/s (Δ {delta_z:+.2f})</div>
+            </div>
+            """, unsafe_allow_html=True)
     
     
-    # Graphique Timeline des États de la Machine
-    st.markdown("### 🕒 Timeline des États de la Machine")
+        # Graphique Timeline des États de la Machine
+        st.markdown("### 🕒 Timeline des États de la Machine")
+
+        # Création du graphique timeline avec barres colorées
+        fig_timeline = go.Figure()
 
-    # Création du graphique timeline avec barres colorées
-    fig_timeline = go.Figure()
+        # Couleurs cohérentes pour chaque état
+        state_colors = {
+            'en_marche': '#28a745',        # 🟢 Vert pour "En Marche" (Processing)
+            'panne': '#dc3545',            # 🔴 Rouge pour "Panne" (Error)
+            'arret_production': '#fd7e14', # 🟠 Orange pour "Arrêt Production" (Changeover)
+            'probleme_qualite': '#6c757d'  # ⚪ Gris pour "Problème Qualité" (Idle)
+        }
 
-    # Préparation des données pour la timeline
-    timeline_data = recent_data.copy()
-    timeline_data['timestamp_dt'] = pd.to_datetime(timeline_data['timestamp'])
-    timeline_data = timeline_data.sort_values('timestamp_dt').reset_index(drop=True)
+        # Segments d'états consécutifs calculés en une passe
+        segments = state_runs(recent_data['etat_machine'], recent_data['timestamp'])
 
-    # Couleurs cohérentes pour chaque état
-    state_colors = {
-        'en_marche': '#28a745',        # 🟢 Vert pour "En Marche" (Processing)
-        'panne': '#dc3545',            # 🔴 Rouge pour "Panne" (Error)
-        'arret_production': '#fd7e14', # 🟠 Orange pour "Arrêt Production" (Changeover)
-        'probleme_qualite': '#6c757d'  # ⚪ Gris pour "Problème Qualité" (Idle)
-    }
+        # Une seule trace par état: les rectangles de tous ses segments sont séparés par des None
+        for state, state_segments in segments.groupby('state', sort=False):
+            n_segments = len(state_segments)
+            starts = np.asarray(state_segments['start'].dt.to_pydatetime())
+            ends = np.asarray(state_segments['end'].dt.to_pydatetime())
 
-    # Utilisation d'un graphique en barres horizontales (Gantt-like)
-    if len(timeline_data) > 0:
-        # Grouper les données par état consécutif
-        timeline_data['state_group'] = (timeline_data['etat_machine'] != timeline_data['etat_machine'].shift()).cumsum()
-
-        # Créer les segments pour chaque groupe d'état
-        segments = []
-        for group_id, group_data in timeline_data.groupby('state_group'):
-            start_time = group_data['timestamp_dt'].min()
-            end_time = group_data['timestamp_dt'].max()
-            state = group_data['etat_machine'].iloc[0]
-
-            # Calculer la durée en minutes
-            duration = (end_time - start_time).total_seconds() / 60
-            if duration == 0:  # Si même timestamp, donner une durée minimale
-                duration = 1
-
-            segments.append({
-                'start': start_time,
-                'end': end_time,
-                'state': state,
-                'duration': duration
-            })
+            x = np.empty(6 * n_segments, dtype=object)
+            for offset, values in enumerate([starts, ends, ends, starts, starts, None]):
+                x[offset::6] = values
+            y = np.tile([0, 0, 1, 1, 0, None], n_segments)
 
-        # Créer les barres pour chaque segment
-        for i, segment in enumerate(segments):
-            state = segment['state']
-            start_time = segment['start']
-            end_time = segment['end']
-            duration = segment['duration']
+            # Informations du segment répétées sur chacun de ses sommets pour le survol
+            details = np.column_stack([
+                state_segments['start'].dt.strftime("%H:%M:%S"),
+                state_segments['end'].dt.strftime("%H:%M:%S"),
+                state_segments['duration'].round(1)
+            ])
+            customdata = np.repeat(details, 6, axis=0)
 
-            # Utiliser un scatter avec des marqueurs rectangulaires
             fig_timeline.add_trace(go.Scatter(
-                x=[start_time, end_time, end_time, start_time, start_time],
-                y=[0, 0, 1, 1, 0],
+                x=x,
+                y=y,
                 fill='toself',
                 fillcolor=state_colors.get(state, '#6c757d'),
                 line=dict(color='white', width=2),
+                mode='lines',
                 name=status_labels.get(state, state),
+                customdata=customdata,
                 hovertemplate=(
                     f'<b>{status_labels.get(state, state)}</b><br>'
-                    f'Début: {start_time.strftime("%H:%M:%S")}<br>'
-                    f'Fin: {end_time.strftime("%H:%M:%S")}<br>'
-                    f'Durée: {duration:.1f} min<br>'
+                    'Début: %{customdata[0]}<br>'
+                    'Fin: %{customdata[1]}<br>'
+                    'Durée: %{customdata[2]} min<br>'
                     '<extra></extra>'
-                ),
-                showlegend=True if i == 0 or segments[i-1]['state'] != state else False
+                )
             ))
 
-    # Configuration du layout
-    fig_timeline.update_layout(
-        height=150,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        xaxis=dict(
-            gridcolor='rgba(255,255,255,0.1)',
-            title="Temps",
-            showgrid=True,
-            type='date'
-        ),
-        yaxis=dict(
-            showgrid=False,
-            showticklabels=False,
-            title="",
-            range=[-0.1, 1.1],
-            fixedrange=True
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="center",
-            x=0.5
-        ),
-        margin=dict(l=0, r=0, t=40, b=60),
-        hovermode='closest'
-    )
-
-    # Affichage dans Streamlit
-    st.plotly_chart(fig_timeline, use_container_width=True)
-
-    st.markdown("### 📈 Évolution des Vibrations en Temps Réel")
-
-    # Graphique des vibrations avec style moderne
-    fig_vibrations = go.Figure()
-
-    # Ajout des courbes avec style amélioré
-    fig_vibrations.add_trace(go.Scatter(
-        x=recent_data['timestamp'],
-        y=recent_data['vibration_x'],
-        name='Vibration X',
-        line=dict(color='#ff6b6b', width=3),
-        fill='tonexty' if len(fig_vibrations.data) > 0 else None,
-        fillcolor='rgba(255, 107, 107, 0.1)'
-    ))
-
-    fig_vibrations.add_trace(go.Scatter(
-        x=recent_data['timestamp'],
-        y=recent_data['vibration_y'],
-        name='Vibration Y',
-        line=dict(color='#4ecdc4', width=3),
-        fill='tonexty',
-        fillcolor='rgba(78, 205, 196, 0.1)'
-    ))
-
-    fig_vibrations.add_trace(go.Scatter(
-        x=recent_data['timestamp'],
-        y=recent_data['vibration_z'],
-        name='Vibration Z',
-        line=dict(color='#45b7d1', width=3),
-        fill='tonexty',
-        fillcolor='rgba(69, 183, 209, 0.1)'
-    ))
+        # Configuration du layout
+        fig_timeline.update_layout(
+            height=150,
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'),
+            xaxis=dict(
+                gridcolor='rgba(255,255,255,0.1)',
+                title="Temps",
+                showgrid=True,
+                type='date'
+            ),
+            yaxis=dict(
+                showgrid=False,
+                showticklabels=False,
+                title="",
+                range=[-0.1, 1.1],
+                fixedrange=True
+            ),
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="center",
+                x=0.5
+            ),
+            margin=dict(l=0, r=0, t=40, b=60),
+            hovermode='closest'
+        )
 
-    # Ligne de seuil
-    fig_vibrations.add_hline(
-        y=vibration_threshold,
-        line_dash="dash",
-        line_color="orange",
-        line_width=2,
-        annotation_text=f"Seuil d'alerte ({vibration_threshold} mm/s)"
-    )
+        # Affichage dans Streamlit
+        st.plotly_chart(fig_timeline, use_container_width=True)
 
-    # Style du graphique
-    fig_vibrations.update_layout(
-        height=400,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        xaxis=dict(
-            gridcolor='rgba(255,255,255,0.1)',
-            title="Temps"
-        ),
-        yaxis=dict(
-            gridcolor='rgba(255,255,255,0.1)',
-            title="Vibration (mm/s)"
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
-    )
+        st.markdown("### 📈 Évolution des Vibrations en Temps Réel")
 
-    st.plotly_chart(fig_vibrations, use_container_width=True)
+        # Sous-échantillonnage côté serveur (LTTB): forme des courbes conservée, pics au-dessus
+        # du seuil d'alerte toujours affichés
+        series_vibration = {
+            axis: downsample(recent_data['timestamp'], recent_data[axis], max_points_graphique,
+                             threshold=vibration_threshold)
+            for axis in ['vibration_x', 'vibration_y', 'vibration_z']
+        }
 
-    # Graphiques individuels des vibrations en colonnes
-    col1, col2, col3 = st.columns(3)
+        # Graphique des vibrations avec style moderne
+        fig_vibrations = go.Figure()
 
-    with col1:
-        st.markdown("#### 📊 Vibration X")
-        fig_x = go.Figure()
-        fig_x.add_trace(go.Scatter(
-            x=recent_data['timestamp'],
-            y=recent_data['vibration_x'],
+        # Ajout des courbes avec style amélioré
+        fig_vibrations.add_trace(go.Scatter(
+            x=series_vibration['vibration_x'][0],
+            y=series_vibration['vibration_x'][1],
             name='Vibration X',
             line=dict(color='#ff6b6b', width=3),
-            fill='tonexty',
+            fill='tonexty' if len(fig_vibrations.data) > 0 else None,
             fillcolor='rgba(255, 107, 107, 0.1)'
         ))
-        fig_x.add_hline(
-            y=vibration_threshold,
-            line_dash="dash",
-            line_color="orange",
-            line_width=2,
-            annotation_text=f"Seuil ({vibration_threshold} mm/s)"
-        )
-        fig_x.update_layout(
-            height=300,
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white'),
-            xaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Temps"),
-            yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Vibration (mm/s)"),
-            showlegend=False,
-            margin=dict(l=0, r=0, t=0, b=0)
-        )
-        st.plotly_chart(fig_x, use_container_width=True)
 
-    with col2:
-        st.markdown("#### 📊 Vibration Y")
-        fig_y = go.Figure()
-        fig_y.add_trace(go.Scatter(
-            x=recent_data['timestamp'],
-            y=recent_data['vibration_y'],
+        fig_vibrations.add_trace(go.Scatter(
+            x=series_vibration['vibration_y'][0],
+            y=series_vibration['vibration_y'][1],
             name='Vibration Y',
             line=dict(color='#4ecdc4', width=3),
             fill='tonexty',
             fillcolor='rgba(78, 205, 196, 0.1)'
         ))
-        fig_y.add_hline(
-            y=vibration_threshold,
-            line_dash="dash",
-            line_color="orange",
-            line_width=2,
-            annotation_text=f"Seuil ({vibration_threshold} mm/s)"
-        )
-        fig_y.update_layout(
-            height=300,
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='white'),
-            xaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Temps"),
-            yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Vibration (mm/s)"),
-            showlegend=False,
-            margin=dict(l=0, r=0, t=0, b=0)
-        )
-        st.plotly_chart(fig_y, use_container_width=True)
 
-    with col3:
-        st.markdown("#### 📊 Vibration Z")
-        fig_z = go.Figure()
-        fig_z.add_trace(go.Scatter(
-            x=recent_data['timestamp'],
-            y=recent_data['vibration_z'],
+        fig_vibrations.add_trace(go.Scatter(
+            x=series_vibration['vibration_z'][0],
+            y=series_vibration['vibration_z'][1],
             name='Vibration Z',
             line=dict(color='#45b7d1', width=3),
             fill='tonexty',
             fillcolor='rgba(69, 183, 209, 0.1)'
         ))
-        fig_z.add_hline(
+
+        # Ligne de seuil
+        fig_vibrations.add_hline(
             y=vibration_threshold,
             line_dash="dash",
             line_color="orange",
             line_width=2,
-            annotation_text=f"Seuil ({vibration_threshold} mm/s)"
+            annotation_text=f"Seuil d'alerte ({vibration_threshold} mm/s)"
         )
-        fig_z.update_layout(
-            height=300,
+
+        # Style du graphique
+        fig_vibrations.update_layout(
+            height=400,
             plot_bgcolor='rgba(0,0,0,0)',
             paper_bgcolor='rgba(0,0,0,0)',
             font=dict(color='white'),
-            xaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Temps"),
-            yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Vibration (mm/s)"),
-            showlegend=False,
-            margin=dict(l=0, r=0, t=0, b=0)
+            xaxis=dict(
+                gridcolor='rgba(255,255,255,0.1)',
+                title="Temps"
+            ),
+            yaxis=dict(
+                gridcolor='rgba(255,255,255,0.1)',
+                title="Vibration (mm/s)"
+            ),
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1
+            )
         )
-        st.plotly_chart(fig_z, use_container_width=True)
+
+        st.plotly_chart(fig_vibrations, use_container_width=True)
+
+        # Graphiques individuels des vibrations en colonnes
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.markdown("#### 📊 Vibration X")
+            fig_x = go.Figure()
+            fig_x.add_trace(go.Scatter(
+                x=series_vibration['vibration_x'][0],
+                y=series_vibration['vibration_x'][1],
+                name='Vibration X',
+                line=dict(color='#ff6b6b', width=3),
+                fill='tonexty',
+                fillcolor='rgba(255, 107, 107, 0.1)'
+            ))
+            fig_x.add_hline(
+                y=vibration_threshold,
+                line_dash="dash",
+                line_color="orange",
+                line_width=2,
+                annotation_text=f"Seuil ({vibration_threshold} mm/s)"
+            )
+            fig_x.update_layout(
+                height=300,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='white'),
+                xaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Temps"),
+                yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Vibration (mm/s)"),
+                showlegend=False,
+                margin=dict(l=0, r=0, t=0, b=0)
+            )
+            st.plotly_chart(fig_x, use_container_width=True)
+
+        with col2:
+            st.markdown("#### 📊 Vibration Y")
+            fig_y = go.Figure()
+            fig_y.add_trace(go.Scatter(
+                x=series_vibration['vibration_y'][0],
+                y=series_vibration['vibration_y'][1],
+                name='Vibration Y',
+                line=dict(color='#4ecdc4', width=3),
+                fill='tonexty',
+                fillcolor='rgba(78, 205, 196, 0.1)'
+            ))
+            fig_y.add_hline(
+                y=vibration_threshold,
+                line_dash="dash",
+                line_color="orange",
+                line_width=2,
+                annotation_text=f"Seuil ({vibration_threshold} mm/s)"
+            )
+            fig_y.update_layout(
+                height=300,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='white'),
+                xaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Temps"),
+                yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Vibration (mm/s)"),
+                showlegend=False,
+                margin=dict(l=0, r=0, t=0, b=0)
+            )
+            st.plotly_chart(fig_y, use_container_width=True)
+
+        with col3:
+            st.markdown("#### 📊 Vibration Z")
+            fig_z = go.Figure()
+            fig_z.add_trace(go.Scatter(
+                x=series_vibration['vibration_z'][0],
+                y=series_vibration['vibration_z'][1],
+                name='Vibration Z',
+                line=dict(color='#45b7d1', width=3),
+                fill='tonexty',
+                fillcolor='rgba(69, 183, 209, 0.1)'
+            ))
+            fig_z.add_hline(
+                y=vibration_threshold,
+                line_dash="dash",
+                line_color="orange",
+                line_width=2,
+                annotation_text=f"Seuil ({vibration_threshold} mm/s)"
+            )
+            fig_z.update_layout(
+                height=300,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='white'),
+                xaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Temps"),
+                yaxis=dict(gridcolor='rgba(255,255,255,0.1)', title="Vibration (mm/s)"),
+                showlegend=False,
+                margin=dict(l=0, r=0, t=0, b=0)
+            )
+            st.plotly_chart(fig_z, use_container_width=True)
+
+    live_sections()
 
     st.markdown("### 📊 Répartition des États")
 
     # Calcul du temps dans chaque état
-    state_duration = recent_data.groupby('etat_machine').size()
+    state_duration = recent_data.groupby('etat_machine', observed=True).size()
 
     # Graphique circulaire moderne (donut chart)
     fig_pie = go.Figure(data=[go.Pie(
@@ -835,11 +886,16 @@ if page == "📊 Suivi Instantané":
 
     # Graphique combiné avec zone remplie
     fig_trend = go.Figure()
+    x_totale, y_totale = downsample(recent_data['timestamp'], recent_data['vibration_totale'],
+                                    max_points_graphique, threshold=vibration_threshold)
+
+    # Rendu WebGL selon le nombre de points effectivement tracés (après sous-échantillonnage)
+    Trace = scatter_trace(len(x_totale))
 
     # Zone de vibration totale
-    fig_trend.add_trace(go.Scatter(
-        x=recent_data['timestamp'],
-        y=recent_data['vibration_totale'],
+    fig_trend.add_trace(Trace(
+        x=x_totale,
+        y=y_totale,
         fill='tozeroy',
         fillcolor='rgba(106, 90, 205, 0.3)',
         line=dict(color='rgba(106, 90, 205, 1)', width=3),
@@ -847,13 +903,13 @@ if page == "📊 Suivi Instantané":
         hovertemplate='<b>Vibration Totale</b><br>%{y:.2f} mm/s<br>%{x}<extra></extra>'
     ))
 
-    # Ligne de tendance
+    # Ligne de tendance (droite: ses deux extrémités suffisent)
     z = np.polyfit(range(len(recent_data)), recent_data['vibration_totale'], 1)
     p = np.poly1d(z)
-    trend_line = p(range(len(recent_data)))
+    trend_line = p([0, len(recent_data) - 1])
 
     fig_trend.add_trace(go.Scatter(
-        x=recent_data['timestamp'],
+        x=recent_data['timestamp'].iloc[[0, -1]],
         y=trend_line,
         line=dict(color='#ff6b6b', width=2, dash='dash'),
         name='Tendance',
@@ -928,11 +984,6 @@ if page == "📊 Suivi Instantané":
         health_color = "🟢" if health_score > 90 else "🟡" if health_score > 75 else "🔴"
         st.metric("Santé Globale", f"{health_color} {health_score:.1f}%")
 
-    # Auto-refresh
-    if auto_refresh:
-        import time
-        time.sleep(30)
-        st.rerun()
 
 # PAGE 2: SAISIE CAUSES D'ARRÊT
 elif page == "📝 Saisie Causes d'Arrêt":
@@ -1024,11 +1075,8 @@ elif page == "📝 Saisie Causes d'Arrêt":
     with tab2:
         st.subheader("📋 Derniers Arrêts Enregistrés")
         
-        # Chargement des arrêts
-        arrets_df = data_manager.load_arrets()
-        
-        if len(arrets_df) > 0:
-            # Filtres
+        if data_manager.count_arrets() > 0:
+            # Filtres (appliqués par la base de données)
             col_filter1, col_filter2, col_filter3 = st.columns(3)
             with col_filter1:
                 filtre_type = st.multiselect(
@@ -1039,7 +1087,7 @@ elif page == "📝 Saisie Causes d'Arrêt":
             with col_filter2:
                 filtre_operateur = st.multiselect(
                     "Filtrer par opérateur",
-                    arrets_df['operateur'].unique()
+                    data_manager.get_operateurs()
                 )
             with col_filter3:
                 filtre_urgence = st.multiselect(
@@ -1047,17 +1095,22 @@ elif page == "📝 Saisie Causes d'Arrêt":
                     data_manager.niveaux_urgence
                 )
             
-            # Application des filtres
-            arrets_filtered = arrets_df.copy()
-            if filtre_type:
-                arrets_filtered = arrets_filtered[arrets_filtered['type_arret'].isin(filtre_type)]
-            if filtre_operateur:
-                arrets_filtered = arrets_filtered[arrets_filtered['operateur'].isin(filtre_operateur)]
-            if filtre_urgence:
-                arrets_filtered = arrets_filtered[arrets_filtered['urgence'].isin(filtre_urgence)]
+            # Pagination: seule la page affichée est lue, avec le nombre total d'arrêts correspondants
+            taille_page = 10
+            filtres = dict(types=filtre_type, operateurs=filtre_operateur, urgences=filtre_urgence)
+            page_arrets = st.session_state.get('page_arrets_manuels', 1)
+            arrets_filtered, total_filtre = data_manager.get_arrets_page(page_arrets - 1, taille_page, **filtres)
+            nb_pages = max(1, (total_filtre + taille_page - 1) // taille_page)
+            if page_arrets > nb_pages:
+                # Les filtres ont réduit le nombre de pages: retour à la dernière page
+                page_arrets = nb_pages
+                arrets_filtered, total_filtre = data_manager.get_arrets_page(page_arrets - 1, taille_page, **filtres)
+            st.session_state['page_arrets_manuels'] = page_arrets
+            st.number_input("Page", min_value=1, max_value=nb_pages, step=1, key="page_arrets_manuels")
+            st.caption(f"{total_filtre} arrêts correspondants - page {page_arrets}/{nb_pages}")
             
             # Affichage des arrêts
-            for idx, arret in arrets_filtered.head(10).iterrows():
+            for idx, arret in arrets_filtered.iterrows():
                 type_info = data_manager.types_arrets.get(arret['type_arret'], {'color': '#666666', 'label': arret['type_arret'], 'icon': '●'})
                 color = type_info['color']
                 icon = type_info.get('icon', '●')
@@ -1243,8 +1296,8 @@ elif page == "🤖 Détection Automatique":
         st.markdown("### 📊 Statistiques")
         
         # Dernière vibration
-        if len(df) > 0:
-            last_row = df.iloc[-1]
+        if data_summary['rows'] > 0:
+            last_row = data_manager.load_data(start=data_summary['last']).iloc[-1]
             vibration_totale = np.sqrt(
                 last_row['vibration_x']**2 + 
                 last_row['vibration_y']**2 + 
@@ -1275,10 +1328,10 @@ elif page == "🤖 Détection Automatique":
             st.metric("Seuil de détection", f"{seuil:.3f} mm/s")
             
             # Derniers arrêts détectés
-            arrets_auto = data_manager.load_arrets_auto()
-            if len(arrets_auto) > 0:
-                st.metric("Arrêts détectés", len(arrets_auto))
-                st.metric("Arrêts non classifiés", len(data_manager.get_arrets_non_classifies()))
+            nb_arrets_auto = data_manager.count_arrets_auto()
+            if nb_arrets_auto > 0:
+                st.metric("Arrêts détectés", nb_arrets_auto)
+                st.metric("Arrêts non classifiés", data_manager.count_arrets_auto(classifie=False))
     
     # Bouton pour lancer la détection
     st.markdown("---")
@@ -1286,37 +1339,53 @@ elif page == "🤖 Détection Automatique":
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        if st.button("🔍 Analyser les Signaux de Vibration", use_container_width=True):
-            with st.spinner("Analyse des signaux de vibration en cours..."):
-                # Simulation de traitement
-                progress_bar = st.progress(0)
-                for i in range(101):
-                    time.sleep(0.01)
-                    progress_bar.progress(i)
-                
-                # Détection des arrêts
-                arrets_detectes = data_manager.detect_machine_stops(df)
-                
-                # Compteur d'arrêts ajoutés
-                arrets_ajoutes = 0
-                
-                # Sauvegarde des nouveaux arrêts détectés
-                for arret in arrets_detectes:
-                    arret['statut'] = 'detecte_auto'
-                    arret['classifie'] = False
-                    success = data_manager.save_arret_auto(arret)
-                    if success:
-                        arrets_ajoutes += 1
-                
-                st.success(f"✅ Analyse terminée: {len(arrets_detectes)} arrêts détectés, {arrets_ajoutes} nouveaux arrêts ajoutés!")
+        reanalyse = st.checkbox("Réanalyser tout l'historique", value=False,
+                                help="Par défaut, seuls les échantillons reçus depuis la dernière analyse sont traités")
+        job = data_manager.detection_job
+        if st.button("🔍 Analyser les Signaux de Vibration", use_container_width=True,
+                     disabled=job is not None and job.is_running()):
+            # Détection par blocs de temps en arrière-plan: la page reste utilisable pendant l'analyse
+            job = data_manager.start_detection_job(reanalyse=reanalyse)
+        job_en_cours = job is not None and job.is_running()
+        
+        # Suivi de la tâche: seul ce fragment est réexécuté chaque seconde pendant l'analyse
+        @st.fragment(run_every=1 if job_en_cours else None)
+        def detection_progress():
+            job = data_manager.detection_job
+            if job is None:
+                return
+            progress = job.get_progress()
+            if progress['status'] == 'en_cours':
+                st.progress(
+                    progress['fraction'],
+                    text=f"Analyse en cours: {progress['rows_processed']:,} échantillons traités, "
+                         f"{progress['stops_found']} arrêts trouvés "
+                         f"({progress['chunks_done']}/{progress['chunks_total']} blocs)"
+                )
+                if st.button("⏹️ Annuler l'analyse"):
+                    job.cancel()
+                return
+            
+            if job_en_cours:
+                # Analyse terminée depuis l'affichage de la page: rafraîchissement complet (file d'attente)
+                st.rerun()
+            if progress['status'] == 'termine':
+                st.success(f"✅ Analyse terminée: {progress['rows_processed']:,} échantillons traités, "
+                           f"{progress['stops_found']} arrêts détectés, {progress['stops_added']} nouveaux arrêts ajoutés!")
+            elif progress['status'] == 'annule':
+                st.warning("⏹️ Analyse annulée: aucun arrêt n'a été enregistré")
+            elif progress['status'] == 'erreur':
+                st.error(f"❌ Erreur lors de l'analyse: {progress['error']}")
+        
+        detection_progress()
     
     # Affichage des arrêts non classifiés
     st.markdown("---")
     st.subheader("⚠️ Arrêts Détectés Nécessitant une Classification")
     
-    arrets_non_classifies = data_manager.get_arrets_non_classifies()
+    nb_non_classifies = data_manager.count_arrets_auto(classifie=False)
     
-    if len(arrets_non_classifies) > 0:
+    if nb_non_classifies > 0:
         st.markdown("""
         <div class="alert-box alert-warning">
             <strong>⚠️ Action requise:</strong><br>
@@ -1325,72 +1394,88 @@ elif page == "🤖 Détection Automatique":
         </div>
         """, unsafe_allow_html=True)
         
-        # Affichage des arrêts à classifier
-        for idx, arret in arrets_non_classifies.iterrows():
-            with st.expander(f"🔍 Arrêt #{idx+1}: {arret['debut_arret'].strftime('%d/%m/%Y %H:%M')} - Durée: {arret['duree_minutes']} min"):
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    st.markdown(f"""
-                    <div class="classification-card">
-                        <div class="classification-header">
-                            <span>Informations de l'arrêt</span>
-                            <span class="classification-badge" style="background-color: #dc3545; color: white;">Non classifié</span>
-                        </div>
-                        <hr>
-                        <p><strong>Début:</strong> {arret['debut_arret'].strftime('%d/%m/%Y %H:%M:%S')}</p>
-                        <p><strong>Fin:</strong> {arret['fin_arret'].strftime('%d/%m/%Y %H:%M:%S')}</p>
-                        <p><strong>Durée:</strong> {arret['duree_minutes']} minutes</p>
-                        <p><strong>Détecté le:</strong> {arret.get('date_detection', 'N/A')}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    with st.form(f"classification_form_{idx}"):
-                        st.write("**Classification de l'arrêt:**")
-                        
-                        type_arret_class = st.selectbox(
-                            "Type d'arrêt",
-                            list(data_manager.types_arrets.keys()),
-                            format_func=lambda x: data_manager.types_arrets[x]['label'],
-                            key=f"type_{idx}"
-                        )
-                        
-                        sous_categories_class = data_manager.types_arrets[type_arret_class]['sous_categories']
-                        sous_categorie_class = st.selectbox(
-                            "Sous-catégorie",
-                            sous_categories_class,
-                            key=f"sous_cat_{idx}"
-                        )
-                        
-                        commentaire_class = st.text_area(
-                            "Commentaire",
-                            key=f"comment_{idx}",
-                            height=80
-                        )
-                        
-                        operateur_class = st.text_input(
-                            "Opérateur",
-                            value="Opérateur",
-                            key=f"op_{idx}"
-                        )
-                        
-                        urgence_class = st.selectbox(
-                            "Niveau d'urgence",
-                            data_manager.niveaux_urgence,
-                            key=f"urgence_{idx}"
-                        )
-                        
-                        if st.form_submit_button("✅ Classifier cet arrêt"):
-                            success = data_manager.classifier_arret(
-                                idx, type_arret_class, sous_categorie_class,
-                                commentaire_class, operateur_class, urgence_class
-                            )
-                            if success:
-                                st.success("✅ Arrêt classifié avec succès!")
-                                st.rerun()
-                            else:
-                                st.error("❌ Erreur lors de la classification")
+        # File de classification: seule la page affichée est lue (requête indexée) et rendue, dans
+        # un fragment réexécuté seul lors des interactions; un tableau à cases à cocher et un
+        # unique formulaire remplacent un formulaire par arrêt
+        @st.fragment
+        def classification_queue():
+            nb_non_classifies = data_manager.count_arrets_auto(classifie=False)
+            if nb_non_classifies == 0:
+                st.success("✅ Tous les arrêts détectés ont été classifiés")
+                return
+            
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                taille_page = st.selectbox("Arrêts par page", [10, 25, 50, 100], key="taille_page_classification")
+            nb_pages = (nb_non_classifies + taille_page - 1) // taille_page
+            # La page est portée par la session seule (pas de value=), ramenée dans les bornes
+            if st.session_state.get("page_classification", 1) > nb_pages:
+                st.session_state["page_classification"] = nb_pages
+            st.session_state.setdefault("page_classification", 1)
+            with col2:
+                page_classification = st.number_input("Page", min_value=1, max_value=nb_pages, step=1,
+                                                      key="page_classification")
+            st.caption(f"{nb_non_classifies} arrêts à classifier - page {page_classification}/{nb_pages}")
+            
+            arrets_non_classifies, _ = data_manager.get_arrets_auto_page(
+                page_classification - 1, taille_page, classifie=False
+            )
+            
+            # Tableau de la page avec une colonne de sélection
+            tout_selectionner = st.checkbox("Sélectionner toute la page", key="selection_page_classification")
+            table = pd.DataFrame({
+                'Sélection': tout_selectionner,
+                'Arrêt': arrets_non_classifies['arret_id'].astype(int),
+                'Début': arrets_non_classifies['debut_arret'].dt.strftime('%d/%m/%Y %H:%M:%S'),
+                'Fin': arrets_non_classifies['fin_arret'].dt.strftime('%d/%m/%Y %H:%M:%S'),
+                'Durée (min)': arrets_non_classifies['duree_minutes']
+            })
+            version = st.session_state.get("version_classification", 0)
+            edition = st.data_editor(
+                table,
+                hide_index=True,
+                use_container_width=True,
+                disabled=['Arrêt', 'Début', 'Fin', 'Durée (min)'],
+                column_config={'Sélection': st.column_config.CheckboxColumn("Sélection")},
+                key=f"table_classification_{page_classification}_{taille_page}_{tout_selectionner}_{version}"
+            )
+            selection = edition.loc[edition['Sélection'], 'Arrêt'].tolist()
+            
+            # Classification groupée des arrêts sélectionnés
+            st.write(f"**Classification des arrêts sélectionnés ({len(selection)}):**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                type_arret_class = st.selectbox(
+                    "Type d'arrêt",
+                    list(data_manager.types_arrets.keys()),
+                    format_func=lambda x: data_manager.types_arrets[x]['label'],
+                    key="type_classification"
+                )
+                sous_categorie_class = st.selectbox(
+                    "Sous-catégorie",
+                    data_manager.types_arrets[type_arret_class]['sous_categories'],
+                    key="sous_cat_classification"
+                )
+            with col2:
+                operateur_class = st.text_input("Opérateur", value="Opérateur", key="op_classification")
+                urgence_class = st.selectbox("Niveau d'urgence", data_manager.niveaux_urgence,
+                                             key="urgence_classification")
+            with col3:
+                commentaire_class = st.text_area("Commentaire", key="comment_classification", height=122)
+            
+            if st.button("✅ Classifier la sélection", disabled=len(selection) == 0):
+                nb_classifies = data_manager.classifier_arrets(
+                    selection, type_arret_class, sous_categorie_class,
+                    commentaire_class, operateur_class, urgence_class
+                )
+                if nb_classifies > 0:
+                    st.session_state["version_classification"] = version + 1
+                    st.success(f"✅ {nb_classifies} arrêt(s) classifié(s) avec succès!")
+                    st.rerun()
+                else:
+                    st.error("❌ Erreur lors de la classification")
+        
+        classification_queue()
     else:
         st.success("✅ Tous les arrêts détectés ont été classifiés")
     
@@ -1530,28 +1615,44 @@ elif page == "📈 Historique Machine":
     date_fin = st.sidebar.date_input("Date de fin", datetime.now().date())
     
     # État machine
+    etats_disponibles = ['en_marche', 'panne', 'arret_production', 'probleme_qualite']
     etats_selectionnes = st.sidebar.multiselect(
         "États à afficher",
-        ['en_marche', 'panne', 'arret_production', 'probleme_qualite'],
-        default=['en_marche', 'panne', 'arret_production', 'probleme_qualite']
+        etats_disponibles,
+        default=etats_disponibles
     )
     
-    # Filtrage des données
-    df_filtered = df[
-        (pd.to_datetime(df['timestamp']).dt.date >= date_debut) &
-        (pd.to_datetime(df['timestamp']).dt.date <= date_fin) &
-        (df['etat_machine'].isin(etats_selectionnes))
-    ].copy()
-    
-    if len(df_filtered) == 0:
+    # Période sélectionnée
+    debut_periode = datetime.combine(date_debut, datetime.min.time())
+    fin_periode = datetime.combine(date_fin, datetime.max.time())
+    
+    def charger_periode():
+        """Données brutes de la période, filtrées par état (lecture limitée à la période)"""
+        df_periode = data_manager.load_data(start=debut_periode, end=fin_periode)
+        return df_periode[df_periode['etat_machine'].isin(etats_selectionnes)]
+    
+    # Sans filtre d'état, la page est construite sur les agrégats pré-calculés (résolution choisie
+    # selon la période et le nombre de points maximal); les données brutes ne sont lues qu'à la
+    # résolution la plus fine, avec un filtre d'état ou pour un export
+    tous_les_etats = set(etats_selectionnes) == set(etats_disponibles)
+    resolution, df_rollup = None, None
+    if tous_les_etats:
+        resolution, df_rollup = data_manager.get_rollup(debut_periode, fin_periode)
+    donnees_agregees = df_rollup is not None and len(df_rollup) > 0 and resolution != '1min'
+    
+    df_filtered = None if donnees_agregees else charger_periode()
+    if df_filtered is not None and len(df_filtered) == 0:
         st.warning("Aucune donnée disponible pour les filtres sélectionnés")
         st.stop()
     
     # KPIs
     st.subheader("📊 Indicateurs de Performance (KPI)")
     
-    # Calcul des KPIs
-    kpis = data_manager.calculate_kpis(df_filtered, date_debut, date_fin)
+    # Calcul des KPIs (index cumulé si tous les états sont affichés)
+    if tous_les_etats:
+        kpis = data_manager.calculate_kpis(None, debut_periode, fin_periode)
+    else:
+        kpis = data_manager.calculate_kpis(df_filtered, debut_periode, fin_periode)
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -1584,32 +1685,67 @@ elif page == "📈 Historique Machine":
         
         # États machine (codés numériquement pour l'affichage)
         state_mapping = {'en_marche': 1, 'arret_production': 2, 'panne': 3, 'probleme_qualite': 4}
-        df_filtered['etat_numeric'] = df_filtered['etat_machine'].map(state_mapping)
         
-        fig_hist.add_trace(
-            go.Scatter(x=df_filtered['timestamp'], y=df_filtered['etat_numeric'],
+        if donnees_agregees:
+            st.caption(f"Données agrégées par intervalles de {resolution} ({len(df_rollup)} points)")
+            
+            # État dominant de chaque intervalle
+            etat_dominant = df_rollup[etats_disponibles].idxmax(axis=1)
+            etat_numeric = etat_dominant.map(state_mapping)
+            fig_hist.add_trace(
+                go.Scatter(x=df_rollup['timestamp'], y=etat_numeric,
+                          mode='markers', name='État Machine (dominant)',
+                          marker=dict(size=8, color=etat_numeric, 
+                                    colorscale='Viridis')),
+                row=1, col=1
+            )
+            
+            # Vibrations par intervalle: bande min-max (les pics restent visibles) et moyenne
+            for axis, label, color, fill in [('vibration_x', 'Vibration X', 'red', 'rgba(255, 0, 0, 0.15)'),
+                                             ('vibration_y', 'Vibration Y', 'green', 'rgba(0, 128, 0, 0.15)'),
+                                             ('vibration_z', 'Vibration Z', 'blue', 'rgba(0, 0, 255, 0.15)')]:
+                fig_hist.add_trace(
+                    go.Scatter(x=df_rollup['timestamp'], y=df_rollup[f'{axis}_max'],
+                              line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                    row=2, col=1
+                )
+                fig_hist.add_trace(
+                    go.Scatter(x=df_rollup['timestamp'], y=df_rollup[f'{axis}_min'],
+                              name=f'{label} (min-max)', line=dict(width=0),
+                              fill='tonexty', fillcolor=fill),
+                    row=2, col=1
+                )
+                fig_hist.add_trace(
+                    go.Scatter(x=df_rollup['timestamp'], y=df_rollup[f'{axis}_mean'],
+                              name=f'{label} (moyenne)', line=dict(color=color)),
+                    row=2, col=1
+                )
+        else:
+            etat_numeric = df_filtered['etat_machine'].astype(object).map(state_mapping)
+            
+            # Au-delà du seuil WebGL: rendu Scattergl et décimation min/max par tuile de temps
+            Trace = scatter_trace(len(df_filtered))
+            n_tuiles = data_manager.config.get('max_points_graphique', 1000) if Trace is go.Scattergl else None
+            
+            x_etat, y_etat = decimate(df_filtered['timestamp'], etat_numeric, n_tuiles)
+            fig_hist.add_trace(
+                Trace(x=x_etat, y=y_etat,
                       mode='markers', name='État Machine',
-                      marker=dict(size=8, color=df_filtered['etat_numeric'], 
+                      marker=dict(size=8, color=y_etat, 
                                 colorscale='Viridis')),
-            row=1, col=1
-        )
-        
-        # Vibrations
-        fig_hist.add_trace(
-            go.Scatter(x=df_filtered['timestamp'], y=df_filtered['vibration_x'],
-                      name='Vibration X', line=dict(color='red')),
-            row=2, col=1
-        )
-        fig_hist.add_trace(
-            go.Scatter(x=df_filtered['timestamp'], y=df_filtered['vibration_y'],
-                      name='Vibration Y', line=dict(color='green')),
-            row=2, col=1
-        )
-        fig_hist.add_trace(
-            go.Scatter(x=df_filtered['timestamp'], y=df_filtered['vibration_z'],
-                      name='Vibration Z', line=dict(color='blue')),
-            row=2, col=1
-        )
+                row=1, col=1
+            )
+            
+            # Vibrations
+            for axis, label, color in [('vibration_x', 'Vibration X', 'red'),
+                                       ('vibration_y', 'Vibration Y', 'green'),
+                                       ('vibration_z', 'Vibration Z', 'blue')]:
+                x_axis, y_axis = decimate(df_filtered['timestamp'], df_filtered[axis], n_tuiles)
+                fig_hist.add_trace(
+                    Trace(x=x_axis, y=y_axis,
+                          name=label, line=dict(color=color)),
+                    row=2, col=1
+                )
         
         fig_hist.update_layout(height=600)
         fig_hist.update_xaxes(title_text="Temps", row=2, col=1)
@@ -1621,21 +1757,38 @@ elif page == "📈 Historique Machine":
     with col2:
         st.subheader("📊 Analyses")
         
+        # Distribution et corrélations: histogrammes et produits croisés agrégés si aucun filtre d'état
+        agregats = data_manager.get_vibration_aggregates(debut_periode, fin_periode) if tous_les_etats else {'count': 0}
+        
         # Distribution des vibrations
         st.write("**Distribution des Vibrations**")
-        vibrations_combined = pd.concat([
-            df_filtered['vibration_x'],
-            df_filtered['vibration_y'], 
-            df_filtered['vibration_z']
-        ])
-        
-        fig_dist = px.histogram(vibrations_combined, nbins=30, title="Distribution")
+        if agregats['count'] == 0 and df_filtered is None:
+            df_filtered = charger_periode()
+        if agregats['count'] > 0:
+            edges = agregats['hist_edges']
+            fig_dist = px.bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=agregats['hist'].sum(axis=1).values,
+                title="Distribution"
+            )
+            fig_dist.update_traces(width=edges[1] - edges[0])
+            fig_dist.update_layout(xaxis_title="Vibration (mm/s)", yaxis_title="count", bargap=0)
+        else:
+            vibrations_combined = pd.concat([
+                df_filtered['vibration_x'],
+                df_filtered['vibration_y'], 
+                df_filtered['vibration_z']
+            ])
+            fig_dist = px.histogram(vibrations_combined, nbins=30, title="Distribution")
         fig_dist.update_layout(height=250)
         st.plotly_chart(fig_dist, use_container_width=True)
         
         # Corrélations
         st.write("**Matrice de Corrélation**")
-        corr_matrix = df_filtered[['vibration_x', 'vibration_y', 'vibration_z']].corr()
+        if agregats['count'] > 0:
+            corr_matrix = agregats['corr']
+        else:
+            corr_matrix = df_filtered[['vibration_x', 'vibration_y', 'vibration_z']].corr()
         fig_corr = px.imshow(corr_matrix, text_auto=True, aspect="auto")
         fig_corr.update_layout(height=250)
         st.plotly_chart(fig_corr, use_container_width=True)
@@ -1643,7 +1796,11 @@ elif page == "📈 Historique Machine":
     # Anomalies détectées
     st.subheader("⚠️ Anomalies Détectées")
     
-    anomalies = data_manager.detect_anomalies(df_filtered)
+    # Aux résolutions agrégées: un intervalle par dépassement, nombre d'échantillons estimé par l'histogramme
+    if df_filtered is None:
+        anomalies = data_manager.detect_anomalies_aggregated(debut_periode, fin_periode, resolution)
+    else:
+        anomalies = data_manager.detect_anomalies(df_filtered)
     
     if anomalies:
         st.markdown(f"""
@@ -1663,14 +1820,20 @@ elif page == "📈 Historique Machine":
         anomalies_display['value'] = anomalies_display['value'].round(2)
         anomalies_display['threshold'] = anomalies_display['threshold'].round(2)
         
+        colonnes = ['timestamp', 'axis', 'value', 'threshold', 'severity']
+        if 'count' in anomalies_display.columns:
+            st.caption(f"Anomalies par intervalle de {resolution}: valeur maximale de l'intervalle")
+            colonnes.append('count')
+        
         st.dataframe(
-            anomalies_display[['timestamp', 'axis', 'value', 'threshold', 'severity']],
+            anomalies_display[colonnes],
             column_config={
                 'timestamp': 'Horodatage',
                 'axis': 'Axe',
                 'value': 'Valeur (mm/s)',
                 'threshold': 'Seuil (mm/s)',
-                'severity': 'Sévérité'
+                'severity': 'Sévérité',
+                'count': 'Échantillons'
             },
             use_container_width=True
         )
@@ -1681,11 +1844,15 @@ elif page == "📈 Historique Machine":
     st.markdown("---")
     st.subheader("💾 Export des Données")
     
+    # Les exports portent sur les données brutes, lues seulement à la demande
+    def donnees_export():
+        return df_filtered if df_filtered is not None else charger_periode()
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
         if st.button("📥 Télécharger CSV"):
-            csv = df_filtered.to_csv(index=False)
+            csv = donnees_export().to_csv(index=False)
             st.download_button(
                 label="💾 Télécharger le fichier CSV",
                 data=csv,
@@ -1695,7 +1862,7 @@ elif page == "📈 Historique Machine":
     
     with col2:
         if st.button("📥 Télécharger JSON"):
-            json_data = df_filtered.to_json(orient='records', date_format='iso')
+            json_data = donnees_export().to_json(orient='records', date_format='iso')
             st.download_button(
                 label="💾 Télécharger le fichier JSON",
                 data=json_data,
@@ -1707,7 +1874,7 @@ elif page == "📈 Historique Machine":
         # Rapport de synthèse
         if st.button("📄 Générer Rapport"):
             with st.spinner("Génération du rapport en cours..."):
-                rapport = data_manager.generate_report(df_filtered, date_debut, date_fin)
+                rapport = data_manager.generate_report(donnees_export(), date_debut, date_fin)
                 st.download_button(
                     label="💾 Télécharger le rapport",
                     data=rapport,
@@ -1772,6 +1939,25 @@ elif page == "⚙️ Configuration":
                 bool(config.get('notifications_enabled', True))
             )
             
+            compact_memory = st.checkbox(
+                "Mode mémoire compact (états catégoriels, vibrations float32)",
+                bool(config.get('compact_memory', False))
+            )
+            
+            max_points_graphique = st.slider(
+                "Points maximum par courbe (sous-échantillonnage des graphiques)",
+                200, 5000,
+                int(config.get('max_points_graphique', 1000)),
+                100
+            )
+            
+            seuil_webgl_points = st.slider(
+                "Seuil de rendu WebGL (nombre de points)",
+                1000, 50000,
+                int(config.get('seuil_webgl_points', 5000)),
+                1000
+            )
+            
             # Bouton de sauvegarde
             submitted = st.form_submit_button("💾 Enregistrer les paramètres")
             
@@ -1783,6 +1969,9 @@ elif page == "⚙️ Configuration":
                 data_manager.update_config('duree_min_arret', duree_min_arret)
                 data_manager.update_config('auto_detection_enabled', auto_detection)
                 data_manager.update_config('notifications_enabled', notifications)
+                data_manager.update_config('compact_memory', compact_memory)
+                data_manager.update_config('max_points_graphique', max_points_graphique)
+                data_manager.update_config('seuil_webgl_points', seuil_webgl_points)
                 
                 st.success("✅ Paramètres enregistrés avec succès!")
     
@@ -1804,6 +1993,7 @@ elif page == "⚙️ Configuration":
             
             st.metric("Qualité des données", f"{stats.get('data_quality', 0):.1f}%")
             st.metric("Taille des données", f"{stats.get('machine_data_size', 0):.2f} MB")
+            st.metric("Mémoire du cache", f"{stats.get('cache_memory_size', 0):.2f} MB")
         
         with col2:
             st.write("**Données d'Arrêts**")
@@ -1847,7 +2037,8 @@ elif page == "⚙️ Configuration":
             
             if st.button("🔄 Générer Nouvelles Données", use_container_width=True):
                 with st.spinner("Génération en cours..."):
-                    data_generator.generate_additional_data(hours=heures_generation)
+                    scheduler.run_exclusive(data_generator.generate_additional_data, hours=heures_generation)
+                    data_manager.refresh_snapshot()
                 st.success(f"✅ {heures_generation} heures de nouvelles données générées!")
                 st.rerun()
             
@@ -1855,12 +2046,14 @@ elif page == "⚙️ Configuration":
             
             type_anomalie = st.selectbox(
                 "Type d'anomalie",
-                ["vibration_spike", "gradual_degradation"]
+                list(ANOMALY_TYPES.keys()),
+                format_func=lambda x: ANOMALY_TYPES[x]
             )
             
             if st.button("🔄 Simuler Anomalie", use_container_width=True):
                 with st.spinner("Simulation en cours..."):
-                    data_generator.simulate_anomaly(type_anomalie)
+                    scheduler.run_exclusive(data_generator.simulate_anomaly, type_anomalie)
+                    data_manager.refresh_snapshot()
                 st.success(f"✅ Anomalie '{type_anomalie}' simulée avec succès!")
                 st.rerun()
         
@@ -1871,7 +2064,7 @@ elif page == "⚙️ Configuration":
             
             if st.button("🗑️ Nettoyer Anciennes Données", use_container_width=True):
                 with st.spinner("Nettoyage en cours..."):
-                    removed = data_manager.cleanup_old_data(days=jours_retention)
+                    removed = scheduler.run_exclusive(data_manager.cleanup_old_data, days=jours_retention)
                 st.success(f"✅ {removed} enregistrements anciens supprimés!")
                 st.rerun()
             
@@ -1885,6 +2078,25 @@ elif page == "⚙️ Configuration":
                     else:
                         st.error("❌ Erreur lors de la sauvegarde")
 
+            st.write(f"**Import / Export CSV** (stockage: {data_manager.storage.name})")
+
+            fichier_csv = st.file_uploader("Importer des données machine (CSV)", type=['csv'])
+            if fichier_csv is not None and st.button("📤 Importer le CSV", use_container_width=True):
+                with st.spinner("Import en cours..."):
+                    success = scheduler.run_exclusive(data_manager.import_csv, fichier_csv)
+                if success:
+                    st.success("✅ Données importées avec succès!")
+                    st.rerun()
+                else:
+                    st.error("❌ Erreur lors de l'import du fichier CSV")
+
+            if st.button("📥 Exporter toutes les données (CSV)", use_container_width=True):
+                filepath = data_manager.export_data(data_manager.load_data(), format='csv')
+                if filepath:
+                    st.success(f"✅ Données exportées: {filepath}")
+                else:
+                    st.error("❌ Erreur lors de l'export")
+
 
 # Footer
 st.markdown("---")
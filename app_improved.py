@@ -57,8 +57,8 @@ st.markdown("""
 # Initialisation des classes utilitaires
 @st.cache_resource
 def init_data_components():
-    data_gen = DataGenerator()
     data_manager = DataManager()
+    data_gen = DataGenerator(storage=data_manager.storage)
     return data_gen, data_manager
 
 data_generator, data_manager = init_data_components()
@@ -74,7 +74,7 @@ page = st.sidebar.selectbox(
 )
 
 # Génération de données si nécessaire
-if not os.path.exists("data/machine_data.csv"):
+if not data_manager.storage.exists():
     with st.spinner("Génération des données initiales..."):
         data_generator.generate_initial_data()
 
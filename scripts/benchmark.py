@@ -0,0 +1,223 @@
+"""
+Script de benchmark des traitements du DataManager
+sur des jeux de données synthétiques de tailles croissantes
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_manager import DataManager
+from utils.storage import PARQUET_AVAILABLE
+
+
+def make_dataset(n_rows, seed=42):
+    """Génère rapidement n_rows échantillons (1/min) avec des périodes d'arrêt aléatoires"""
+    rng = np.random.default_rng(seed)
+    states = np.array(['en_marche', 'panne', 'arret_production', 'probleme_qualite'], dtype=object)
+
+    # Segments d'état de 5 à 120 minutes
+    durations = rng.integers(5, 120, size=n_rows // 5 + 1)
+    codes = rng.choice(4, size=len(durations), p=[0.7, 0.1, 0.15, 0.05])
+    state_codes = np.repeat(codes, durations)[:n_rows]
+
+    means = np.array([0.8, 3.0, 0.02, 1.2])[state_codes]
+    vibrations = np.abs(rng.normal(means[:, None], 0.05 + means[:, None] * 0.3, size=(n_rows, 3)))
+
+    return pd.DataFrame({
+        'timestamp': pd.date_range(datetime(2024, 1, 1), periods=n_rows, freq='min'),
+        'etat_machine': states[state_codes],
+        'vibration_x': vibrations[:, 0].round(2),
+        'vibration_y': vibrations[:, 1].round(2),
+        'vibration_z': vibrations[:, 2].round(2)
+    })
+
+
+def detect_stops_iterrows(manager, df):
+    """Ancienne implémentation ligne à ligne (référence de temps uniquement)"""
+    df = df.copy()
+    df['vibration_totale'] = np.sqrt(df['vibration_x']**2 + df['vibration_y']**2 + df['vibration_z']**2)
+    df['machine_arretee'] = df['vibration_totale'] <= manager.config['seuil_arret_vibration']
+    df['transition'] = df['machine_arretee'].diff()
+
+    arrets_detectes = []
+    debut_arret = None
+    for idx, row in df.iterrows():
+        if row['transition'] == True:
+            debut_arret = row['timestamp']
+        elif row['transition'] == False and debut_arret is not None:
+            duree_minutes = (row['timestamp'] - debut_arret).total_seconds() / 60
+            if duree_minutes >= manager.config['duree_min_arret']:
+                arrets_detectes.append((debut_arret, row['timestamp']))
+            debut_arret = None
+    return arrets_detectes
+
+
+def calculate_kpis_iterrows(manager, df):
+    """Ancien calcul des KPIs: quatre filtres puis MTBF/MTTR ligne à ligne (référence de temps)"""
+    total_points = len(df)
+    temps_marche = len(df[df['etat_machine'] == 'en_marche'])
+    temps_panne = len(df[df['etat_machine'] == 'panne'])
+    temps_arret_prod = len(df[df['etat_machine'] == 'arret_production'])
+    temps_qualite = len(df[df['etat_machine'] == 'probleme_qualite'])
+
+    panne_starts, panne_durations = [], []
+    in_panne, panne_start = False, None
+    for idx, row in df.iterrows():
+        if row['etat_machine'] == 'panne' and not in_panne:
+            panne_starts.append(row['timestamp'])
+            in_panne = True
+        elif row['etat_machine'] != 'panne' and in_panne:
+            in_panne = False
+    for idx, row in df.iterrows():
+        if row['etat_machine'] == 'panne' and panne_start is None:
+            panne_start = row['timestamp']
+        elif row['etat_machine'] != 'panne' and panne_start is not None:
+            panne_durations.append((row['timestamp'] - panne_start).total_seconds() / 3600)
+            panne_start = None
+    return (temps_marche / total_points, temps_panne / total_points,
+            (temps_marche + temps_arret_prod) / total_points, temps_qualite / total_points,
+            len(panne_starts), panne_durations)
+
+
+def timed(func, *args, repeat=3):
+    """Meilleur temps d'exécution sur plusieurs essais (secondes)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_detect_stops(manager, sizes, legacy_max):
+    print("\n🔍 detect_machine_stops")
+    print(f"{'Lignes':>12} | {'Temps (s)':>10} | {'Lignes/s':>14} | {'Arrêts':>7} | {'iterrows (lignes/s)':>20}")
+    print("-" * 76)
+    for n_rows in sizes:
+        df = make_dataset(n_rows)
+        elapsed, stops = timed(manager.detect_machine_stops, df)
+
+        legacy = "-"
+        if n_rows <= legacy_max:
+            legacy_elapsed, _ = timed(detect_stops_iterrows, manager, df, repeat=1)
+            legacy = f"{n_rows / legacy_elapsed:,.0f}"
+
+        print(f"{n_rows:>12,} | {elapsed:>10.4f} | {n_rows / elapsed:>14,.0f} | {len(stops):>7} | {legacy:>20}")
+
+
+def bench_kpis(manager, sizes, legacy_max):
+    print("\n📊 calculate_kpis")
+    print(f"{'Lignes':>12} | {'Temps (ms)':>10} | {'Lignes/s':>14} | {'iterrows (ms)':>14}")
+    print("-" * 60)
+    for n_rows in sizes:
+        df = make_dataset(n_rows)
+        elapsed, _ = timed(manager.calculate_kpis, df)
+
+        legacy = "-"
+        if n_rows <= legacy_max:
+            legacy_elapsed, _ = timed(calculate_kpis_iterrows, manager, df, repeat=1)
+            legacy = f"{legacy_elapsed * 1000:,.1f}"
+
+        print(f"{n_rows:>12,} | {elapsed * 1000:>10.1f} | {n_rows / elapsed:>14,.0f} | {legacy:>14}")
+
+
+def make_manager(data_dir, backend=None, compact=False):
+    """DataManager sur un moteur de stockage donné (configuration écrite avant l'ouverture)"""
+    with open(os.path.join(data_dir, 'config.json'), 'w') as f:
+        json.dump({'storage_backend': backend, 'compact_memory': compact}, f)
+    return DataManager(data_dir=data_dir)
+
+
+def run_detection_job(manager, timeout=600):
+    """Lance une réanalyse complète en arrière-plan et attend sa fin; retourne la progression finale"""
+    job = manager.start_detection_job(reanalyse=True)
+    deadline = time.perf_counter() + timeout
+    while job.is_running() and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    return job.get_progress()
+
+
+def check_detection_job(n_rows):
+    """Vérifie, sur chaque moteur de stockage, que la détection par blocs en arrière-plan
+    enregistre les mêmes arrêts que la détection complète"""
+    print("\n🧪 Détection en arrière-plan vs détection complète")
+    df = make_dataset(n_rows)
+    backends = ['csv'] + (['parquet'] if PARQUET_AVAILABLE else [])
+    ok = True
+    for backend in backends:
+        with tempfile.TemporaryDirectory() as job_dir, tempfile.TemporaryDirectory() as ref_dir:
+            reference = make_manager(ref_dir, backend)
+            reference.save_data(df)
+            attendus = reference.save_arrets_auto(reference.detect_machine_stops(reference.load_data()))
+
+            manager = make_manager(job_dir, backend)
+            manager.save_data(df)
+            progress = run_detection_job(manager)
+            trouves = manager.load_arrets_auto()
+
+            same = (progress['status'] == 'termine' and len(trouves) == len(attendus) and
+                    sorted(trouves['debut_arret']) == sorted(pd.Timestamp(a['debut_arret']) for a in attendus))
+            ok &= same
+            erreur = f" ({progress['error']})" if progress.get('error') else ""
+            print(f"{'✅' if same else '❌'} {backend:>8}: {progress['status']}{erreur}, "
+                  f"{len(trouves)} arrêts enregistrés / {len(attendus)} attendus")
+    return ok
+
+
+def check_compact_detection(n_rows):
+    """Vérifie que la représentation compacte (axes en float32) détecte les mêmes arrêts"""
+    print("\n🧪 Détection des arrêts: représentation compacte vs float64")
+    df = make_dataset(n_rows)
+    resultats = {}
+    for compact in (False, True):
+        with tempfile.TemporaryDirectory() as data_dir:
+            manager = make_manager(data_dir, compact=compact)
+            manager.save_data(df)
+            resultats[compact] = manager.detect_machine_stops(manager.load_data())
+
+    debuts = {compact: [a['debut_arret'] for a in arrets] for compact, arrets in resultats.items()}
+    same = debuts[False] == debuts[True]
+    print(f"{'✅' if same else '❌'} {len(resultats[True])} arrêts en mode compact / {len(resultats[False])} en float64")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des traitements du dashboard")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000],
+                        help="Tailles des jeux de données (nombre de lignes)")
+    parser.add_argument('--legacy-max', type=int, default=100_000,
+                        help="Taille maximale pour mesurer l'ancienne implémentation iterrows")
+    parser.add_argument('--check-rows', type=int, default=20_000,
+                        help="Taille du jeu de données des vérifications de cohérence")
+    args = parser.parse_args()
+
+    print("🚀 Benchmark des traitements")
+    print("=" * 50)
+
+    # DataManager isolé dans un dossier temporaire pour ne pas toucher aux données du dashboard
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir=data_dir)
+        bench_detect_stops(manager, args.sizes, args.legacy_max)
+        # Une année à une mesure par minute = 525 600 lignes
+        bench_kpis(manager, sorted(set(args.sizes) | {525_600}), args.legacy_max)
+
+    # Vérifications de cohérence (blocs de détection sur chaque moteur, représentation compacte)
+    ok = check_detection_job(args.check_rows)
+    ok &= check_compact_detection(max(args.sizes))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,8 +17,8 @@ def main():
     print("=" * 50)
     
     # Initialisation
-    generator = DataGenerator()
     manager = DataManager()
+    generator = DataGenerator(storage=manager.storage)
     
     # 1. Génération des données initiales
     print("📊 Génération des données initiales (7 jours)...")
@@ -0,0 +1,165 @@
+"""
+Script de génération de données synthétiques pour une flotte de machines
+(tests de capacité): N machines × M jours, écrits directement en Parquet partitionné,
+avec éventuellement des anomalies étiquetées
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from utils.data_generator import DataGenerator
+from utils.anomalies import apply_scenarios, random_scenarios, scenarios_frame
+from utils.storage import ParquetStorage, PARQUET_AVAILABLE
+
+
+def machine_dir(output_dir, machine):
+    """Dossier de données d'une machine (utilisable comme data_dir d'un DataManager)"""
+    return os.path.join(output_dir, f"machine_{machine:03d}")
+
+
+def generate_chunk(task):
+    """Génère et écrit un bloc (machine, bloc) avec sa propre graine; retourne ses statistiques.
+
+    La graine dérive uniquement de (graine globale, machine, bloc): chaque bloc est
+    reproductible à l'identique, quel que soit le worker ou l'ordre d'exécution.
+    """
+    start_clock = time.perf_counter()
+    seed = np.random.SeedSequence(task['seed'], spawn_key=(task['machine'], task['chunk']))
+    storage = ParquetStorage(machine_dir(task['output_dir'], task['machine']))
+    generator = DataGenerator(storage=storage, seed=seed, sample_rate_hz=task['sample_rate_hz'])
+
+    # État initial du bloc tiré selon les probabilités des états
+    initial_state = int(generator.rng.choice(len(generator.states), p=generator.state_probabilities))
+
+    # Anomalies étiquetées tirées dans l'intervalle du bloc (même graine, donc reproductibles)
+    scenarios = []
+    n_anomalies = generator.rng.poisson(task['anomalies_per_day'] * task['hours'] / 24)
+    if n_anomalies > 0:
+        end = task['start'] + pd.Timedelta(hours=task['hours'])
+        scenarios = random_scenarios(task['start'], end, n_anomalies, generator.rng)
+        labels_dir = os.path.join(machine_dir(task['output_dir'], task['machine']), 'anomalies')
+        os.makedirs(labels_dir, exist_ok=True)
+        scenarios_frame(scenarios).to_csv(os.path.join(labels_dir, f"part-{task['chunk']:05d}.csv"), index=False)
+
+    rows, bytes_written = 0, 0
+    chunks = generator.iter_data_chunks(task['start'], task['hours'], chunk_size=task['rows_per_file'],
+                                        initial_state=initial_state)
+    for i, df in enumerate(chunks):
+        if scenarios:
+            df = apply_scenarios(df, scenarios, generator.rng)
+        # Noms de fichiers uniques par (bloc, sous-bloc): aucune coordination entre workers
+        paths = storage.write_part(df, f"part-{task['chunk']:05d}-{i:03d}.parquet")
+        rows += len(df)
+        bytes_written += sum(os.path.getsize(path) for path in paths)
+
+    return {
+        'machine': task['machine'],
+        'chunk': task['chunk'],
+        'pid': os.getpid(),
+        'rows': rows,
+        'bytes': bytes_written,
+        'seconds': time.perf_counter() - start_clock
+    }
+
+
+def build_tasks(args):
+    """Découpe la période de chaque machine en blocs de chunk_hours heures"""
+    start = pd.Timestamp(args.start)
+    total_hours = args.days * 24
+    tasks = []
+    for machine in range(args.machines):
+        chunk, offset = 0, 0.0
+        while offset < total_hours:
+            hours = min(args.chunk_hours, total_hours - offset)
+            tasks.append({
+                'machine': machine,
+                'chunk': chunk,
+                'start': start + pd.Timedelta(hours=offset),
+                'hours': hours,
+                'sample_rate_hz': args.sample_rate,
+                'seed': args.seed,
+                'output_dir': args.output,
+                'rows_per_file': args.rows_per_file,
+                'anomalies_per_day': args.anomalies_per_day
+            })
+            chunk += 1
+            offset += hours
+    return tasks
+
+
+def print_report(results, elapsed):
+    """Débit et volume écrit par worker, puis totaux"""
+    report = pd.DataFrame(results).groupby('pid').agg(
+        blocs=('chunk', 'size'), lignes=('rows', 'sum'), octets=('bytes', 'sum'), secondes=('seconds', 'sum')
+    )
+    print(f"\n{'Worker':>8} | {'Blocs':>6} | {'Lignes':>14} | {'Lignes/s':>12} | {'Mo écrits':>10}")
+    print("-" * 62)
+    for row in report.itertuples():
+        print(f"{row.Index:>8} | {row.blocs:>6} | {row.lignes:>14,} | "
+              f"{row.lignes / row.secondes:>12,.0f} | {row.octets / 1e6:>10.1f}")
+
+    total_rows, total_bytes = report['lignes'].sum(), report['octets'].sum()
+    print("-" * 62)
+    print(f"✅ {total_rows:,} lignes, {total_bytes / 1e6:.1f} Mo en {elapsed:.1f}s "
+          f"({total_rows / elapsed:,.0f} lignes/s, {total_bytes / total_rows:.1f} octets/ligne)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génération parallèle et reproductible d'une flotte de machines")
+    parser.add_argument('--machines', type=int, default=10, help="Nombre de machines")
+    parser.add_argument('--days', type=float, default=30, help="Nombre de jours par machine")
+    parser.add_argument('--output', default=os.path.join('data', 'fleet'), help="Dossier de sortie")
+    parser.add_argument('--start', default='2024-01-01', help="Début de la période générée")
+    parser.add_argument('--sample-rate', type=float, default=1 / 60,
+                        help="Fréquence d'échantillonnage en Hz (1/60 = une mesure par minute)")
+    parser.add_argument('--chunk-hours', type=float, default=24, help="Taille d'un bloc de travail (heures)")
+    parser.add_argument('--rows-per-file', type=int, default=1_000_000,
+                        help="Nombre maximal de lignes par fichier écrit")
+    parser.add_argument('--anomalies-per-day', type=float, default=0,
+                        help="Nombre moyen d'anomalies injectées par machine et par jour (étiquettes dans anomalies/)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine globale")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Nombre de processus")
+    parser.add_argument('--overwrite', action='store_true', help="Remplace le dossier de sortie existant")
+    args = parser.parse_args()
+
+    if not PARQUET_AVAILABLE:
+        print("❌ pyarrow est nécessaire pour écrire le stockage Parquet partitionné")
+        return 1
+
+    if os.path.exists(args.output) and os.listdir(args.output):
+        if not args.overwrite:
+            print(f"❌ Le dossier {args.output} n'est pas vide (utilisez --overwrite pour le remplacer)")
+            return 1
+        shutil.rmtree(args.output)
+    os.makedirs(args.output, exist_ok=True)
+
+    tasks = build_tasks(args)
+    print("🚀 Génération de la flotte")
+    print("=" * 50)
+    print(f"🏭 {args.machines} machines × {args.days:g} jours à {args.sample_rate:g} Hz, "
+          f"{len(tasks)} blocs sur {args.workers} processus (graine {args.seed})")
+
+    start_clock = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(generate_chunk, task) for task in tasks]
+        for future in as_completed(futures):
+            results.append(future.result())
+    elapsed = time.perf_counter() - start_clock
+
+    print_report(results, elapsed)
+    print(f"📁 Données écrites dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Script de simulation d'un flux de capteur en temps réel (substitut local d'une passerelle):
+production asynchrone des échantillons, ingestion dans le stockage et mesure de la latence
+d'ingestion (le dashboard voit les lignes au cycle suivant de son planificateur)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import tempfile
+
+from utils.data_generator import DataGenerator
+from utils.data_manager import DataManager
+from utils.realtime_feed import RealtimeFeed, FeedConsumer, read_socket
+
+
+async def report_progress(feed, consumer, interval):
+    """Affiche périodiquement la production et l'ingestion"""
+    while True:
+        await asyncio.sleep(interval)
+        summary = consumer.summary()
+        latency = f", latence d'ingestion p95 {summary['latency_p95']:.2f}s" if 'latency_p95' in summary else ""
+        print(f"⏱️ {feed.stats['rows']:,} produits, {summary['rows']:,} ingérés "
+              f"({summary['flushes']} ajouts){latency}")
+
+
+async def run(args, data_manager):
+    generator = DataGenerator(storage=data_manager.storage, seed=args.seed)
+    feed = RealtimeFeed(generator, sample_rate_hz=args.rate, batch_size=args.batch_size)
+    if args.serve:
+        print(f"📡 Flux disponible sur {args.host}:{args.port} (en attente d'un client)")
+        await feed.serve(args.host, args.port, args.duration)
+        return feed, None
+
+    queue = asyncio.Queue(maxsize=args.queue_size)
+    consumer = FeedConsumer(data_manager.storage, data_manager, flush_seconds=args.flush_seconds)
+    if args.transport == 'queue':
+        producers = [feed.to_queue(queue, args.duration)]
+    else:
+        producers = [feed.serve(args.host, args.port, args.duration), read_socket(queue, args.host, args.port)]
+
+    progress = asyncio.create_task(report_progress(feed, consumer, args.report_seconds))
+    try:
+        await asyncio.gather(consumer.run(queue), *producers)
+    finally:
+        progress.cancel()
+    return feed, consumer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flux de capteur simulé en temps réel")
+    parser.add_argument('--rate', type=float, default=1.0, help="Fréquence d'échantillonnage (Hz)")
+    parser.add_argument('--batch-size', type=int, default=10, help="Nombre d'échantillons par lot")
+    parser.add_argument('--duration', type=float, default=60, help="Durée du flux (secondes)")
+    parser.add_argument('--transport', choices=['queue', 'socket'], default='queue',
+                        help="File en mémoire ou socket TCP local")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--serve', action='store_true',
+                        help="Diffuse seulement le flux sur le socket (client externe)")
+    parser.add_argument('--flush-seconds', type=float, default=5.0, help="Intervalle d'ajout au stockage")
+    parser.add_argument('--queue-size', type=int, default=1000, help="Taille maximale de la file")
+    parser.add_argument('--report-seconds', type=float, default=10.0, help="Intervalle d'affichage")
+    parser.add_argument('--data-dir', default=None,
+                        help="Dossier de données (par défaut un dossier temporaire; 'data' pour le dashboard)")
+    parser.add_argument('--seed', type=int, default=None, help="Graine du générateur")
+    args = parser.parse_args()
+
+    print("🚀 Flux temps réel simulé")
+    print("=" * 50)
+    print(f"📈 {args.rate:g} Hz, lots de {args.batch_size}, {args.duration:g}s via {args.transport}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_manager = DataManager(data_dir=args.data_dir or tmp_dir)
+        feed, consumer = asyncio.run(run(args, data_manager))
+
+        print(f"\n✅ {feed.stats['rows']:,} échantillons produits en {feed.stats['batches']} lots "
+              f"(retard max du producteur {feed.stats['late_seconds_max']:.3f}s)")
+        if consumer is not None:
+            summary = consumer.summary()
+            print(f"📥 {summary['rows']:,} échantillons ingérés en {summary['flushes']} ajouts "
+                  f"({summary['rows_per_second']:,.0f} lignes/s)")
+            if 'latency_p50' in summary:
+                print(f"⏱️ Latence échantillon → stockage: p50 {summary['latency_p50']:.3f}s, "
+                      f"p95 {summary['latency_p95']:.3f}s, max {summary['latency_max']:.3f}s")
+                # Le dashboard (autre processus) ne relit le stockage qu'à chaque cycle du planificateur
+                interval = data_manager.config.get('refresh_interval_seconds', 60)
+                print(f"🖥️ Visibilité dans le dashboard: au plus {summary['latency_max'] + interval:.1f}s "
+                      f"(latence max + cycle du planificateur de {interval}s)")
+
+
+if __name__ == "__main__":
+    main()
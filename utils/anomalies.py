@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from utils.segments import timestamps_ns
+from utils.storage import VIBRATION_COLUMNS
+
+# Scénarios d'anomalies disponibles
+ANOMALY_TYPES = {
+    'vibration_spike': 'Pic de vibration (panne)',
+    'gradual_degradation': 'Dégradation progressive',
+    'drift': 'Dérive du capteur',
+    'imbalance': 'Balourd (harmoniques de rotation)',
+    'bearing_defect': 'Défaut de roulement (salves de chocs)',
+    'sensor_dropout': 'Perte de signal du capteur',
+    'stuck_sensor': 'Capteur bloqué'
+}
+
+# Paramètres par défaut de chaque scénario
+DEFAULT_PARAMS = {
+    'vibration_spike': {'low': 3.0, 'high': 5.0},
+    'gradual_degradation': {'factor': 0.5},
+    'drift': {'amplitude': 1.0, 'axes': [0, 1, 2]},
+    'imbalance': {'amplitude': 0.8, 'period_seconds': 600.0, 'harmonics': [1.0, 0.5, 0.25]},
+    'bearing_defect': {'amplitude': 3.0, 'period_seconds': 900.0, 'burst_seconds': 180.0, 'axes': [2]},
+    'sensor_dropout': {'axes': [0]},
+    'stuck_sensor': {'axes': [1]}
+}
+
+
+def make_scenario(anomaly_type, start, end, **params):
+    """Décrit une anomalie sur l'intervalle [start, end] (horodatages absolus).
+
+    Les scénarios étant définis en temps absolu, ils s'appliquent de la même façon à un
+    DataFrame complet ou aux blocs successifs d'un flux d'ajout.
+    """
+    if anomaly_type not in ANOMALY_TYPES:
+        raise ValueError(f"Type d'anomalie inconnu: {anomaly_type}")
+    scenario = {'type': anomaly_type, 'start': pd.Timestamp(start), 'end': pd.Timestamp(end)}
+    scenario.update(DEFAULT_PARAMS[anomaly_type])
+    scenario.update(params)
+    return scenario
+
+
+def random_scenarios(start, end, n, rng, types=None, min_minutes=10, max_minutes=120):
+    """Tire n scénarios de types et de positions aléatoires dans [start, end]"""
+    types = list(ANOMALY_TYPES) if types is None else list(types)
+    start_ns, end_ns = pd.Timestamp(start).value, pd.Timestamp(end).value
+    durations = rng.integers(min_minutes, max_minutes + 1, size=n) * 60 * 10**9
+    starts = rng.integers(start_ns, max(start_ns + 1, end_ns - durations.max()), size=n)
+    starts -= starts % 10**9  # Début à la seconde
+    return [
+        make_scenario(types[k], pd.Timestamp(int(s)), pd.Timestamp(int(s + d)))
+        for k, s, d in zip(rng.integers(0, len(types), size=n), np.sort(starts), durations)
+    ]
+
+
+def scenarios_frame(scenarios):
+    """Étiquettes des anomalies injectées: un intervalle (debut, fin, type) par scénario"""
+    return pd.DataFrame({
+        'debut': [scenario['start'] for scenario in scenarios],
+        'fin': [scenario['end'] for scenario in scenarios],
+        'type': [scenario['type'] for scenario in scenarios]
+    })
+
+
+def _apply(scenario, values, etats, t, rng):
+    """Applique un scénario aux lignes sélectionnées (values: tableau (n, 3), t: secondes écoulées)"""
+    kind = scenario['type']
+    duration = max((scenario['end'] - scenario['start']).total_seconds(), 1e-9)
+    progress = t / duration
+
+    if kind == 'vibration_spike':
+        values[:] = rng.uniform(scenario['low'], scenario['high'], size=values.shape)
+        etats[:] = 'panne'
+
+    elif kind == 'gradual_degradation':
+        values *= (1 + progress * scenario['factor'])[:, None]
+
+    elif kind == 'drift':
+        values[:, scenario['axes']] += (progress * scenario['amplitude'])[:, None]
+
+    elif kind == 'imbalance':
+        # Somme d'harmoniques de la vitesse de rotation, déphasée de 90° entre les axes radiaux X et Y
+        phase = 2 * np.pi * t / scenario['period_seconds']
+        for axis, shift in ((0, 0.0), (1, np.pi / 2)):
+            signal = sum(weight * np.sin((k + 1) * phase + shift)
+                         for k, weight in enumerate(scenario['harmonics']))
+            values[:, axis] += scenario['amplitude'] * np.abs(signal)
+
+    elif kind == 'bearing_defect':
+        # Salves de chocs périodiques à décroissance exponentielle
+        since_impact = np.mod(t, scenario['period_seconds'])
+        burst = np.where(since_impact < scenario['burst_seconds'],
+                         np.exp(-3 * since_impact / scenario['burst_seconds']), 0.0)
+        values[:, scenario['axes']] += (scenario['amplitude'] * burst)[:, None]
+
+    elif kind == 'sensor_dropout':
+        values[:, scenario['axes']] = 0.0
+
+    elif kind == 'stuck_sensor':
+        # Valeur figée au début de l'anomalie (mémorisée pour les blocs suivants du flux)
+        if 'stuck_values' not in scenario:
+            scenario['stuck_values'] = values[0, scenario['axes']].tolist()
+        values[:, scenario['axes']] = scenario['stuck_values']
+
+
+def apply_scenarios(df, scenarios, rng=None, label_column=None):
+    """Injecte les anomalies dans un DataFrame machine trié (bloc en mémoire ou bloc d'un flux).
+
+    Chaque scénario ne traite que la plage de lignes de son intervalle, par opérations sur
+    tableaux. Retourne une copie modifiée; avec label_column, une colonne indique le type
+    d'anomalie de chaque ligne (None hors anomalie).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    df = df.copy()
+    if label_column is not None:
+        df[label_column] = None
+    if len(df) == 0:
+        return df
+
+    ts_ns = timestamps_ns(df['timestamp'])
+    values = df[VIBRATION_COLUMNS].to_numpy(dtype=np.float64, copy=True)
+    etats = df['etat_machine'].to_numpy(dtype=object, copy=True)
+    labels = df[label_column].to_numpy(dtype=object, copy=True) if label_column is not None else None
+
+    for scenario in scenarios:
+        lo = int(np.searchsorted(ts_ns, scenario['start'].value, side='left'))
+        hi = int(np.searchsorted(ts_ns, scenario['end'].value, side='right'))
+        if lo >= hi:
+            continue
+        t = (ts_ns[lo:hi] - scenario['start'].value) / 1e9
+        _apply(scenario, values[lo:hi], etats[lo:hi], t, rng)
+        # Contraintes physiques, comme pour les données générées
+        values[lo:hi] = np.maximum(0, np.round(values[lo:hi], 2))
+        if labels is not None:
+            labels[lo:hi] = scenario['type']
+
+    for i, axis in enumerate(VIBRATION_COLUMNS):
+        df[axis] = values[:, i]
+    df['etat_machine'] = etats
+    if labels is not None:
+        df[label_column] = labels
+    return df
@@ -0,0 +1,135 @@
+import pandas as pd
+import os
+import threading
+from utils.storage import MACHINE_COLUMNS, normalize_machine_df, compact_machine_df
+
+# Caches partagés par tous les DataManager du processus (clé: emplacement des données)
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache(storage):
+    """Retourne le cache du processus associé à un stockage (créé au premier appel)"""
+    key = (storage.name, os.path.abspath(storage.data_dir))
+    with _shared_lock:
+        if key not in _shared_caches:
+            _shared_caches[key] = DataCache(storage)
+        return _shared_caches[key]
+
+
+class DataCache:
+    """Cache mémoire des données machine, invalidé par version du stockage.
+
+    Les lecteurs reçoivent un instantané qui n'est jamais modifié en place: une nouvelle
+    version remplace l'instantané publié. Quand le stockage ne fait que grandir, seule la
+    fin des données est relue.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._indexes = {}
+
+        # Représentation compacte des instantanés (voir compact_machine_df)
+        self.compact = False
+
+        # Vérification de la version du stockage à chaque lecture; désactivée lorsqu'un
+        # planificateur d'arrière-plan publie lui-même les nouvelles données (voir refresh)
+        self.auto_refresh = True
+
+    def get(self):
+        """Retourne l'instantané courant des données machine, rafraîchi si le stockage a changé"""
+        with self._lock:
+            if self._snapshot is None or self.auto_refresh:
+                version = self.storage.version()
+                if self._snapshot is None or version != self._version:
+                    self._refresh(version)
+            return self._snapshot.copy(deep=False)
+
+    def refresh(self):
+        """Publie un nouvel instantané si le stockage a changé; retourne True en cas de mise à jour"""
+        with self._lock:
+            version = self.storage.version()
+            if self._snapshot is not None and version == self._version:
+                return False
+            self._refresh(version)
+            return True
+
+    def _refresh(self, version):
+        """Met à jour l'instantané en ne relisant que les données modifiées si possible"""
+        changes = None
+        if self._snapshot is not None and self._version is not None and version is not None:
+            try:
+                changes = self.storage.read_changes(self._version)
+            except Exception as e:
+                print(f"Erreur lors de la lecture incrémentale, relecture complète: {e}")
+                changes = None
+
+        if changes is None:
+            if version is not None:
+                snapshot = self.storage.read()
+            else:
+                snapshot = normalize_machine_df(pd.DataFrame(columns=MACHINE_COLUMNS))
+            delta = None
+        else:
+            since, delta = changes
+            if self.compact:
+                delta = compact_machine_df(delta)
+            kept = self._snapshot if since is None else self._snapshot[self._snapshot['timestamp'] < since]
+            snapshot = pd.concat([kept, delta], ignore_index=True) if len(delta) > 0 else kept
+            if since is not None or not snapshot['timestamp'].is_monotonic_increasing:
+                delta = None  # Fin de l'historique remplacée: les index dérivés sont reconstruits
+
+        if self.compact and not isinstance(snapshot['etat_machine'].dtype, pd.CategoricalDtype):
+            snapshot = compact_machine_df(snapshot)  # Lecture complète ou nouvel état inconnu
+
+        # Les instantanés sont triés par horodatage pour permettre les recherches par intervalle
+        if not snapshot['timestamp'].is_monotonic_increasing:
+            snapshot = snapshot.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+        self._snapshot = snapshot
+        self._version = version
+
+        for index in self._indexes.values():
+            if delta is None:
+                index.rebuild(snapshot)
+            else:
+                index.append(delta)
+
+    def register_index(self, name, factory):
+        """Retourne l'index dérivé `name` (créé une seule fois par processus).
+
+        L'index doit fournir rebuild(snapshot) et append(nouvelles_lignes); il est tenu à jour
+        à chaque rafraîchissement de l'instantané.
+        """
+        with self._lock:
+            if name not in self._indexes:
+                index = factory()
+                if self._snapshot is not None:
+                    index.rebuild(self._snapshot)
+                self._indexes[name] = index
+            return self._indexes[name]
+
+    def set_compact(self, compact):
+        """Active ou désactive la représentation compacte (reconstruit l'instantané si besoin)"""
+        compact = bool(compact)
+        with self._lock:
+            if compact != self.compact:
+                self.compact = compact
+                self._snapshot = None
+                self._version = None
+
+    def memory_usage(self):
+        """Mémoire occupée par l'instantané courant (octets)"""
+        with self._lock:
+            if self._snapshot is None:
+                return 0
+            return int(self._snapshot.memory_usage(deep=True).sum())
+
+    def invalidate(self):
+        """Force la relecture complète au prochain accès"""
+        with self._lock:
+            self._snapshot = None
+            self._version = None
@@ -2,13 +2,39 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
-import random
+from utils.storage import create_storage
+from utils.anomalies import apply_scenarios, make_scenario
 
 class DataGenerator:
-    def __init__(self):
+    def __init__(self, storage=None, seed=None, sample_rate_hz=1/60):
+        # Moteur de stockage partagé avec le DataManager (Parquet ou CSV)
+        self.storage = storage if storage is not None else create_storage()
+        
+        # Générateur aléatoire propre à l'instance (reproductible avec une graine)
+        self.rng = np.random.default_rng(seed)
+        
+        # Fréquence d'échantillonnage (par défaut un échantillon par minute)
+        self.sample_rate_hz = sample_rate_hz
+        
         self.states = ['en_marche', 'panne', 'arret_production', 'probleme_qualite']
         self.state_probabilities = [0.7, 0.1, 0.15, 0.05]  # Probabilités de chaque état
         
+        # Durée de séjour dans chaque état (minutes, bornes incluses)
+        self.state_durations = {
+            'en_marche': (30, 180),        # 30min à 3h
+            'panne': (15, 60),             # 15min à 1h
+            'arret_production': (10, 45),  # 10min à 45min
+            'probleme_qualite': (5, 30)    # 5min à 30min
+        }
+        
+        # Probabilités de transition vers l'état suivant (chaîne de Markov)
+        self.transitions = {
+            'en_marche': {'en_marche': 0.85, 'panne': 0.05, 'arret_production': 0.08, 'probleme_qualite': 0.02},
+            'panne': {'en_marche': 0.7, 'arret_production': 0.3},
+            'arret_production': {'en_marche': 0.9, 'panne': 0.1},
+            'probleme_qualite': {'en_marche': 0.8, 'arret_production': 0.2}
+        }
+        
         # Paramètres de vibration selon l'état
         self.vibration_params = {
             'en_marche': {'mean': 0.8, 'std': 0.3, 'min': 0.2, 'max': 1.5},
@@ -22,95 +48,152 @@ class DataGenerator:
         params = self.vibration_params[state]
         
         # Génération avec distribution normale tronquée
-        vibration = np.random.normal(params['mean'], params['std'])
+        vibration = self.rng.normal(params['mean'], params['std'])
         vibration = np.clip(vibration, params['min'], params['max'])
         
         return round(vibration, 2)
     
-    def generate_state_sequence(self, duration_hours):
-        """Génère une séquence d'états réaliste avec transitions logiques"""
-        total_minutes = int(duration_hours * 60)  # Conversion en entier
-        states = []
-        current_state = 'en_marche'
-
-        i = 0
-        while i < total_minutes:
-            # Durée dans l'état actuel (variable selon l'état)
-            if current_state == 'en_marche':
-                duration = random.randint(30, 180)  # 30min à 3h
-            elif current_state == 'panne':
-                duration = random.randint(15, 60)   # 15min à 1h
-            elif current_state == 'arret_production':
-                duration = random.randint(10, 45)   # 10min à 45min
-            else:  # probleme_qualite
-                duration = random.randint(5, 30)    # 5min à 30min
-
-            # Ajout de l'état pour la durée calculée
-            for _ in range(min(duration, total_minutes - i)):
-                states.append(current_state)
-                i += 1
-
-            # Transition vers le prochain état
-            if current_state == 'en_marche':
-                current_state = np.random.choice(
-                    ['en_marche', 'panne', 'arret_production', 'probleme_qualite'],
-                    p=[0.85, 0.05, 0.08, 0.02]
-                )
-            elif current_state == 'panne':
-                current_state = np.random.choice(['en_marche', 'arret_production'], p=[0.7, 0.3])
-            elif current_state == 'arret_production':
-                current_state = np.random.choice(['en_marche', 'panne'], p=[0.9, 0.1])
-            else:  # probleme_qualite
-                current_state = np.random.choice(['en_marche', 'arret_production'], p=[0.8, 0.2])
-
-        return states[:total_minutes]
+    def generate_state_runs(self, n_runs, initial_state='en_marche'):
+        """Tire n_runs séjours consécutifs de la chaîne de Markov des états.
+        
+        Les tirages (transitions et durées) sont faits en tableaux; seul le parcours de la chaîne
+        reste séquentiel, sur des entiers. Retourne (codes d'état, durées en secondes, code de
+        l'état suivant le dernier séjour).
+        """
+        matrix = np.array([[self.transitions[a].get(b, 0.0) for b in self.states] for a in self.states])
+        cdf = np.cumsum(matrix, axis=1)
+        cdf[:, -1] = 1.0
+        
+        # État suivant pour chaque tirage et chaque état courant possible
+        u = self.rng.random(n_runs)
+        next_states = (u[:, None, None] >= cdf[None, :, :]).sum(axis=2).tolist()
+        
+        codes = np.empty(n_runs, dtype=np.int8)
+        state = self.states.index(initial_state) if isinstance(initial_state, str) else int(initial_state)
+        for i in range(n_runs):
+            codes[i] = state
+            state = next_states[i][state]
+        
+        bounds = np.array([self.state_durations[name] for name in self.states])
+        minutes = self.rng.integers(bounds[codes, 0], bounds[codes, 1] + 1)
+        return codes, minutes * 60, state
     
-    def generate_data(self, start_time, duration_hours):
-        """Génère un dataset complet pour la période spécifiée"""
-        states = self.generate_state_sequence(duration_hours)
-        
-        data = []
-        current_time = start_time
-        
-        for state in states:
-            # Génération des vibrations pour chaque axe
-            vib_x = self.generate_vibration(state)
-            vib_y = self.generate_vibration(state)
-            vib_z = self.generate_vibration(state)
-            
-            # Ajout de corrélation entre les axes
-            if state == 'panne':
-                # En cas de panne, les vibrations sont corrélées
-                correlation_factor = random.uniform(0.7, 0.9)
-                vib_y = vib_x * correlation_factor + random.uniform(-0.2, 0.2)
-                vib_z = vib_x * correlation_factor + random.uniform(-0.2, 0.2)
-            
-            # Ajout de bruit réaliste
-            vib_x += random.uniform(-0.05, 0.05)
-            vib_y += random.uniform(-0.05, 0.05)
-            vib_z += random.uniform(-0.05, 0.05)
+    def iter_state_chunks(self, n_samples, sample_rate_hz=None, chunk_size=1_000_000,
+                          initial_state='en_marche', runs_per_block=1024):
+        """Produit la séquence des codes d'état échantillonnée à sample_rate_hz, par blocs.
+        
+        Les séjours sont tirés par lots puis développés avec np.repeat; un séjour plus long qu'un
+        bloc est découpé, de sorte que la mémoire reste bornée par chunk_size quelle que soit la
+        fréquence (1/60 Hz, 1 Hz, 10 Hz, 1 kHz...).
+        """
+        rate = self.sample_rate_hz if sample_rate_hz is None else sample_rate_hz
+        state = initial_state
+        codes = np.empty(0, dtype=np.int8)
+        counts = np.empty(0, dtype=np.int64)
+        produced = 0
+        while produced < n_samples:
+            need = min(chunk_size, n_samples - produced)
+            while counts.sum() < need:
+                new_codes, seconds, state = self.generate_state_runs(runs_per_block, state)
+                codes = np.concatenate((codes, new_codes))
+                counts = np.concatenate((counts, np.maximum(1, np.round(seconds * rate)).astype(np.int64)))
             
-            # Contraintes physiques
-            vib_x = max(0, round(vib_x, 2))
-            vib_y = max(0, round(vib_y, 2))
-            vib_z = max(0, round(vib_z, 2))
+            # Séjours entièrement contenus dans le bloc, puis partie du séjour à cheval
+            cumulative = np.cumsum(counts)
+            k = int(np.searchsorted(cumulative, need, side='left'))
+            taken = counts[:k + 1].copy()
+            taken[k] -= cumulative[k] - need
+            yield np.repeat(codes[:k + 1], taken)
             
-            data.append({
-                'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'etat_machine': state,
-                'vibration_x': vib_x,
-                'vibration_y': vib_y,
-                'vibration_z': vib_z
-            })
-            
-            current_time += timedelta(minutes=1)
+            counts = counts[k:].copy()
+            counts[0] = cumulative[k] - need
+            codes = codes[k:]
+            if counts[0] == 0:
+                codes, counts = codes[1:], counts[1:]
+            produced += need
+    
+    def generate_state_sequence(self, duration_hours):
+        """Génère une séquence d'états réaliste avec transitions logiques (un état par minute)"""
+        total_minutes = int(duration_hours * 60)  # Conversion en entier
+        if total_minutes <= 0:
+            return []
+        codes = next(self.iter_state_chunks(total_minutes, 1 / 60, chunk_size=total_minutes))
+        return np.asarray(self.states, dtype=object)[codes].tolist()
+    
+    def generate_vibrations(self, states):
+        """Génère les vibrations (X, Y, Z) de toute une séquence d'états en une fois.
+        
+        Même modèle que generate_vibration, appliqué aux tableaux: normale tronquée selon l'état,
+        corrélation des axes Y et Z avec X en panne, bruit uniforme, arrondi et valeurs positives.
+        Accepte des noms d'états ou leurs codes (indices dans self.states). Retourne un tableau (n, 3).
+        """
+        codes = np.asarray(states)
+        if not np.issubdtype(codes.dtype, np.integer):
+            codes = pd.Categorical(states, categories=self.states).codes
+        n = len(codes)
+        params = {
+            key: np.array([self.vibration_params[state][key] for state in self.states])[codes, None]
+            for key in ['mean', 'std', 'min', 'max']
+        }
+        
+        vibrations = self.rng.normal(params['mean'], params['std'], size=(n, 3))
+        vibrations = np.round(np.clip(vibrations, params['min'], params['max']), 2)
         
-        return pd.DataFrame(data)
+        # En cas de panne, les vibrations sont corrélées (même facteur pour Y et Z)
+        panne = np.flatnonzero(codes == self.states.index('panne'))
+        correlation_factor = self.rng.uniform(0.7, 0.9, size=len(panne))
+        for axis in (1, 2):
+            vibrations[panne, axis] = (vibrations[panne, 0] * correlation_factor
+                                       + self.rng.uniform(-0.2, 0.2, size=len(panne)))
+        
+        # Ajout de bruit réaliste, puis contraintes physiques
+        vibrations += self.rng.uniform(-0.05, 0.05, size=(n, 3))
+        return np.maximum(0, np.round(vibrations, 2))
+    
+    def iter_data_chunks(self, start_time, duration_hours, sample_rate_hz=None, chunk_size=1_000_000,
+                         initial_state='en_marche'):
+        """Génère les données de la période par DataFrames d'au plus chunk_size lignes"""
+        rate = self.sample_rate_hz if sample_rate_hz is None else sample_rate_hz
+        n_samples = int(round(duration_hours * 3600 * rate, 6))
+        period_ns = int(round(1e9 / rate))
+        
+        # Horodatages natifs datetime64 (à la seconde près pour les périodes d'au moins une seconde)
+        start = pd.Timestamp(start_time)
+        if period_ns % 10**9 == 0:
+            start = start.floor('s')
+        start_ns = start.value
+        
+        state_names = np.asarray(self.states, dtype=object)
+        offset = 0
+        for codes in self.iter_state_chunks(n_samples, rate, chunk_size, initial_state):
+            vibrations = self.generate_vibrations(codes)
+            timestamps = start_ns + (offset + np.arange(len(codes), dtype=np.int64)) * period_ns
+            offset += len(codes)
+            yield pd.DataFrame({
+                'timestamp': timestamps.view('datetime64[ns]'),
+                'etat_machine': state_names[codes],
+                'vibration_x': vibrations[:, 0],
+                'vibration_y': vibrations[:, 1],
+                'vibration_z': vibrations[:, 2]
+            })
+    
+    def generate_data(self, start_time, duration_hours, sample_rate_hz=None):
+        """Génère un dataset complet pour la période spécifiée (par défaut un échantillon par minute)"""
+        chunks = list(self.iter_data_chunks(start_time, duration_hours, sample_rate_hz, chunk_size=10**7))
+        if not chunks:
+            return pd.DataFrame({
+                'timestamp': pd.Series(dtype='datetime64[ns]'),
+                'etat_machine': pd.Series(dtype=object),
+                'vibration_x': pd.Series(dtype='float64'),
+                'vibration_y': pd.Series(dtype='float64'),
+                'vibration_z': pd.Series(dtype='float64')
+            })
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
     
     def generate_initial_data(self, days=7):
         """Génère les données initiales pour le dashboard"""
-        if not os.path.exists('data'):
-            os.makedirs('data')
+        if not os.path.exists(self.storage.data_dir):
+            os.makedirs(self.storage.data_dir)
 
         # Génération des données des 7 derniers jours jusqu'à maintenant
         end_time = datetime.now()
@@ -119,7 +202,7 @@ class DataGenerator:
         df = self.generate_data(start_time, days * 24)
 
         # Sauvegarde
-        df.to_csv('data/machine_data.csv', index=False)
+        self.storage.write(df)
         print(f"✅ Données initiales générées: {len(df)} enregistrements")
         print(f"📅 Période: {start_time.strftime('%Y-%m-%d %H:%M')} à {end_time.strftime('%Y-%m-%d %H:%M')}")
 
@@ -127,37 +210,27 @@ class DataGenerator:
     
     def generate_additional_data(self, hours=24):
         """Ajoute de nouvelles données au dataset existant"""
-        # Chargement des données existantes
-        if os.path.exists('data/machine_data.csv'):
-            existing_df = pd.read_csv('data/machine_data.csv')
-            last_timestamp = pd.to_datetime(existing_df['timestamp'].iloc[-1])
-        else:
-            existing_df = pd.DataFrame()
+        # Dernier horodatage lu sans charger l'historique (fin de fichier ou métadonnées)
+        last_timestamp = self.storage.last_timestamp()
+        if last_timestamp is None:
             last_timestamp = datetime.now() - timedelta(hours=hours)
 
         # Génération des nouvelles données
-        start_time = last_timestamp + timedelta(minutes=1)
+        start_time = last_timestamp + timedelta(seconds=1 / self.sample_rate_hz)
         new_df = self.generate_data(start_time, hours)
 
-        # Fusion et sauvegarde
-        if len(existing_df) > 0:
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-        else:
-            combined_df = new_df
-
-        combined_df.to_csv('data/machine_data.csv', index=False)
+        # Ajout des seules nouvelles lignes
+        self.storage.append(new_df)
         print(f"✅ {len(new_df)} nouveaux enregistrements ajoutés")
 
         return new_df
 
     def update_to_current_time(self):
-        """Met à jour les données jusqu'au moment présent"""
-        if not os.path.exists('data/machine_data.csv'):
+        """Met à jour les données jusqu'au moment présent (retourne les lignes ajoutées)"""
+        last_timestamp = self.storage.last_timestamp()
+        if last_timestamp is None:
             return self.generate_initial_data()
 
-        # Chargement des données existantes
-        existing_df = pd.read_csv('data/machine_data.csv')
-        last_timestamp = pd.to_datetime(existing_df['timestamp'].iloc[-1])
         current_time = datetime.now()
 
         # Calcul du temps écoulé depuis la dernière donnée
@@ -171,40 +244,34 @@ class DataGenerator:
             print(f"🔄 Mise à jour des données: {hours_missing:.1f}h manquantes, génération de {hours_to_generate:.1f}h")
             return self.generate_additional_data(hours_to_generate)
 
-        return existing_df
+        return pd.DataFrame(columns=['timestamp', 'etat_machine', 'vibration_x', 'vibration_y', 'vibration_z'])
     
     def simulate_anomaly(self, anomaly_type='vibration_spike'):
-        """Simule une anomalie spécifique dans les données"""
-        if not os.path.exists('data/machine_data.csv'):
-            self.generate_initial_data()
+        """Simule une anomalie récente (voir utils.anomalies.ANOMALY_TYPES).
         
-        df = pd.read_csv('data/machine_data.csv')
+        Seule la plage concernée est lue, modifiée par opérations sur tableaux puis réécrite.
+        Retourne les lignes modifiées.
+        """
+        if not self.storage.exists():
+            self.generate_initial_data()
         
+        # Position de l'anomalie en nombre d'échantillons avant la dernière mesure
+        last_timestamp = pd.Timestamp(self.storage.last_timestamp())
+        period = pd.Timedelta(seconds=1 / self.sample_rate_hz)
         if anomaly_type == 'vibration_spike':
-            # Ajout d'un pic de vibration
-            anomaly_start = len(df) - random.randint(50, 200)
-            anomaly_duration = random.randint(5, 15)
-            
-            for i in range(anomaly_start, min(anomaly_start + anomaly_duration, len(df))):
-                df.loc[i, 'vibration_x'] = random.uniform(3.0, 5.0)
-                df.loc[i, 'vibration_y'] = random.uniform(3.0, 5.0)
-                df.loc[i, 'vibration_z'] = random.uniform(3.0, 5.0)
-                df.loc[i, 'etat_machine'] = 'panne'
-        
+            start = last_timestamp - int(self.rng.integers(50, 201)) * period
+            end = start + int(self.rng.integers(5, 16) - 1) * period
         elif anomaly_type == 'gradual_degradation':
-            # Dégradation progressive
-            degradation_start = len(df) - random.randint(200, 500)
-            
-            for i in range(degradation_start, len(df)):
-                progress = (i - degradation_start) / (len(df) - degradation_start)
-                degradation_factor = 1 + progress * 0.5  # Augmentation progressive
-                
-                df.loc[i, 'vibration_x'] *= degradation_factor
-                df.loc[i, 'vibration_y'] *= degradation_factor
-                df.loc[i, 'vibration_z'] *= degradation_factor
-        
-        df.to_csv('data/machine_data.csv', index=False)
-        print(f"✅ Anomalie '{anomaly_type}' simulée")
+            start = last_timestamp - int(self.rng.integers(200, 501)) * period
+            end = last_timestamp
+        else:
+            start = last_timestamp - int(self.rng.integers(120, 481)) * period
+            end = min(last_timestamp, start + int(self.rng.integers(30, 121)) * period)
+        
+        df = self.storage.read(start=start, end=end)
+        df = apply_scenarios(df, [make_scenario(anomaly_type, start, end)], self.rng)
+        self.storage.replace_range(df)
+        print(f"✅ Anomalie '{anomaly_type}' simulée ({len(df)} échantillons)")
         
         return df
 
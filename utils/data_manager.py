@@ -4,14 +4,24 @@ import os
 import json
 from datetime import datetime, timedelta
 import warnings
+from utils.storage import create_storage
+from utils.data_cache import get_shared_cache
+from utils.segments import stop_intervals, stopped_mask, timestamps_ns
+from utils.kpi_engine import StateSegments, StateIndex
+from utils.rollups import RollupIndex
+from utils.stop_detector import IncrementalStopDetector, build_stop_records
+from utils.detection_job import StopDetectionJob
+from utils.stop_store import StopStore, ARRETS_COLUMNS, ARRETS_AUTO_COLUMNS
 warnings.filterwarnings('ignore')
 
 class DataManager:
-    def __init__(self):
-        self.data_file = 'data/machine_data.csv'
-        self.arrets_file = 'data/arrets_data.csv'
-        self.arrets_auto_file = 'data/arrets_auto_data.csv'
-        self.config_file = 'data/config.json'
+    def __init__(self, data_dir='data'):
+        self.data_dir = data_dir
+        self.arrets_file = os.path.join(data_dir, 'arrets_data.csv')
+        self.arrets_auto_file = os.path.join(data_dir, 'arrets_auto_data.csv')
+        self.classifications_auto_file = os.path.join(data_dir, 'classifications_auto.csv')
+        self.stops_db_file = os.path.join(data_dir, 'arrets.db')
+        self.config_file = os.path.join(data_dir, 'config.json')
         
         # Seuil de vibration pour détecter l'arrêt (proche de zéro)
         self.seuil_arret_vibration = 0.1
@@ -68,12 +78,39 @@ class DataManager:
         # Niveaux d'urgence
         self.niveaux_urgence = ["Faible", "Moyen", "Élevé", "Critique"]
         
+        # Colonnes du journal des classifications d'arrêts auto
+        self.classification_columns = [
+            'arret_id', 'type_arret', 'sous_categorie', 'commentaire',
+            'operateur', 'urgence', 'date_classification'
+        ]
+        
         # Création du dossier data si nécessaire
-        if not os.path.exists('data'):
-            os.makedirs('data')
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
         
         # Chargement de la configuration
         self.load_config()
+        
+        # Moteur de stockage des données machine (Parquet partitionné par jour ou CSV)
+        self.storage = create_storage(self.config.get('storage_backend'), data_dir)
+        
+        # Cache mémoire partagé par le processus (invalidé par version de fichier)
+        self.cache = get_shared_cache(self.storage)
+        self.cache.set_compact(self.config.get('compact_memory', False))
+        
+        # Index cumulé des états (KPIs sur une période sans parcourir les données)
+        self.state_index = self.cache.register_index('state', StateIndex)
+        
+        # Agrégats multi-résolution des vibrations (graphiques et statistiques sur de longues périodes)
+        self.rollups = self.cache.register_index('rollups', RollupIndex)
+        
+        # Détecteur d'arrêts incrémental (ne traite que les échantillons non encore analysés)
+        self.stop_detector = IncrementalStopDetector(os.path.join(data_dir, 'stop_detector_state.json'))
+        self.detection_job = None  # Dernière détection lancée en arrière-plan
+        
+        # Base SQLite des arrêts manuels et automatiques (migration automatique des anciens CSV)
+        self.stops = StopStore(self.stops_db_file)
+        self._migrate_stop_csvs()
     
     def load_config(self):
         """Charge la configuration du système"""
@@ -83,7 +120,15 @@ class DataManager:
             'seuil_arret_vibration': 0.1,
             'duree_min_arret': 2,  # minutes
             'auto_detection_enabled': True,
-            'notifications_enabled': True
+            'notifications_enabled': True,
+            'storage_backend': None,  # None = Parquet si pyarrow est installé, sinon CSV
+            'cache_enabled': True,
+            'compact_memory': False,  # État catégoriel et vibrations en float32 dans le cache
+            'rollup_max_points': 1500,  # Nombre maximal d'intervalles agrégés par graphique
+            'max_points_graphique': 1000,  # Points affichés par courbe (sous-échantillonnage LTTB)
+            'seuil_webgl_points': 5000,  # Au-delà, rendu WebGL (Scattergl) et décimation min/max
+            'refresh_interval_seconds': 60,  # Cadence de la mise à jour des données en arrière-plan
+            'detection_chunk_hours': 24  # Taille des blocs de la détection d'arrêts en arrière-plan
         }
         
         if os.path.exists(self.config_file):
@@ -109,57 +154,102 @@ class DataManager:
         """Met à jour un paramètre de configuration"""
         self.config[key] = value
         self.save_config()
+        if key == 'compact_memory':
+            self.cache.set_compact(value)
     
     def detect_machine_stops(self, df):
         """Détecte automatiquement les arrêts de machine basés sur les vibrations"""
         if len(df) == 0:
             return []
         
-        # Calcul de la vibration totale (magnitude)
-        df = df.copy()
-        df['vibration_totale'] = np.sqrt(
-            df['vibration_x']**2 + 
-            df['vibration_y']**2 + 
-            df['vibration_z']**2
-        )
-        
-        # Détection des périodes d'arrêt (vibration proche de zéro)
-        df['machine_arretee'] = df['vibration_totale'] <= self.config['seuil_arret_vibration']
-        
-        # Identification des transitions
-        df['transition'] = df['machine_arretee'].diff()
-        
-        arrets_detectes = []
-        debut_arret = None
-        
-        for idx, row in df.iterrows():
-            # Début d'arrêt (transition vers arrêt)
-            if row['transition'] == True:
-                debut_arret = row['timestamp']
-            
-            # Fin d'arrêt (transition vers fonctionnement)
-            elif row['transition'] == False and debut_arret is not None:
-                fin_arret = row['timestamp']
-                duree_minutes = (pd.to_datetime(fin_arret) - pd.to_datetime(debut_arret)).total_seconds() / 60
-                
-                # Ne considérer que les arrêts de plus de la durée minimale configurée
-                if duree_minutes >= self.config['duree_min_arret']:
-                    arrets_detectes.append({
-                        'debut_arret': debut_arret,
-                        'fin_arret': fin_arret,
-                        'duree_minutes': round(duree_minutes, 1),
-                        'statut': 'detecte_auto',
-                        'necessite_classification': True,
-                        'date_detection': datetime.now(),
-                        'classifie': False
-                    })
-                
-                debut_arret = None
+        # Calcul de la vibration totale (magnitude) et des périodes d'arrêt (vibration proche de zéro)
+        machine_arretee = stopped_mask(df, self.config['seuil_arret_vibration'])
         
-        return arrets_detectes
+        # Segments d'arrêt extraits en une passe (encodage par plages), filtrés sur la durée minimale
+        ts_ns = timestamps_ns(df['timestamp'])
+        debuts, fins, durees = stop_intervals(machine_arretee, ts_ns, self.config['duree_min_arret'])
+        
+        return build_stop_records(ts_ns[debuts], ts_ns[fins], durees)
+    
+    def detect_new_stops(self, save=True):
+        """Détecte les arrêts terminés depuis le dernier appel (point de reprise persistant)"""
+        try:
+            last_timestamp = self.stop_detector.last_timestamp
+            if (self.stop_detector.state['seuil_arret_vibration'] != self.config['seuil_arret_vibration'] or
+                    self.stop_detector.state['duree_min_arret'] != self.config['duree_min_arret']):
+                last_timestamp = None  # Paramètres modifiés: tout l'historique est réanalysé
+            
+            df = self.load_data(start=last_timestamp)
+            nouveaux_arrets = self.stop_detector.process(
+                df, self.config['seuil_arret_vibration'], self.config['duree_min_arret']
+            )
+            
+            if save:
+                self.save_arrets_auto(nouveaux_arrets)
+            return nouveaux_arrets
+        except Exception as e:
+            print(f"Erreur lors de la détection incrémentale des arrêts: {e}")
+            return []
+    
+    def start_detection_job(self, reanalyse=False):
+        """Lance la détection des arrêts en arrière-plan (une seule à la fois) et retourne la tâche"""
+        if self.detection_job is not None and self.detection_job.is_running():
+            return self.detection_job
+        self.detection_job = StopDetectionJob(
+            self, reanalyse=reanalyse, chunk_hours=self.config.get('detection_chunk_hours', 24)
+        ).start()
+        return self.detection_job
+    
+    def _migrate_stop_csvs(self):
+        """Importe une seule fois les anciens fichiers CSV d'arrêts dans la base SQLite"""
+        try:
+            if self.stops.get_meta('migration_arrets_csv') is None:
+                if os.path.exists(self.arrets_file):
+                    imported = self.stops.import_arrets(self._read_arrets().sort_values('timestamp'))
+                    print(f"✅ {imported} arrêts manuels importés dans {self.stops_db_file}")
+                self.stops.set_meta('migration_arrets_csv', datetime.now().isoformat())
+            
+            if self.stops.get_meta('migration_arrets_auto_csv') is None:
+                if os.path.exists(self.arrets_auto_file):
+                    arrets_auto_df = self._apply_classifications(
+                        self._read_arrets_auto(), self._read_classifications_auto()
+                    )
+                    imported = self.stops.import_arrets_auto(arrets_auto_df)
+                    print(f"✅ {imported} arrêts auto importés dans {self.stops_db_file}")
+                self.stops.set_meta('migration_arrets_auto_csv', datetime.now().isoformat())
+        except Exception as e:
+            print(f"Erreur lors de la migration des arrêts vers SQLite: {e}")
     
     def load_arrets_auto(self):
-        """Charge les arrêts détectés automatiquement"""
+        """Charge les arrêts détectés automatiquement (indexés par arret_id)"""
+        try:
+            return self.stops.query_arrets_auto()
+        except Exception as e:
+            print(f"Erreur lors du chargement des arrêts auto: {e}")
+            return self._create_empty_arrets_auto_df()
+    
+    def get_arrets_auto_page(self, page=0, page_size=10, classifie=None, types=None, operateurs=None,
+                             start=None, end=None):
+        """Retourne une page d'arrêts auto filtrés et le nombre total d'arrêts correspondants"""
+        try:
+            total = self.stops.count_arrets_auto(classifie, start, end, types, operateurs)
+            arrets_df = self.stops.query_arrets_auto(classifie, start, end, types, operateurs,
+                                                     limit=page_size, offset=page * page_size)
+            return arrets_df, total
+        except Exception as e:
+            print(f"Erreur lors de la lecture des arrêts auto: {e}")
+            return self._create_empty_arrets_auto_df(), 0
+    
+    def count_arrets_auto(self, classifie=None):
+        """Nombre d'arrêts auto (éventuellement limité aux arrêts classifiés ou non)"""
+        try:
+            return self.stops.count_arrets_auto(classifie)
+        except Exception as e:
+            print(f"Erreur lors du comptage des arrêts auto: {e}")
+            return 0
+    
+    def _read_arrets_auto(self):
+        """Lit l'ancien fichier CSV des arrêts détectés automatiquement (migration)"""
         if os.path.exists(self.arrets_auto_file):
             try:
                 df = pd.read_csv(self.arrets_auto_file)
@@ -169,6 +259,13 @@ class DataManager:
                     df['date_detection'] = pd.to_datetime(df['date_detection'])
                 if 'date_classification' in df.columns:
                     df['date_classification'] = pd.to_datetime(df['date_classification'])
+                
+                # Attribution d'un identifiant stable aux arrêts qui n'en ont pas
+                if 'arret_id' not in df.columns or df['arret_id'].isna().any():
+                    df = self._assign_arret_ids(df)
+                
+                df['arret_id'] = df['arret_id'].astype(np.int64)
+                df.index = df['arret_id'].to_numpy()
                 return df.sort_values('debut_arret', ascending=False)
             except Exception as e:
                 print(f"Erreur lors du chargement des arrêts auto: {e}")
@@ -178,83 +275,230 @@ class DataManager:
     
     def _create_empty_arrets_auto_df(self):
         """Crée un DataFrame vide pour les arrêts automatiques"""
-        return pd.DataFrame(columns=[
-            'debut_arret', 'fin_arret', 'duree_minutes', 'statut',
-            'type_arret', 'sous_categorie', 'commentaire', 'operateur', 
-            'classifie', 'date_detection', 'date_classification', 'urgence'
-        ])
+        return pd.DataFrame(columns=ARRETS_AUTO_COLUMNS)
+    
+    def _assign_arret_ids(self, df, next_id=None):
+        """Attribue des identifiants croissants (dans l'ordre des débuts) aux arrêts sans identifiant"""
+        df = df.copy()
+        if 'arret_id' not in df.columns:
+            df['arret_id'] = np.nan
+        ids = pd.to_numeric(df['arret_id'], errors='coerce')
+        if next_id is None:
+            next_id = int(ids.max()) + 1 if ids.notna().any() else 1
+        
+        missing = ids.isna().to_numpy()
+        ordre = np.argsort(timestamps_ns(df['debut_arret'])[missing], kind='stable')
+        new_ids = np.empty(int(missing.sum()), dtype=np.int64)
+        new_ids[ordre] = np.arange(next_id, next_id + len(new_ids))
+        ids[missing] = new_ids
+        df['arret_id'] = ids.astype(np.int64)
+        return df
+    
+    def _read_classifications_auto(self):
+        """Lit l'ancien journal CSV des classifications d'arrêts auto (migration)"""
+        if os.path.exists(self.classifications_auto_file):
+            try:
+                journal = pd.read_csv(self.classifications_auto_file)
+                journal['date_classification'] = pd.to_datetime(journal['date_classification'])
+                return journal
+            except Exception as e:
+                print(f"Erreur lors du chargement du journal des classifications: {e}")
+        return pd.DataFrame(columns=self.classification_columns)
+    
+    def _apply_classifications(self, arrets_df, journal):
+        """Reporte sur la table des arrêts la dernière classification de chaque arrêt du journal"""
+        if len(journal) == 0 or len(arrets_df) == 0:
+            return arrets_df
+        
+        journal = journal.drop_duplicates('arret_id', keep='last')
+        journal = journal[journal['arret_id'].isin(arrets_df.index)]
+        if len(journal) == 0:
+            return arrets_df
+        
+        # Mise à jour par identifiant (index de la table)
+        ids = journal['arret_id'].to_numpy()
+        for column in self.classification_columns[1:] + ['classifie']:
+            if column not in arrets_df.columns:
+                arrets_df[column] = None
+            if column != 'date_classification':
+                arrets_df[column] = arrets_df[column].astype(object)
+        arrets_df.loc[ids, self.classification_columns[1:]] = journal[self.classification_columns[1:]].to_numpy()
+        arrets_df.loc[ids, 'classifie'] = True
+        arrets_df['date_classification'] = pd.to_datetime(arrets_df['date_classification'])
+        return arrets_df
     
     def save_arret_auto(self, arret_data):
         """Sauvegarde un arrêt détecté automatiquement"""
-        arrets_df = self.load_arrets_auto()
-        
-        # Vérification des doublons
-        if len(arrets_df) > 0:
-            # Vérifier si un arrêt similaire existe déjà
-            debut_arret = pd.to_datetime(arret_data['debut_arret'])
-            existing = arrets_df[
-                (abs((arrets_df['debut_arret'] - debut_arret).dt.total_seconds()) < 300)  # 5 minutes de tolérance
-            ]
-            if len(existing) > 0:
-                return False  # Arrêt déjà existant
-        
-        new_arret = pd.DataFrame([arret_data])
-        arrets_df = pd.concat([new_arret, arrets_df], ignore_index=True)
-        arrets_df.to_csv(self.arrets_auto_file, index=False)
-        return True
+        return len(self.save_arrets_auto([arret_data])) > 0
+    
+    def save_arrets_auto(self, arrets, tolerance_seconds=300):
+        """Sauvegarde en une seule transaction une liste d'arrêts détectés automatiquement.
+        
+        Un arrêt dont le début est à moins de `tolerance_seconds` d'un arrêt existant (ou d'un
+        arrêt déjà retenu dans le lot) est considéré comme un doublon. Retourne les arrêts insérés.
+        """
+        if len(arrets) == 0:
+            return []
+        try:
+            return self.stops.insert_arrets_auto(arrets, tolerance_seconds)
+        except Exception as e:
+            print(f"Erreur lors de la sauvegarde des arrêts auto: {e}")
+            return []
     
     def classifier_arret(self, arret_id, type_arret, sous_categorie, commentaire, operateur, urgence="Moyen"):
         """Classifie un arrêt détecté automatiquement"""
-        arrets_df = self.load_arrets_auto()
-        
-        if arret_id < len(arrets_df):
-            arrets_df.loc[arret_id, 'type_arret'] = type_arret
-            arrets_df.loc[arret_id, 'sous_categorie'] = sous_categorie
-            arrets_df.loc[arret_id, 'commentaire'] = commentaire
-            arrets_df.loc[arret_id, 'operateur'] = operateur
-            arrets_df.loc[arret_id, 'urgence'] = urgence
-            arrets_df.loc[arret_id, 'classifie'] = True
-            arrets_df.loc[arret_id, 'date_classification'] = datetime.now()
-            
-            arrets_df.to_csv(self.arrets_auto_file, index=False)
-            return True
-        return False
+        return self.classifier_arrets([arret_id], type_arret, sous_categorie, commentaire, operateur, urgence) > 0
+    
+    def classifier_arrets(self, arret_ids, type_arret, sous_categorie, commentaire, operateur, urgence="Moyen"):
+        """Classifie plusieurs arrêts auto en une seule transaction.
+        
+        Retourne le nombre d'arrêts classifiés (les identifiants inconnus sont ignorés).
+        """
+        try:
+            classification = {
+                'type_arret': type_arret,
+                'sous_categorie': sous_categorie,
+                'commentaire': commentaire,
+                'operateur': operateur,
+                'urgence': urgence
+            }
+            return self.stops.classify_arrets_auto(arret_ids, classification, datetime.now())
+        except Exception as e:
+            print(f"Erreur lors de la classification des arrêts: {e}")
+            return 0
     
     def get_arrets_non_classifies(self):
         """Retourne les arrêts non encore classifiés"""
-        arrets_df = self.load_arrets_auto()
-        if len(arrets_df) == 0:
-            return arrets_df
-        return arrets_df[arrets_df.get('classifie', False) != True]
+        try:
+            return self.stops.query_arrets_auto(classifie=False)
+        except Exception as e:
+            print(f"Erreur lors du chargement des arrêts non classifiés: {e}")
+            return self._create_empty_arrets_auto_df()
     
-    def load_data(self):
-        """Charge les données de la machine"""
-        if os.path.exists(self.data_file):
+    def load_data(self, start=None, end=None, columns=None):
+        """Charge les données de la machine, éventuellement limitées à [start, end] et à certaines colonnes"""
+        if self.config.get('cache_enabled', True):
             try:
-                df = pd.read_csv(self.data_file)
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                return df
+                return self._slice_snapshot(self.cache.get(), start, end, columns)
+            except Exception as e:
+                print(f"Erreur lors de la lecture du cache: {e}")
+        
+        if self.storage.exists():
+            try:
+                return self.storage.read(start=start, end=end, columns=columns)
             except Exception as e:
                 print(f"Erreur lors du chargement des données: {e}")
-                return self._create_empty_machine_df()
+                return self._create_empty_machine_df(columns)
         else:
-            return self._create_empty_machine_df()
+            return self._create_empty_machine_df(columns)
     
-    def _create_empty_machine_df(self):
+    def load_data_since(self, last_timestamp, columns=None):
+        """Charge uniquement les lignes strictement postérieures à last_timestamp"""
+        df = self.load_data(start=last_timestamp, columns=columns)
+        if len(df) == 0:
+            return df
+        debut = df['timestamp'].searchsorted(pd.to_datetime(last_timestamp), side='right')
+        return df.iloc[debut:].reset_index(drop=True)
+    
+    def _slice_snapshot(self, snapshot, start=None, end=None, columns=None):
+        """Extrait un intervalle de l'instantané trié par recherche dichotomique"""
+        timestamps = snapshot['timestamp'].values
+        lo = 0 if start is None else np.searchsorted(timestamps, np.datetime64(pd.to_datetime(start)), side='left')
+        hi = len(snapshot) if end is None else np.searchsorted(timestamps, np.datetime64(pd.to_datetime(end)), side='right')
+        if lo > 0 or hi < len(snapshot):
+            snapshot = snapshot.iloc[lo:hi].reset_index(drop=True)
+        if columns is not None:
+            snapshot = snapshot[['timestamp'] + [col for col in columns if col != 'timestamp']]
+        return snapshot
+    
+    def _create_empty_machine_df(self, columns=None):
         """Crée un DataFrame vide pour les données machine"""
-        return pd.DataFrame(columns=['timestamp', 'etat_machine', 'vibration_x', 'vibration_y', 'vibration_z'])
+        df = pd.DataFrame(columns=['timestamp', 'etat_machine', 'vibration_x', 'vibration_y', 'vibration_z'])
+        if columns is not None:
+            df = df[['timestamp'] + [col for col in columns if col != 'timestamp']]
+        return df
+    
+    def get_data_summary(self):
+        """Retourne le nombre d'enregistrements et la période couverte sans charger les données"""
+        try:
+            if self.config.get('cache_enabled', True) and not self.cache.auto_refresh:
+                # Instantané publié par le planificateur: aucune lecture du stockage
+                snapshot = self.cache.get()
+                if len(snapshot) == 0:
+                    return {'rows': 0, 'first': None, 'last': None}
+                return {
+                    'rows': len(snapshot),
+                    'first': snapshot['timestamp'].iloc[0],
+                    'last': snapshot['timestamp'].iloc[-1]
+                }
+            return self.storage.summary()
+        except Exception as e:
+            print(f"Erreur lors de la lecture du résumé des données: {e}")
+            return {'rows': 0, 'first': None, 'last': None}
+    
+    def refresh_snapshot(self):
+        """Publie immédiatement les dernières données du stockage dans le cache partagé"""
+        if self.config.get('cache_enabled', True):
+            self.cache.refresh()
     
     def save_data(self, df):
         """Sauvegarde les données de la machine"""
         try:
-            df.to_csv(self.data_file, index=False)
+            self.storage.write(df)
+            self.refresh_snapshot()
             return True
         except Exception as e:
             print(f"Erreur lors de la sauvegarde: {e}")
             return False
     
+    def import_csv(self, source):
+        """Importe des données machine depuis un fichier CSV"""
+        try:
+            self.storage.import_csv(source)
+            self.refresh_snapshot()
+            return True
+        except Exception as e:
+            print(f"Erreur lors de l'import CSV: {e}")
+            return False
+    
     def load_arrets(self):
         """Charge les données des arrêts manuels"""
+        try:
+            return self.stops.query_arrets()
+        except Exception as e:
+            print(f"Erreur lors du chargement des arrêts: {e}")
+            return self._create_empty_arrets_df()
+    
+    def get_arrets_page(self, page=0, page_size=10, types=None, operateurs=None, urgences=None,
+                        start=None, end=None):
+        """Retourne une page d'arrêts manuels filtrés et le nombre total d'arrêts correspondants"""
+        try:
+            total = self.stops.count_arrets(start, end, types, operateurs, urgences)
+            arrets_df = self.stops.query_arrets(start, end, types, operateurs, urgences,
+                                                limit=page_size, offset=page * page_size)
+            return arrets_df, total
+        except Exception as e:
+            print(f"Erreur lors de la lecture des arrêts: {e}")
+            return self._create_empty_arrets_df(), 0
+    
+    def count_arrets(self):
+        """Nombre d'arrêts manuels enregistrés"""
+        try:
+            return self.stops.count_arrets()
+        except Exception as e:
+            print(f"Erreur lors du comptage des arrêts: {e}")
+            return 0
+    
+    def get_operateurs(self):
+        """Liste des opérateurs ayant saisi des arrêts manuels"""
+        try:
+            return self.stops.distinct_values('arrets', 'operateur')
+        except Exception as e:
+            print(f"Erreur lors de la lecture des opérateurs: {e}")
+            return []
+    
+    def _read_arrets(self):
+        """Lit l'ancien fichier CSV des arrêts manuels (migration)"""
         if os.path.exists(self.arrets_file):
             try:
                 df = pd.read_csv(self.arrets_file)
@@ -270,18 +514,12 @@ class DataManager:
     
     def _create_empty_arrets_df(self):
         """Crée un DataFrame vide pour les arrêts manuels"""
-        return pd.DataFrame(columns=[
-            'timestamp', 'type_arret', 'sous_categorie', 'piece_concernee',
-            'duree_minutes', 'commentaire', 'operateur', 'urgence', 'date_saisie'
-        ])
+        return pd.DataFrame(columns=ARRETS_COLUMNS)
     
     def save_arret(self, arret_data):
         """Sauvegarde un nouvel arrêt manuel"""
         try:
-            arrets_df = self.load_arrets()
-            new_arret = pd.DataFrame([arret_data])
-            arrets_df = pd.concat([new_arret, arrets_df], ignore_index=True)
-            arrets_df.to_csv(self.arrets_file, index=False)
+            self.stops.insert_arret(arret_data)
             return True
         except Exception as e:
             print(f"Erreur lors de la sauvegarde de l'arrêt: {e}")
@@ -368,87 +606,117 @@ class DataManager:
         
         return sorted(anomalies, key=lambda x: x['timestamp'], reverse=True)
     
-    def calculate_kpis(self, df, start_date=None, end_date=None):
-        """Calcule les KPIs de performance de la machine"""
+    def calculate_kpis(self, df=None, start_date=None, end_date=None):
+        """Calcule les KPIs de performance de la machine (df=None: tout l'historique, via l'index cumulé)"""
+        if df is None:
+            return self.calculate_kpis_range(start_date, end_date)
+        
         if len(df) == 0:
             return {}
         
-        df_filtered = df.copy()
-        
-        if start_date:
-            df_filtered = df_filtered[df_filtered['timestamp'] >= pd.to_datetime(start_date)]
-        if end_date:
-            df_filtered = df_filtered[df_filtered['timestamp'] <= pd.to_datetime(end_date)]
+        df_filtered = df
+        if start_date or end_date:
+            mask = np.ones(len(df), dtype=bool)
+            if start_date:
+                mask &= (df['timestamp'] >= pd.to_datetime(start_date)).to_numpy()
+            if end_date:
+                mask &= (df['timestamp'] <= pd.to_datetime(end_date)).to_numpy()
+            df_filtered = df[mask]
         
         if len(df_filtered) == 0:
             return {}
         
-        total_points = len(df_filtered)
-        
-        # Calcul des temps
-        temps_marche = len(df_filtered[df_filtered['etat_machine'] == 'en_marche'])
-        temps_panne = len(df_filtered[df_filtered['etat_machine'] == 'panne'])
-        temps_arret_prod = len(df_filtered[df_filtered['etat_machine'] == 'arret_production'])
-        temps_qualite = len(df_filtered[df_filtered['etat_machine'] == 'probleme_qualite'])
-        
-        # KPIs principaux
-        kpis = {
-            'TBF': round((temps_marche / total_points) * 100, 1),  # Temps Brut de Fonctionnement
-            'TFN': round(((temps_marche + temps_arret_prod) / total_points) * 100, 1),  # Temps de Fonctionnement Net
-            'Disponibilite': round(((total_points - temps_panne) / total_points) * 100, 1),
-            'Taux_Panne': round((temps_panne / total_points) * 100, 1),
-            'Taux_Qualite': round((temps_qualite / total_points) * 100, 1),
-            'MTBF': self.calculate_mtbf(df_filtered),  # Mean Time Between Failures
-            'MTTR': self.calculate_mttr(df_filtered),   # Mean Time To Repair
-            'Efficacite_Globale': round(((temps_marche / total_points) * 100) * 0.95, 1)  # OEE approximatif
-        }
-        
-        return kpis
+        # Segments d'état calculés une seule fois pour tous les KPIs
+        return StateSegments(df_filtered['etat_machine'], df_filtered['timestamp']).kpis()
+    
+    def calculate_kpis_range(self, start_date=None, end_date=None):
+        """Calcule les KPIs sur une période de l'historique par recherche dans l'index cumulé"""
+        if not self.config.get('cache_enabled', True):
+            return self.calculate_kpis(self.load_data(start=start_date, end=end_date))
+        try:
+            # Rafraîchit l'instantané partagé, ce qui met à jour l'index avec les nouvelles lignes
+            self.cache.get()
+            return self.state_index.kpis(start_date, end_date)
+        except Exception as e:
+            print(f"Erreur lors du calcul des KPIs par index: {e}")
+            return self.calculate_kpis(self.load_data(start=start_date, end=end_date))
+    
+    def _rollup_index(self, start=None, end=None):
+        """Index d'agrégats à jour (construit à la volée pour la période si le cache est désactivé)"""
+        if self.config.get('cache_enabled', True):
+            # Rafraîchit l'instantané partagé, ce qui met à jour les agrégats avec les nouvelles lignes
+            self.cache.get()
+            return self.rollups
+        rollups = RollupIndex()
+        rollups.rebuild(self.load_data(start=start, end=end))
+        return rollups
+    
+    def get_rollup(self, start=None, end=None, max_points=None, resolution=None):
+        """Série agrégée des vibrations et des états sur une période.
+        
+        La résolution (1min, 15min, 1h, 1d) est choisie automatiquement comme la plus fine dont le
+        nombre d'intervalles tient dans max_points. Retourne (résolution, DataFrame).
+        """
+        if max_points is None:
+            max_points = self.config.get('rollup_max_points', 1500)
+        try:
+            return self._rollup_index(start, end).query(start, end, max_points, resolution)
+        except Exception as e:
+            print(f"Erreur lors de la lecture des agrégats: {e}")
+            return None, pd.DataFrame()
+    
+    def get_vibration_aggregates(self, start=None, end=None):
+        """Statistiques, corrélations et histogrammes des vibrations sur une période (agrégats)"""
+        try:
+            return self._rollup_index(start, end).aggregate(start, end)
+        except Exception as e:
+            print(f"Erreur lors du calcul des agrégats: {e}")
+            return {'count': 0}
+    
+    def detect_anomalies_aggregated(self, start=None, end=None, resolution=None, threshold_multiplier=2.5):
+        """Détection des anomalies à partir des agrégats (même seuil que detect_anomalies).
+
+        Le seuil moyenne + k × écart-type de chaque axe est calculé sur la période par les agrégats;
+        chaque intervalle de la résolution dont le maximum le dépasse est une anomalie, avec le
+        nombre d'échantillons concernés estimé par l'histogramme de l'intervalle.
+        """
+        try:
+            rollups = self._rollup_index(start, end)
+            agregats = rollups.aggregate(start, end)
+            if agregats['count'] == 0:
+                return []
+            
+            thresholds = agregats['mean'] + threshold_multiplier * agregats['std']
+            depassements = rollups.exceedances(
+                thresholds, start, end, self.config.get('rollup_max_points', 1500), resolution
+            )
+            
+            anomalies = []
+            for row in depassements.itertuples(index=False):
+                anomalies.append({
+                    'timestamp': row.timestamp,
+                    'axis': row.axis,
+                    'value': row.value,
+                    'threshold': round(row.threshold, 2),
+                    'severity': 'high' if row.value > row.threshold * 1.5 else 'medium',
+                    'count': None if np.isnan(row.count) else int(round(row.count))
+                })
+            return sorted(anomalies, key=lambda x: x['timestamp'], reverse=True)
+        except Exception as e:
+            print(f"Erreur lors de la détection des anomalies par agrégats: {e}")
+            return []
     
     def calculate_mtbf(self, df):
         """Calcule le MTBF (Mean Time Between Failures)"""
         if len(df) == 0:
             return 0
-        
-        # Identification des périodes de panne
-        panne_starts = []
-        in_panne = False
-        
-        for idx, row in df.iterrows():
-            if row['etat_machine'] == 'panne' and not in_panne:
-                panne_starts.append(row['timestamp'])
-                in_panne = True
-            elif row['etat_machine'] != 'panne' and in_panne:
-                in_panne = False
-        
-        if len(panne_starts) <= 1:
-            return 0
-        
-        # Calcul des intervalles entre pannes
-        intervals = []
-        for i in range(1, len(panne_starts)):
-            interval = (panne_starts[i] - panne_starts[i-1]).total_seconds() / 3600  # en heures
-            intervals.append(interval)
-        
-        return round(np.mean(intervals), 1) if intervals else 0
+        return StateSegments(df['etat_machine'], df['timestamp']).mtbf()
     
     def calculate_mttr(self, df):
         """Calcule le MTTR (Mean Time To Repair)"""
         if len(df) == 0:
             return 0
-        
-        panne_durations = []
-        panne_start = None
-        
-        for idx, row in df.iterrows():
-            if row['etat_machine'] == 'panne' and panne_start is None:
-                panne_start = row['timestamp']
-            elif row['etat_machine'] != 'panne' and panne_start is not None:
-                duration = (row['timestamp'] - panne_start).total_seconds() / 3600  # en heures
-                panne_durations.append(duration)
-                panne_start = None
-        
-        return round(np.mean(panne_durations), 1) if panne_durations else 0
+        return StateSegments(df['etat_machine'], df['timestamp']).mttr()
     
     def export_data(self, df, format='csv', filename=None):
         """Exporte les données dans différents formats"""
@@ -458,13 +726,13 @@ class DataManager:
         
         try:
             if format == 'csv':
-                filepath = f'data/{filename}.csv'
+                filepath = os.path.join(self.data_dir, f'{filename}.csv')
                 df.to_csv(filepath, index=False)
             elif format == 'json':
-                filepath = f'data/{filename}.json'
+                filepath = os.path.join(self.data_dir, f'{filename}.json')
                 df.to_json(filepath, orient='records', date_format='iso')
             elif format == 'excel':
-                filepath = f'data/{filename}.xlsx'
+                filepath = os.path.join(self.data_dir, f'{filename}.xlsx')
                 df.to_excel(filepath, index=False)
             else:
                 return None
@@ -595,31 +863,19 @@ RECOMMANDATIONS
         
         try:
             # Nettoyage des données machine
-            if os.path.exists(self.data_file):
-                df = self.load_data()
-                df_cleaned = df[df['timestamp'] >= cutoff_date]
+            if self.storage.exists():
+                total_count = self.get_data_summary()['rows']
+                df_cleaned = self.load_data(start=cutoff_date)
                 self.save_data(df_cleaned)
-                removed_count = len(df) - len(df_cleaned)
+                removed_count = total_count - len(df_cleaned)
                 removed_total += removed_count
                 print(f"✅ {removed_count} enregistrements machine supprimés")
             
-            # Nettoyage des données d'arrêts manuels
-            if os.path.exists(self.arrets_file):
-                arrets_df = self.load_arrets()
-                arrets_cleaned = arrets_df[arrets_df['timestamp'] >= cutoff_date]
-                arrets_cleaned.to_csv(self.arrets_file, index=False)
-                removed_arrets = len(arrets_df) - len(arrets_cleaned)
-                removed_total += removed_arrets
-                print(f"✅ {removed_arrets} enregistrements d'arrêts manuels supprimés")
-            
-            # Nettoyage des données d'arrêts automatiques
-            if os.path.exists(self.arrets_auto_file):
-                arrets_auto_df = self.load_arrets_auto()
-                arrets_auto_cleaned = arrets_auto_df[arrets_auto_df['debut_arret'] >= cutoff_date]
-                arrets_auto_cleaned.to_csv(self.arrets_auto_file, index=False)
-                removed_auto = len(arrets_auto_df) - len(arrets_auto_cleaned)
-                removed_total += removed_auto
-                print(f"✅ {removed_auto} enregistrements d'arrêts automatiques supprimés")
+            # Nettoyage des arrêts manuels et automatiques (suppression indexée en base)
+            removed_arrets, removed_auto = self.stops.delete_before(cutoff_date)
+            removed_total += removed_arrets + removed_auto
+            print(f"✅ {removed_arrets} enregistrements d'arrêts manuels supprimés")
+            print(f"✅ {removed_auto} enregistrements d'arrêts automatiques supprimés")
             
             return removed_total
             
@@ -633,8 +889,10 @@ RECOMMANDATIONS
             stats = {}
             
             # Statistiques des fichiers
-            if os.path.exists(self.data_file):
-                stats['machine_data_size'] = round(os.path.getsize(self.data_file) / 1024 / 1024, 2)  # MB
+            stats['storage_backend'] = self.storage.name
+            stats['cache_memory_size'] = round(self.cache.memory_usage() / 1024 / 1024, 2)  # MB
+            if self.storage.exists():
+                stats['machine_data_size'] = round(self.storage.size_bytes() / 1024 / 1024, 2)  # MB
                 df = self.load_data()
                 stats['machine_records'] = len(df)
                 stats['data_quality'] = round((1 - df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100, 1) if len(df) > 0 else 100
@@ -647,13 +905,11 @@ RECOMMANDATIONS
                 stats['date_debut'] = None
                 stats['date_fin'] = None
             
-            # Statistiques des arrêts
-            arrets_manuels = self.load_arrets()
-            arrets_auto = self.load_arrets_auto()
-            
-            stats['arrets_manuels'] = len(arrets_manuels)
-            stats['arrets_auto_total'] = len(arrets_auto)
-            stats['arrets_auto_classifies'] = len(arrets_auto[arrets_auto.get('classifie', False) == True]) if len(arrets_auto) > 0 else 0
+            # Statistiques des arrêts (comptages en base)
+            stats['stops_db_size'] = round(self.stops.size_bytes() / 1024 / 1024, 2)  # MB
+            stats['arrets_manuels'] = self.stops.count_arrets()
+            stats['arrets_auto_total'] = self.stops.count_arrets_auto()
+            stats['arrets_auto_classifies'] = self.stops.count_arrets_auto(classifie=True)
             stats['taux_classification'] = round((stats['arrets_auto_classifies'] / stats['arrets_auto_total']) * 100, 1) if stats['arrets_auto_total'] > 0 else 100
             
             return stats
@@ -669,10 +925,15 @@ RECOMMANDATIONS
                 os.makedirs(backup_dir)
             
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_files = []
+            
+            # Sauvegarde des données machine (fichier CSV ou partitions Parquet)
+            backup_files = self.storage.backup(backup_dir, timestamp)
+            
+            # Sauvegarde de la base des arrêts
+            backup_files += self.stops.backup(backup_dir, timestamp)
             
             # Sauvegarde des fichiers de données
-            for file_path in [self.data_file, self.arrets_file, self.arrets_auto_file, self.config_file]:
+            for file_path in [self.config_file]:
                 if os.path.exists(file_path):
                     filename = os.path.basename(file_path)
                     backup_filename = f"{timestamp}_{filename}"
@@ -0,0 +1,150 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils.stop_detector import summarize_chunk, stitch_chunks, build_stop_records
+from utils.segments import timestamps_ns
+
+DETECTION_COLUMNS = ['vibration_x', 'vibration_y', 'vibration_z']
+
+
+class StopDetectionJob:
+    """Détection des arrêts en arrière-plan, par blocs de temps répartis sur un pool de workers.
+
+    Chaque bloc est lu et résumé indépendamment (arrêts internes et états aux bords), puis les
+    résumés sont raccordés dans l'ordre chronologique. La progression (blocs et échantillons
+    traités, arrêts trouvés) est consultable pendant l'exécution; les arrêts ne sont enregistrés
+    qu'à la fin, en une seule transaction, et jamais si la tâche est annulée.
+    """
+
+    def __init__(self, data_manager, reanalyse=False, chunk_hours=24, max_workers=None):
+        self.data_manager = data_manager
+        self.reanalyse = reanalyse
+        self.chunk = pd.Timedelta(hours=chunk_hours)
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.seuil = data_manager.config['seuil_arret_vibration']
+        self.duree_min = data_manager.config['duree_min_arret']
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+        self.progress = {
+            'status': 'en_attente',
+            'chunks_total': 0,
+            'chunks_done': 0,
+            'rows_processed': 0,
+            'stops_found': 0,
+            'stops_added': 0,
+            'started_at': None,
+            'finished_at': None,
+            'error': None
+        }
+
+    def start(self):
+        """Lance la détection dans un thread d'arrière-plan"""
+        self.progress.update({'status': 'en_cours', 'started_at': datetime.now()})
+        self._thread = threading.Thread(target=self._run, name='stop-detection', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Demande l'annulation: les blocs non commencés sont abandonnés, rien n'est enregistré"""
+        self._cancel.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_progress(self):
+        """Copie de l'état d'avancement (lecture depuis la page)"""
+        with self._lock:
+            progress = dict(self.progress)
+        progress['fraction'] = (
+            progress['chunks_done'] / progress['chunks_total'] if progress['chunks_total'] else 0.0
+        )
+        return progress
+
+    def _starting_point(self):
+        """Début de l'analyse et état avant le premier bloc (point de reprise du détecteur)"""
+        state = dict(self.data_manager.stop_detector.state)
+        same_params = (state['seuil_arret_vibration'] == self.seuil and
+                       state['duree_min_arret'] == self.duree_min)
+        if self.reanalyse or not same_params or state['last_timestamp'] is None:
+            return None, None, None
+        open_start = state['open_stop_start']
+        return (
+            pd.Timestamp(state['last_timestamp']) + pd.Timedelta(1, 'ns'),
+            state['last_stopped'],
+            None if open_start is None else pd.Timestamp(open_start).value
+        )
+
+    def _chunks(self, start, end):
+        """Blocs [début, fin) consécutifs couvrant [start, end]"""
+        bounds = list(pd.date_range(start, end, freq=self.chunk))
+        if bounds[-1] <= end:
+            bounds.append(end + pd.Timedelta(1, 'ns'))
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _process_chunk(self, start, end):
+        if self._cancel.is_set():
+            return None
+        df = self.data_manager.load_data(start=start, end=end, columns=DETECTION_COLUMNS)
+        if len(df) > 0:
+            df = df.iloc[:np.searchsorted(timestamps_ns(df['timestamp']), end.value, side='left')]
+        summary = summarize_chunk(df, self.seuil)
+        with self._lock:
+            self.progress['chunks_done'] += 1
+            if summary is not None:
+                self.progress['rows_processed'] += summary['rows']
+                self.progress['stops_found'] += len(summary['debuts'])
+        return summary
+
+    def _run(self):
+        try:
+            data_summary = self.data_manager.get_data_summary()
+            start, last_stopped, open_start = self._starting_point()
+            if start is None:
+                start = data_summary['first']
+            end = data_summary['last']
+            if start is None or end is None or start > end:
+                self._finish('termine')
+                return
+
+            chunks = self._chunks(pd.Timestamp(start), pd.Timestamp(end))
+            with self._lock:
+                self.progress['chunks_total'] = len(chunks)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._process_chunk, a, b) for a, b in chunks]
+                summaries = [future.result() for future in futures]
+
+            if self._cancel.is_set():
+                self._finish('annule')
+                return
+
+            # Raccordement des blocs puis enregistrement groupé des arrêts terminés
+            debuts, fins, state = stitch_chunks(summaries, last_stopped, open_start)
+            durees = (fins - debuts) / 60e9
+            keep = ~np.isnan(debuts) & (durees >= self.duree_min)
+            arrets = build_stop_records(debuts[keep], fins[keep], durees[keep])
+            arrets_ajoutes = self.data_manager.save_arrets_auto(arrets)
+
+            if state['last_timestamp'] is not None:
+                self.data_manager.stop_detector.advance(
+                    state['last_timestamp'], state['last_stopped'], state['open_stop_start'],
+                    self.seuil, self.duree_min
+                )
+
+            with self._lock:
+                self.progress['stops_found'] = len(arrets)
+                self.progress['stops_added'] = len(arrets_ajoutes)
+            self._finish('termine')
+        except Exception as e:
+            print(f"Erreur lors de la détection en arrière-plan: {e}")
+            with self._lock:
+                self.progress['error'] = str(e)
+            self._finish('erreur')
+
+    def _finish(self, status):
+        with self._lock:
+            self.progress.update({'status': status, 'finished_at': datetime.now()})
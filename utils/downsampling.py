@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+
+def _as_float(x):
+    """Abscisses en flottants (les horodatages sont convertis en nanosecondes)"""
+    values = np.asarray(x)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    if values.dtype == object:
+        return pd.to_datetime(x).to_numpy().astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def _bucket_edges(n, n_out):
+    """Limites des intervalles LTTB: premier et dernier points isolés, n_out - 2 intervalles entre eux"""
+    return np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices retenus par l'algorithme Largest-Triangle-Three-Buckets.
+
+    Conserve la forme de la courbe: dans chaque intervalle, le point retenu est celui qui forme
+    le plus grand triangle avec le point retenu précédent et la moyenne de l'intervalle suivant.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    x = x - x[0]  # Précision des aires avec des horodatages en nanosecondes
+
+    edges = _bucket_edges(n, n_out)
+    # Moyennes de chaque intervalle (utilisées comme troisième sommet du triangle)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    avg_x = np.append(sums_x / sizes, x[n - 1])
+    avg_y = np.append(sums_y / sizes, y[n - 1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[n_out - 1] = n - 1
+    return selected
+
+
+def downsample_indices(x, y, max_points, threshold=None):
+    """Indices à afficher: LTTB sur max_points, plus le maximum de chaque intervalle au-dessus du seuil"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points is None or n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    selected = lttb_indices(x, y, max_points)
+    if threshold is None:
+        return selected
+
+    # Les pics qui franchissent le seuil restent visibles même si LTTB ne les a pas retenus
+    edges = _bucket_edges(n, max_points)
+    maxima = np.maximum.reduceat(y[1:n - 1], edges[:-1] - 1)
+    spikes = np.flatnonzero(maxima > threshold)
+    if len(spikes) == 0:
+        return selected
+    peaks = [edges[i] + int(np.argmax(y[edges[i]:edges[i + 1]])) for i in spikes]
+    return np.union1d(selected, peaks)
+
+
+def downsample(x, y, max_points, threshold=None):
+    """Sous-échantillonne une série (x, y) pour l'affichage; retourne (x, y) réduits"""
+    indices = downsample_indices(x, y, max_points, threshold)
+    x_values = x.iloc[indices] if isinstance(x, pd.Series) else np.asarray(x)[indices]
+    y_values = y.iloc[indices] if isinstance(y, pd.Series) else np.asarray(y)[indices]
+    return x_values, y_values
+
+
+def minmax_indices(x, y, n_tiles):
+    """Indices du minimum et du maximum de chaque tuile de temps (décimation pour l'affichage).
+
+    L'axe des abscisses est découpé en n_tiles tuiles de même largeur: une courbe décimée ainsi
+    garde la même enveloppe à l'écran qu'avec tous les points, avec au plus 2 points par tuile.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_tiles is None or n <= 2 * n_tiles or n_tiles < 1:
+        return np.arange(n)
+    x = _as_float(x)
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.array([int(np.argmin(y)), int(np.argmax(y))])
+
+    # Abscisses triées: chaque tuile est une plage contiguë d'indices
+    tiles = np.minimum(((x - x[0]) / span * n_tiles).astype(np.int64), n_tiles - 1)
+    first = np.flatnonzero(np.concatenate(([True], tiles[1:] != tiles[:-1])))
+    counts = np.diff(np.concatenate((first, [n])))
+
+    indices = [[0, n - 1]]
+    for reduce in (np.minimum, np.maximum):
+        extremes = np.repeat(reduce.reduceat(y, first), counts)
+        hits = np.flatnonzero(y == extremes)
+        # Première occurrence de l'extremum dans chaque tuile
+        _, first_hit = np.unique(tiles[hits], return_index=True)
+        indices.append(hits[first_hit])
+    return np.unique(np.concatenate(indices))
+
+
+def decimate(x, y, n_tiles):
+    """Décimation min/max par tuile de temps; retourne (x, y) réduits"""
+    indices = minmax_indices(x, y, n_tiles)
+    x_values = x.iloc[indices] if isinstance(x, pd.Series) else np.asarray(x)[indices]
+    y_values = y.iloc[indices] if isinstance(y, pd.Series) else np.asarray(y)[indices]
+    return x_values, y_values
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import threading
+from utils.storage import MACHINE_STATES
+from utils.segments import run_lengths, timestamps_ns
+
+PANNE = MACHINE_STATES.index('panne')
+
+
+def state_codes(etats):
+    """Codes entiers des états machine (indice dans MACHINE_STATES, -1 si inconnu)"""
+    if isinstance(getattr(etats, 'dtype', None), pd.CategoricalDtype):
+        return pd.Categorical(etats, categories=MACHINE_STATES).codes.astype(np.int8)
+
+    # Factorisation puis correspondance des seules valeurs distinctes
+    codes, uniques = pd.factorize(pd.Series(etats))
+    mapping = np.array(
+        [MACHINE_STATES.index(etat) if etat in MACHINE_STATES else -1 for etat in uniques] + [-1],
+        dtype=np.int8
+    )
+    return mapping[codes]
+
+
+def kpis_from_counts(counts, total_points, mtbf, mttr):
+    """Assemble le dictionnaire de KPIs à partir des compteurs par état"""
+    temps_marche = counts[MACHINE_STATES.index('en_marche')]
+    temps_panne = counts[PANNE]
+    temps_arret_prod = counts[MACHINE_STATES.index('arret_production')]
+    temps_qualite = counts[MACHINE_STATES.index('probleme_qualite')]
+
+    return {
+        'TBF': round((temps_marche / total_points) * 100, 1),  # Temps Brut de Fonctionnement
+        'TFN': round(((temps_marche + temps_arret_prod) / total_points) * 100, 1),  # Temps de Fonctionnement Net
+        'Disponibilite': round(((total_points - temps_panne) / total_points) * 100, 1),
+        'Taux_Panne': round((temps_panne / total_points) * 100, 1),
+        'Taux_Qualite': round((temps_qualite / total_points) * 100, 1),
+        'MTBF': mtbf,  # Mean Time Between Failures
+        'MTTR': mttr,  # Mean Time To Repair
+        'Efficacite_Globale': round(((temps_marche / total_points) * 100) * 0.95, 1)  # OEE approximatif
+    }
+
+
+def mtbf_from_starts(failure_starts_ns):
+    """MTBF (heures): moyenne des intervalles entre débuts de panne successifs"""
+    if len(failure_starts_ns) <= 1:
+        return 0
+    return round(float(np.mean(np.diff(failure_starts_ns))) / 3600e9, 1)
+
+
+def mttr_from_durations(failure_durations_ns):
+    """MTTR (heures): durée moyenne des pannes terminées"""
+    if len(failure_durations_ns) == 0:
+        return 0
+    return round(float(np.mean(failure_durations_ns)) / 3600e9, 1)
+
+
+class StateSegments:
+    """Segments d'état consécutifs d'une série d'échantillons, calculés en une seule passe.
+
+    Tous les KPIs (TBF, TFN, disponibilité, taux de panne et qualité, MTBF, MTTR) sont dérivés
+    des compteurs par état et des débuts/durées des segments de panne.
+    """
+
+    def __init__(self, etats, timestamps):
+        self.codes = state_codes(etats)
+        self.ts_ns = timestamps_ns(timestamps)
+        self.starts, self.lengths, self.run_codes = run_lengths(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def counts(self):
+        """Nombre d'échantillons par état (ordre de MACHINE_STATES)"""
+        known = self.codes[self.codes >= 0]
+        return np.bincount(known, minlength=len(MACHINE_STATES))
+
+    def failure_starts(self):
+        """Horodatages (ns) des débuts de panne"""
+        return self.ts_ns[self.starts[self.run_codes == PANNE]]
+
+    def failure_durations(self):
+        """Durées (ns) des pannes terminées (jusqu'au premier échantillon hors panne)"""
+        ends = self.starts + self.lengths
+        closed = (self.run_codes == PANNE) & (ends < len(self.codes))
+        return self.ts_ns[ends[closed]] - self.ts_ns[self.starts[closed]]
+
+    def mtbf(self):
+        return mtbf_from_starts(self.failure_starts())
+
+    def mttr(self):
+        return mttr_from_durations(self.failure_durations())
+
+    def kpis(self):
+        """Calcule l'ensemble des KPIs"""
+        if len(self.codes) == 0:
+            return {}
+        return kpis_from_counts(self.counts(), len(self.codes), self.mtbf(), self.mttr())
+
+
+class StateIndex:
+    """Index cumulé des états machine pour des KPIs en O(log n) sur n'importe quelle période.
+
+    Maintient, alignés sur le tableau des horodatages, le nombre cumulé d'échantillons de
+    chaque état ainsi que la liste des segments de panne (indices de début et de fin).
+    L'index est mis à jour par ajout des nouvelles lignes, sans recalcul de l'historique.
+    """
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._n = 0
+        self._ts = np.empty(capacity, dtype=np.int64)
+        # _cum[i] = nombre d'échantillons de chaque état parmi les i premiers
+        self._cum = np.zeros((capacity + 1, len(MACHINE_STATES)), dtype=np.int64)
+        self._n_seg = 0
+        self._seg_start = np.empty(max(16, capacity // 64), dtype=np.int64)
+        # Indice du premier échantillon hors panne (= nombre d'échantillons si la panne est en cours)
+        self._seg_end = np.empty(max(16, capacity // 64), dtype=np.int64)
+
+    def _reserve(self, n_rows, n_segments):
+        """Agrandit les tableaux (doublement de capacité) si nécessaire"""
+        if n_rows > len(self._ts):
+            capacity = max(n_rows, 2 * len(self._ts))
+            self._ts = np.resize(self._ts, capacity)
+            cum = np.zeros((capacity + 1, len(MACHINE_STATES)), dtype=np.int64)
+            cum[:self._n + 1] = self._cum[:self._n + 1]
+            self._cum = cum
+        if n_segments > len(self._seg_start):
+            capacity = max(n_segments, 2 * len(self._seg_start))
+            self._seg_start = np.resize(self._seg_start, capacity)
+            self._seg_end = np.resize(self._seg_end, capacity)
+
+    def __len__(self):
+        return self._n
+
+    def rebuild(self, df):
+        """Reconstruit l'index à partir d'un DataFrame complet"""
+        with self._lock:
+            self._allocate(max(1024, len(df)))
+            self._append(df)
+
+    def append(self, df):
+        """Ajoute de nouvelles lignes (postérieures aux précédentes) à l'index"""
+        with self._lock:
+            self._append(df)
+
+    def _append(self, df):
+        m = len(df)
+        if m == 0:
+            return
+        n0 = self._n
+        codes = state_codes(df['etat_machine'])
+        ts = timestamps_ns(df['timestamp'])
+
+        # Segments de panne des nouvelles lignes (fusion avec une panne en cours)
+        starts, lengths, run_codes = run_lengths(codes)
+        panne = run_codes == PANNE
+        seg_start = starts[panne] + n0
+        seg_end = starts[panne] + lengths[panne] + n0
+        if len(seg_start) > 0 and seg_start[0] == n0 and self._n_seg > 0 and self._seg_end[self._n_seg - 1] == n0:
+            self._seg_end[self._n_seg - 1] = seg_end[0]
+            seg_start, seg_end = seg_start[1:], seg_end[1:]
+
+        self._reserve(n0 + m, self._n_seg + len(seg_start))
+
+        # Sommes préfixes par état
+        onehot = np.zeros((m, len(MACHINE_STATES)), dtype=np.int64)
+        known = codes >= 0
+        onehot[np.flatnonzero(known), codes[known]] = 1
+        self._cum[n0 + 1:n0 + m + 1] = self._cum[n0] + np.cumsum(onehot, axis=0)
+        self._ts[n0:n0 + m] = ts
+
+        k = self._n_seg
+        self._seg_start[k:k + len(seg_start)] = seg_start
+        self._seg_end[k:k + len(seg_end)] = seg_end
+        self._n_seg += len(seg_start)
+        self._n = n0 + m
+
+    def kpis(self, start_date=None, end_date=None):
+        """KPIs sur [start_date, end_date] par recherche dichotomique et tranche de segments"""
+        with self._lock:
+            ts = self._ts[:self._n]
+            lo = 0 if start_date is None else int(np.searchsorted(ts, timestamps_ns([start_date])[0], side='left'))
+            hi = self._n if end_date is None else int(np.searchsorted(ts, timestamps_ns([end_date])[0], side='right'))
+            if hi <= lo:
+                return {}
+
+            counts = self._cum[hi] - self._cum[lo]
+
+            # Segments de panne qui recouvrent [lo, hi): fin > lo et début < hi
+            seg_start = self._seg_start[:self._n_seg]
+            seg_end = self._seg_end[:self._n_seg]
+            first = int(np.searchsorted(seg_end, lo, side='right'))
+            last = int(np.searchsorted(seg_start, hi, side='left'))
+            starts = np.maximum(seg_start[first:last], lo)
+            ends = seg_end[first:last]
+
+            failure_starts = ts[starts]
+            closed = ends < hi
+            failure_durations = ts[ends[closed]] - ts[starts[closed]]
+
+            return kpis_from_counts(counts, hi - lo, mtbf_from_starts(failure_starts),
+                                    mttr_from_durations(failure_durations))
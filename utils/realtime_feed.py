@@ -0,0 +1,196 @@
+import asyncio
+import json
+import time
+import numpy as np
+import pandas as pd
+from utils.storage import VIBRATION_COLUMNS
+
+
+class RealtimeFeed:
+    """Flux de capteur simulé en temps réel (substitut local d'une passerelle).
+
+    Les échantillons sont produits par le DataGenerator (chaîne d'états continue d'un lot à
+    l'autre) au rythme de sample_rate_hz, par lots de batch_size, avec des horodatages pris
+    sur l'horloge murale. Les lots sont émis quand leur dernier échantillon est dû.
+    """
+
+    def __init__(self, generator, sample_rate_hz=1.0, batch_size=10):
+        self.generator = generator
+        self.sample_rate_hz = sample_rate_hz
+        self.batch_size = batch_size
+        self.period_ns = int(round(1e9 / sample_rate_hz))
+        self.stats = {'batches': 0, 'rows': 0, 'late_seconds_max': 0.0}
+
+    async def batches(self, duration_seconds=None):
+        """Générateur asynchrone des lots (DataFrames), cadencé sur l'horloge"""
+        loop = asyncio.get_running_loop()
+        n_samples = 2**62 if duration_seconds is None else int(duration_seconds * self.sample_rate_hz)
+        states = self.generator.iter_state_chunks(n_samples, self.sample_rate_hz, chunk_size=self.batch_size)
+        state_names = np.asarray(self.generator.states, dtype=object)
+
+        start_ns = pd.Timestamp.now().value
+        start_clock = loop.time()
+        index = 0
+        for codes in states:
+            n = len(codes)
+            due = start_clock + (index + n - 1) / self.sample_rate_hz
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.stats['late_seconds_max'] = max(self.stats['late_seconds_max'], -delay)
+
+            vibrations = self.generator.generate_vibrations(codes)
+            timestamps = start_ns + (index + np.arange(n, dtype=np.int64)) * self.period_ns
+            index += n
+            self.stats['batches'] += 1
+            self.stats['rows'] += n
+            yield pd.DataFrame({
+                'timestamp': timestamps.view('datetime64[ns]'),
+                'etat_machine': state_names[codes],
+                'vibration_x': vibrations[:, 0],
+                'vibration_y': vibrations[:, 1],
+                'vibration_z': vibrations[:, 2]
+            })
+
+    async def to_queue(self, queue, duration_seconds=None):
+        """Pousse les lots dans une asyncio.Queue (None marque la fin du flux)"""
+        try:
+            async for batch in self.batches(duration_seconds):
+                await queue.put(batch)
+        finally:
+            await queue.put(None)
+
+    async def serve(self, host='127.0.0.1', port=8765, duration_seconds=None):
+        """Diffuse les lots sur un socket TCP local, une ligne JSON par lot.
+
+        Le flux démarre à la première connexion; le serveur s'arrête à la fin du flux.
+        """
+        connected = asyncio.Event()
+        clients = []
+
+        async def on_connect(reader, writer):
+            clients.append(writer)
+            connected.set()
+
+        server = await asyncio.start_server(on_connect, host, port)
+        async with server:
+            await connected.wait()
+            async for batch in self.batches(duration_seconds):
+                line = encode_batch(batch)
+                for writer in list(clients):
+                    try:
+                        writer.write(line)
+                        await writer.drain()
+                    except ConnectionError:
+                        clients.remove(writer)
+            for writer in clients:
+                writer.close()
+
+
+def encode_batch(batch):
+    """Sérialise un lot en une ligne JSON (colonnes, horodatages en ns)"""
+    payload = {'timestamp': batch['timestamp'].to_numpy().view(np.int64).tolist(),
+               'etat_machine': batch['etat_machine'].tolist()}
+    for axis in VIBRATION_COLUMNS:
+        payload[axis] = batch[axis].tolist()
+    return (json.dumps(payload) + '\n').encode()
+
+
+def decode_batch(line):
+    """Reconstruit un lot à partir d'une ligne JSON"""
+    payload = json.loads(line)
+    payload['timestamp'] = np.asarray(payload['timestamp'], dtype=np.int64).view('datetime64[ns]')
+    return pd.DataFrame(payload)
+
+
+async def read_socket(queue, host='127.0.0.1', port=8765, retries=50):
+    """Client du flux TCP: pousse les lots reçus dans une asyncio.Queue (None en fin de flux)"""
+    for attempt in range(retries):
+        try:
+            reader, writer = await asyncio.open_connection(host, port, limit=2**24)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    else:
+        await queue.put(None)
+        raise ConnectionError(f"Flux indisponible sur {host}:{port}")
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            await queue.put(decode_batch(line))
+    finally:
+        writer.close()
+        await queue.put(None)
+
+
+class FeedConsumer:
+    """Ingestion des lots reçus dans le stockage, avec mesure de la latence d'ingestion.
+
+    Les lots sont regroupés pendant flush_seconds puis ajoutés en une fois (storage.append,
+    hors de la boucle d'événements). La latence d'un échantillon est le délai entre son
+    horodatage et la fin de son écriture dans le stockage (et, si un DataManager est fourni,
+    de la publication de l'instantané de ce processus). Un dashboard lancé dans un autre
+    processus ne voit les lignes qu'à son prochain cycle de planificateur: sa latence de
+    visibilité est bornée par cette latence plus refresh_interval_seconds.
+    """
+
+    def __init__(self, storage, data_manager=None, flush_seconds=5.0):
+        self.storage = storage
+        self.data_manager = data_manager
+        self.flush_seconds = flush_seconds
+        self.latencies = []
+        self.stats = {'batches': 0, 'rows': 0, 'flushes': 0, 'started_at': None, 'finished_at': None}
+
+    async def run(self, queue):
+        """Consomme la file jusqu'au marqueur de fin"""
+        loop = asyncio.get_running_loop()
+        self.stats['started_at'] = time.perf_counter()
+        pending = []
+        last_flush = loop.time()
+        while True:
+            try:
+                batch = await asyncio.wait_for(queue.get(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                batch = False
+            if batch is None:
+                break
+            if batch is not False:
+                pending.append(batch)
+                self.stats['batches'] += 1
+            if pending and loop.time() - last_flush >= self.flush_seconds:
+                await self._flush(pending)
+                pending = []
+                last_flush = loop.time()
+        if pending:
+            await self._flush(pending)
+        self.stats['finished_at'] = time.perf_counter()
+
+    async def _flush(self, batches):
+        df = pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.storage.append, df)
+        if self.data_manager is not None:
+            await loop.run_in_executor(None, self.data_manager.refresh_snapshot)
+
+        visible_ns = pd.Timestamp.now().value
+        self.latencies.append((visible_ns - df['timestamp'].to_numpy().view(np.int64)) / 1e9)
+        self.stats['rows'] += len(df)
+        self.stats['flushes'] += 1
+
+    def summary(self):
+        """Débit d'ingestion et percentiles de la latence d'ingestion dans le stockage (secondes)"""
+        latencies = np.concatenate(self.latencies) if self.latencies else np.empty(0)
+        elapsed = (self.stats['finished_at'] or time.perf_counter()) - (self.stats['started_at'] or time.perf_counter())
+        result = dict(self.stats)
+        result['rows_per_second'] = self.stats['rows'] / elapsed if elapsed > 0 else 0.0
+        if len(latencies) > 0:
+            result.update({
+                'latency_p50': float(np.percentile(latencies, 50)),
+                'latency_p95': float(np.percentile(latencies, 95)),
+                'latency_max': float(latencies.max())
+            })
+        return result
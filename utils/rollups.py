@@ -0,0 +1,297 @@
+import numpy as np
+import pandas as pd
+import threading
+from utils.storage import MACHINE_STATES, VIBRATION_COLUMNS
+from utils.segments import timestamps_ns
+from utils.kpi_engine import state_codes
+
+# Résolutions des agrégats, de la plus fine à la plus grossière (largeur des intervalles en ns)
+RESOLUTIONS = [
+    ('1min', 60 * 10**9),
+    ('15min', 15 * 60 * 10**9),
+    ('1h', 3600 * 10**9),
+    ('1d', 86400 * 10**9)
+]
+
+# Histogrammes à classes fixes (mm/s); les valeurs au-delà de HIST_MAX vont dans la dernière classe
+HIST_BINS = 40
+HIST_MAX = 10.0
+HIST_EDGES = np.linspace(0.0, HIST_MAX, HIST_BINS + 1)
+
+# Histogrammes et produits croisés ne sont conservés qu'à partir de cette résolution (mémoire)
+HIST_MIN_RESOLUTION = '15min'
+
+# Produits croisés conservés pour les corrélations: (x, y), (x, z), (y, z)
+CROSS_PAIRS = [(0, 1), (0, 2), (1, 2)]
+
+
+class _RollupLevel:
+    """Agrégats d'une résolution: un enregistrement par intervalle, dans des tableaux extensibles"""
+
+    def __init__(self, label, width_ns, with_hist, capacity=256):
+        self.label = label
+        self.width = width_ns
+        self.with_hist = with_hist
+        self.n = 0
+        self.arrays = {
+            'start': np.empty(capacity, dtype=np.int64),
+            'count': np.zeros(capacity, dtype=np.int64),
+            'sum': np.zeros((capacity, 3)),
+            'sumsq': np.zeros((capacity, 3)),
+            'min': np.zeros((capacity, 3)),
+            'max': np.zeros((capacity, 3)),
+            'states': np.zeros((capacity, len(MACHINE_STATES)), dtype=np.int32)
+        }
+        if with_hist:
+            self.arrays['cross'] = np.zeros((capacity, 3))
+            self.arrays['hist'] = np.zeros((capacity, 3, HIST_BINS), dtype=np.int32)
+
+    def _reserve(self, n):
+        """Agrandit les tableaux (doublement de capacité) si nécessaire"""
+        capacity = len(self.arrays['start'])
+        if n <= capacity:
+            return
+        capacity = max(n, 2 * capacity)
+        for name, array in self.arrays.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self.n] = array[:self.n]
+            self.arrays[name] = grown
+
+    def append(self, ts, values, codes, bins):
+        """Agrège des lignes triées (fusion avec le dernier intervalle s'il est commun)"""
+        buckets = ts - ts % self.width
+        first = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        m = len(first)
+        counts = np.diff(np.concatenate((first, [len(ts)])))
+
+        new = {
+            'start': buckets[first],
+            'count': counts,
+            'sum': np.add.reduceat(values, first, axis=0),
+            'sumsq': np.add.reduceat(values * values, first, axis=0),
+            'min': np.minimum.reduceat(values, first, axis=0),
+            'max': np.maximum.reduceat(values, first, axis=0)
+        }
+
+        # Compteurs par état et histogrammes par comptage sur des indices aplatis
+        row_bucket = np.repeat(np.arange(m), counts)
+        known = codes >= 0
+        new['states'] = np.bincount(
+            row_bucket[known] * len(MACHINE_STATES) + codes[known], minlength=m * len(MACHINE_STATES)
+        ).reshape(m, len(MACHINE_STATES))
+        if self.with_hist:
+            new['cross'] = np.add.reduceat(
+                np.column_stack([values[:, i] * values[:, j] for i, j in CROSS_PAIRS]), first, axis=0
+            )
+            flat = (row_bucket[:, None] * 3 + np.arange(3)) * HIST_BINS + bins
+            new['hist'] = np.bincount(flat.ravel(), minlength=m * 3 * HIST_BINS).reshape(m, 3, HIST_BINS)
+
+        # Fusion du premier intervalle avec le dernier intervalle existant
+        if self.n > 0 and self.arrays['start'][self.n - 1] == new['start'][0]:
+            last = self.n - 1
+            for name in ['count', 'sum', 'sumsq', 'states'] + (['cross', 'hist'] if self.with_hist else []):
+                self.arrays[name][last] += new[name][0]
+            self.arrays['min'][last] = np.minimum(self.arrays['min'][last], new['min'][0])
+            self.arrays['max'][last] = np.maximum(self.arrays['max'][last], new['max'][0])
+            new = {name: array[1:] for name, array in new.items()}
+            m -= 1
+
+        self._reserve(self.n + m)
+        for name, array in new.items():
+            self.arrays[name][self.n:self.n + m] = array
+        self.n += m
+
+    def slice(self, start_ns=None, end_ns=None):
+        """Indices [lo, hi) des intervalles dont le début est dans [start, end]"""
+        starts = self.arrays['start'][:self.n]
+        lo = 0 if start_ns is None else int(np.searchsorted(starts, start_ns - start_ns % self.width, side='left'))
+        hi = self.n if end_ns is None else int(np.searchsorted(starts, end_ns, side='right'))
+        return lo, max(lo, hi)
+
+
+class RollupIndex:
+    """Agrégats multi-résolution des vibrations (1 min, 15 min, 1 h, 1 jour).
+
+    Pour chaque intervalle et chaque axe: nombre de points, somme, somme des carrés, min, max,
+    et, à partir de 15 min, produits croisés (corrélations) et histogramme à classes fixes;
+    plus le nombre d'échantillons par état machine. Mis à jour par ajout des nouvelles lignes,
+    les requêtes lisent la résolution la plus fine dont le nombre d'intervalles tient dans le
+    budget de points (quelques milliers d'intervalles pour une année).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._allocate()
+
+    def _allocate(self):
+        hist_from = [label for label, _ in RESOLUTIONS].index(HIST_MIN_RESOLUTION)
+        self.levels = [
+            _RollupLevel(label, width, i >= hist_from)
+            for i, (label, width) in enumerate(RESOLUTIONS)
+        ]
+
+    def rebuild(self, df):
+        """Reconstruit les agrégats à partir d'un DataFrame complet"""
+        with self._lock:
+            self._allocate()
+            self._append(df)
+
+    def append(self, df):
+        """Ajoute de nouvelles lignes (postérieures aux précédentes) aux agrégats"""
+        with self._lock:
+            self._append(df)
+
+    def _append(self, df):
+        if len(df) == 0:
+            return
+        ts = timestamps_ns(df['timestamp'])
+        values = np.column_stack([df[axis].to_numpy(dtype=np.float64) for axis in VIBRATION_COLUMNS])
+        codes = state_codes(df['etat_machine'])
+        bins = np.clip(np.searchsorted(HIST_EDGES, values, side='right') - 1, 0, HIST_BINS - 1)
+        for level in self.levels:
+            level.append(ts, values, codes, bins)
+
+    def _level(self, resolution):
+        for level in self.levels:
+            if level.label == resolution:
+                return level
+        raise ValueError(f"Résolution inconnue: {resolution}")
+
+    def choose_resolution(self, start=None, end=None, max_points=1500):
+        """Résolution la plus fine dont le nombre d'intervalles sur la période tient dans max_points"""
+        with self._lock:
+            return self._choose_level(start, end, max_points).label
+
+    def _choose_level(self, start, end, max_points):
+        finest = self.levels[0]
+        if finest.n == 0:
+            return finest
+        starts = finest.arrays['start'][:finest.n]
+        start_ns = starts[0] if start is None else max(starts[0], timestamps_ns([start])[0])
+        end_ns = starts[finest.n - 1] if end is None else min(starts[finest.n - 1], timestamps_ns([end])[0])
+        for level in self.levels:
+            if (end_ns - start_ns) // level.width + 1 <= max_points:
+                return level
+        return self.levels[-1]
+
+    def query(self, start=None, end=None, max_points=1500, resolution=None):
+        """Série agrégée sur [start, end] (intervalles alignés sur la résolution).
+
+        Retourne (résolution, DataFrame) avec, par intervalle: timestamp, count, moyenne,
+        écart-type, min et max de chaque axe, et le nombre d'échantillons de chaque état.
+        """
+        with self._lock:
+            level = self._level(resolution) if resolution else self._choose_level(start, end, max_points)
+            start_ns = None if start is None else timestamps_ns([start])[0]
+            end_ns = None if end is None else timestamps_ns([end])[0]
+            lo, hi = level.slice(start_ns, end_ns)
+            a = {name: array[lo:hi] for name, array in level.arrays.items()}
+
+            count = a['count'].astype(np.float64)[:, None]
+            mean = a['sum'] / count
+            std = np.sqrt(np.maximum(a['sumsq'] / count - mean * mean, 0.0))
+
+            result = {'timestamp': pd.to_datetime(a['start']), 'count': a['count']}
+            for i, axis in enumerate(VIBRATION_COLUMNS):
+                result[f'{axis}_mean'] = mean[:, i]
+                result[f'{axis}_std'] = std[:, i]
+                result[f'{axis}_min'] = a['min'][:, i]
+                result[f'{axis}_max'] = a['max'][:, i]
+            for i, etat in enumerate(MACHINE_STATES):
+                result[etat] = a['states'][:, i]
+            return level.label, pd.DataFrame(result)
+
+    def aggregate(self, start=None, end=None):
+        """Statistiques globales sur [start, end] à partir des agrégats (sans relire les données).
+
+        Utilise la résolution la plus grossière dont les intervalles sont alignés sur la période
+        (à une seconde près), ce qui limite la lecture à quelques milliers d'intervalles par an.
+        Retourne count, mean, std, min, max (par axe), la matrice de corrélation, l'histogramme
+        par axe (classes HIST_EDGES) et le nombre d'échantillons par état.
+        """
+        with self._lock:
+            start_ns = None if start is None else timestamps_ns([start])[0]
+            end_ns = None if end is None else timestamps_ns([end])[0]
+
+            candidates = [level for level in self.levels if level.with_hist]
+            level = candidates[0]
+            for candidate in candidates[1:]:
+                w = candidate.width
+                start_ok = start_ns is None or start_ns % w == 0
+                end_ok = end_ns is None or w - end_ns % w <= 10**9  # Fin d'intervalle à 1 s près
+                if start_ok and end_ok:
+                    level = candidate
+
+            lo, hi = level.slice(start_ns, end_ns)
+            a = {name: array[lo:hi] for name, array in level.arrays.items()}
+            n = int(a['count'].sum())
+            if n == 0:
+                return {'count': 0, 'resolution': level.label}
+
+            total = a['sum'].sum(axis=0)
+            mean = total / n
+            var = np.maximum(a['sumsq'].sum(axis=0) / n - mean * mean, 0.0)
+            cov = np.diag(var)
+            for k, (i, j) in enumerate(CROSS_PAIRS):
+                cov[i, j] = cov[j, i] = a['cross'][:, k].sum() / n - mean[i] * mean[j]
+            std = np.sqrt(var)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr = cov / np.outer(std, std)
+
+            return {
+                'resolution': level.label,
+                'count': n,
+                'mean': pd.Series(mean, index=VIBRATION_COLUMNS),
+                'std': pd.Series(std, index=VIBRATION_COLUMNS),
+                'min': pd.Series(a['min'].min(axis=0), index=VIBRATION_COLUMNS),
+                'max': pd.Series(a['max'].max(axis=0), index=VIBRATION_COLUMNS),
+                'corr': pd.DataFrame(corr, index=VIBRATION_COLUMNS, columns=VIBRATION_COLUMNS),
+                'hist': pd.DataFrame(a['hist'].sum(axis=0).T, columns=VIBRATION_COLUMNS),
+                'hist_edges': HIST_EDGES,
+                'states': pd.Series(a['states'].sum(axis=0), index=MACHINE_STATES)
+            }
+
+    def exceedances(self, thresholds, start=None, end=None, max_points=1500, resolution=None):
+        """Intervalles dont le maximum dépasse le seuil d'un axe, lus dans les agrégats.
+
+        thresholds: seuil par axe (dict ou Series indexés par VIBRATION_COLUMNS). Retourne un
+        DataFrame (timestamp, axis, value, threshold, count) avec value le maximum de l'intervalle
+        et count le nombre d'échantillons au-dessus du seuil estimé par l'histogramme (interpolation
+        linéaire dans la classe du seuil; NaN aux résolutions sans histogramme).
+        """
+        with self._lock:
+            level = self._level(resolution) if resolution else self._choose_level(start, end, max_points)
+            start_ns = None if start is None else timestamps_ns([start])[0]
+            end_ns = None if end is None else timestamps_ns([end])[0]
+            lo, hi = level.slice(start_ns, end_ns)
+            starts = level.arrays['start'][lo:hi]
+            maxima = level.arrays['max'][lo:hi]
+
+            frames = []
+            for i, axis in enumerate(VIBRATION_COLUMNS):
+                threshold = float(thresholds[axis])
+                rows = np.flatnonzero(maxima[:, i] > threshold)
+                if len(rows) == 0:
+                    continue
+                count = np.full(len(rows), np.nan)
+                if level.with_hist:
+                    hist = level.arrays['hist'][lo:hi][rows, i, :]
+                    # Classes entièrement au-dessus du seuil, plus la fraction de la classe du seuil
+                    k = int(np.clip(np.searchsorted(HIST_EDGES, threshold, side='right') - 1, 0, HIST_BINS - 1))
+                    fraction = np.clip((HIST_EDGES[k + 1] - threshold) / (HIST_EDGES[k + 1] - HIST_EDGES[k]), 0.0, 1.0)
+                    count = hist[:, k + 1:].sum(axis=1) + fraction * hist[:, k]
+                frames.append(pd.DataFrame({
+                    'timestamp': pd.to_datetime(starts[rows]),
+                    'axis': axis,
+                    'value': maxima[rows, i],
+                    'threshold': threshold,
+                    'count': count
+                }))
+            if not frames:
+                return pd.DataFrame(columns=['timestamp', 'axis', 'value', 'threshold', 'count'])
+            return pd.concat(frames, ignore_index=True)
+
+    def memory_usage(self):
+        """Mémoire occupée par les agrégats (octets)"""
+        with self._lock:
+            return sum(array.nbytes for level in self.levels for array in level.arrays.values())
@@ -0,0 +1,92 @@
+import threading
+from datetime import datetime
+
+
+class DataRefreshScheduler:
+    """Thread d'arrière-plan unique qui met à jour les données à cadence fixe.
+
+    À chaque cycle: génération des échantillons manquants jusqu'à l'heure courante, publication
+    du nouvel instantané dans le cache partagé, puis détection incrémentale des arrêts. Pendant
+    que le planificateur tourne, les pages lisent l'instantané publié sans déclencher de lecture.
+    """
+
+    def __init__(self, data_manager, data_generator, interval_seconds=60):
+        self.data_manager = data_manager
+        self.data_generator = data_generator
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.status = {
+            'running': False,
+            'last_run': None,
+            'last_rows': 0,
+            'last_stops': 0,
+            'last_error': None,
+            'cycles': 0
+        }
+
+    def start(self):
+        """Démarre le thread (sans effet s'il tourne déjà)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # Les lectures ne vérifient plus le stockage: le planificateur publie les nouvelles données
+        self.data_manager.cache.auto_refresh = False
+        self._thread = threading.Thread(target=self._run, name='data-refresh', daemon=True)
+        self._thread.start()
+        self.status['running'] = True
+
+    def stop(self, timeout=None):
+        """Arrête le thread et rétablit la vérification du stockage à chaque lecture"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.data_manager.cache.auto_refresh = True
+        self.status['running'] = False
+
+    def trigger(self):
+        """Demande un cycle immédiat"""
+        self._wake.set()
+
+    def run_exclusive(self, fn, *args, **kwargs):
+        """Exécute une écriture de l'interface sous le verrou des cycles (retourne son résultat).
+
+        Toutes les écritures du stockage (génération, anomalie, import, nettoyage) passent par
+        ce verrou: un ajout choisit son nom de fichier et compacte la partition du jour à partir
+        du contenu du dossier, deux écritures simultanées pourraient donc se perdre.
+        """
+        with self._lock:
+            return fn(*args, **kwargs)
+
+    def run_once(self):
+        """Exécute un cycle de mise à jour; retourne le nombre de lignes ajoutées"""
+        with self._lock:
+            try:
+                nouvelles_donnees = self.data_generator.update_to_current_time()
+                self.data_manager.refresh_snapshot()
+
+                nouveaux_arrets = []
+                if len(nouvelles_donnees) > 0 and self.data_manager.config.get('auto_detection_enabled', True):
+                    nouveaux_arrets = self.data_manager.detect_new_stops()
+
+                self.status.update({
+                    'last_run': datetime.now(),
+                    'last_rows': len(nouvelles_donnees),
+                    'last_stops': len(nouveaux_arrets),
+                    'last_error': None,
+                    'cycles': self.status['cycles'] + 1
+                })
+                return len(nouvelles_donnees)
+            except Exception as e:
+                print(f"Erreur lors de la mise à jour en arrière-plan: {e}")
+                self.status.update({'last_run': datetime.now(), 'last_error': str(e)})
+                return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+
+def run_lengths(values):
+    """Découpe un tableau en segments de valeurs consécutives identiques.
+
+    Retourne (starts, lengths, run_values) sous forme de tableaux NumPy.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), values[:0]
+
+    change = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [n]))
+    return starts, ends - starts, values[starts]
+
+
+def timestamps_ns(timestamps):
+    """Convertit une colonne d'horodatages en tableau int64 (nanosecondes epoch)"""
+    values = np.asarray(timestamps)
+    if not np.issubdtype(values.dtype, np.datetime64):
+        values = pd.to_datetime(timestamps).to_numpy()
+    return values.astype('datetime64[ns]', copy=False).view(np.int64)
+
+
+def vibration_magnitude(df):
+    """Vibration totale (norme des trois axes) sous forme de tableau NumPy.
+
+    Calculée dans la précision des axes: float32 si les trois axes sont en float32 (mode
+    compact), float64 sinon.
+    """
+    axes = [df[axis].to_numpy() for axis in ('vibration_x', 'vibration_y', 'vibration_z')]
+    dtype = np.float32 if all(values.dtype == np.float32 for values in axes) else np.float64
+    x, y, z = (values.astype(dtype, copy=False) for values in axes)
+    return np.sqrt(x * x + y * y + z * z)
+
+
+def stopped_mask(df, seuil_arret_vibration):
+    """Échantillons arrêtés (vibration totale <= seuil), comparés dans la précision des axes.
+
+    En mode compact, le seuil est converti en float32 comme les vibrations: un échantillon
+    exactement au seuil reste arrêté (0.1 en float32 vaut 0.10000000149 en float64).
+    """
+    magnitude = vibration_magnitude(df)
+    return magnitude <= magnitude.dtype.type(seuil_arret_vibration)
+
+
+def stop_intervals(stopped, ts_ns, min_duration_min=0):
+    """Extrait les arrêts complets d'un masque booléen d'arrêt.
+
+    Un arrêt est une suite d'échantillons arrêtés dont le début et la fin sont observés:
+    il commence après un échantillon en marche et se termine au premier échantillon
+    en marche suivant. Retourne (indices de début, indices de fin, durées en minutes).
+    """
+    stopped = np.asarray(stopped, dtype=bool)
+    n = len(stopped)
+    starts, lengths, run_values = run_lengths(stopped)
+    ends = starts + lengths
+
+    complete = run_values & (starts > 0) & (ends < n)
+    begin_idx = starts[complete]
+    end_idx = ends[complete]
+
+    durations = (ts_ns[end_idx] - ts_ns[begin_idx]) / 60e9
+    keep = durations >= min_duration_min
+    return begin_idx[keep], end_idx[keep], durations[keep]
+
+
+def state_runs(etats, timestamps):
+    """Segments d'états consécutifs: DataFrame (start, end, state, duration en minutes).
+
+    end est l'horodatage du dernier échantillon du segment; un segment d'un seul échantillon
+    reçoit une durée minimale d'une minute.
+    """
+    codes, uniques = pd.factorize(pd.Series(etats).astype(object))
+    ts_ns = timestamps_ns(timestamps)
+    starts, lengths, run_codes = run_lengths(codes)
+    ends = starts + lengths - 1
+
+    duration = (ts_ns[ends] - ts_ns[starts]) / 60e9
+    duration[duration == 0] = 1
+    return pd.DataFrame({
+        'start': pd.to_datetime(ts_ns[starts]),
+        'end': pd.to_datetime(ts_ns[ends]),
+        'state': np.asarray(uniques, dtype=object)[run_codes],
+        'duration': duration
+    })
@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import threading
+from datetime import datetime
+from utils.segments import run_lengths, stopped_mask, timestamps_ns
+
+
+def build_stop_records(debut_ns, fin_ns, durees):
+    """Construit les enregistrements d'arrêts détectés à partir des tableaux de début/fin/durée"""
+    date_detection = datetime.now()
+    return [
+        {
+            'debut_arret': debut,
+            'fin_arret': fin,
+            'duree_minutes': round(duree, 1),
+            'statut': 'detecte_auto',
+            'necessite_classification': True,
+            'date_detection': date_detection,
+            'classifie': False
+        }
+        for debut, fin, duree in zip(
+            pd.to_datetime(np.asarray(debut_ns, dtype=np.int64)),
+            pd.to_datetime(np.asarray(fin_ns, dtype=np.int64)),
+            np.asarray(durees, dtype=np.float64).tolist()
+        )
+    ]
+
+
+def summarize_chunk(df, seuil_arret_vibration):
+    """Résumé d'un intervalle de temps pour la détection par blocs.
+
+    Contient les arrêts entièrement observés dans le bloc et ce qu'il faut pour les raccorder
+    aux blocs voisins: état du premier et du dernier échantillon, fin de l'arrêt initial et
+    début de l'arrêt final (horodatages en ns).
+    """
+    if len(df) == 0:
+        return None
+    ts_ns = timestamps_ns(df['timestamp'])
+    stopped = stopped_mask(df, seuil_arret_vibration)
+    starts, lengths, run_values = run_lengths(stopped)
+    ends = starts + lengths
+    n = len(stopped)
+
+    interior = run_values & (starts > 0) & (ends < n)
+    return {
+        'rows': n,
+        'first_ts': int(ts_ns[0]),
+        'last_ts': int(ts_ns[-1]),
+        'first_stopped': bool(stopped[0]),
+        'last_stopped': bool(stopped[-1]),
+        'all_stopped': bool(stopped[0]) and len(starts) == 1,
+        'leading_end': int(ts_ns[ends[0]]) if stopped[0] and ends[0] < n else None,
+        'trailing_start': int(ts_ns[starts[-1]]) if stopped[-1] and starts[-1] > 0 else None,
+        'debuts': ts_ns[starts[interior]],
+        'fins': ts_ns[ends[interior]]
+    }
+
+
+def stitch_chunks(summaries, last_stopped=None, open_stop_start=None):
+    """Raccorde les résumés de blocs consécutifs (dans l'ordre chronologique).
+
+    last_stopped/open_stop_start décrivent l'état avant le premier bloc (None: début de
+    l'historique). Retourne (debuts, fins, état final) où l'état final a la forme du point
+    de reprise d'IncrementalStopDetector; le début d'un arrêt non observé vaut NaN.
+    """
+    debut_ouvert = np.nan if open_stop_start is None else float(open_stop_start)
+    debuts, fins = [], []
+    last_ts = None
+    for summary in summaries:
+        if summary is None:
+            continue
+        if summary['first_stopped']:
+            # Poursuite de l'arrêt en cours, ou arrêt commençant au premier échantillon du bloc
+            if last_stopped is None:
+                debut = np.nan
+            elif last_stopped:
+                debut = debut_ouvert
+            else:
+                debut = float(summary['first_ts'])
+            if summary['all_stopped']:
+                debut_ouvert = debut
+            else:
+                debuts.append([debut])
+                fins.append([summary['leading_end']])
+        elif last_stopped:
+            # L'arrêt en cours s'est terminé au premier échantillon du bloc
+            debuts.append([debut_ouvert])
+            fins.append([summary['first_ts']])
+
+        debuts.append(summary['debuts'].astype(np.float64))
+        fins.append(summary['fins'])
+        if summary['trailing_start'] is not None:
+            debut_ouvert = float(summary['trailing_start'])
+        last_stopped = summary['last_stopped']
+        last_ts = summary['last_ts']
+
+    debuts = np.concatenate(debuts) if debuts else np.empty(0)
+    fins = np.concatenate(fins).astype(np.int64) if fins else np.empty(0, dtype=np.int64)
+    state = {
+        'last_timestamp': last_ts,
+        'last_stopped': last_stopped,
+        'open_stop_start': debut_ouvert if last_stopped and not np.isnan(debut_ouvert) else None
+    }
+    return debuts, fins, state
+
+
+class IncrementalStopDetector:
+    """Détecteur d'arrêts incrémental avec point de reprise persistant.
+
+    Le point de reprise (dernier horodatage traité, état du dernier échantillon et début de
+    l'arrêt en cours) est enregistré en JSON: chaque appel ne traite que les nouveaux
+    échantillons et retourne uniquement les arrêts qui viennent de se terminer.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _default_state(self):
+        return {
+            'last_timestamp': None,     # Dernier horodatage traité
+            'last_stopped': None,       # Le dernier échantillon traité était-il arrêté ?
+            'open_stop_start': None,    # Début de l'arrêt en cours (None si inconnu)
+            'seuil_arret_vibration': None,
+            'duree_min_arret': None
+        }
+
+    def _load_state(self):
+        """Charge le point de reprise"""
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as f:
+                    state = self._default_state()
+                    state.update(json.load(f))
+                    return state
+            except Exception as e:
+                print(f"Erreur lors du chargement du point de reprise: {e}")
+        return self._default_state()
+
+    def _save_state(self):
+        """Enregistre le point de reprise"""
+        tmp_file = self.state_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def reset(self):
+        """Oublie le point de reprise: le prochain appel retraitera tout l'historique"""
+        with self._lock:
+            self.state = self._default_state()
+            self._save_state()
+
+    def advance(self, last_timestamp_ns, last_stopped, open_stop_start_ns,
+                seuil_arret_vibration, duree_min_arret):
+        """Avance le point de reprise après un traitement externe (détection par blocs).
+
+        Sans effet si le point de reprise est déjà plus récent, pour les mêmes paramètres.
+        Retourne True si le point de reprise a été mis à jour.
+        """
+        with self._lock:
+            same_params = (self.state['seuil_arret_vibration'] == seuil_arret_vibration and
+                           self.state['duree_min_arret'] == duree_min_arret)
+            current = self.last_timestamp
+            if same_params and current is not None and current.value >= last_timestamp_ns:
+                return False
+            self.state = {
+                'last_timestamp': pd.Timestamp(int(last_timestamp_ns)).isoformat(),
+                'last_stopped': bool(last_stopped),
+                'open_stop_start': (
+                    None if open_stop_start_ns is None else pd.Timestamp(int(open_stop_start_ns)).isoformat()
+                ),
+                'seuil_arret_vibration': seuil_arret_vibration,
+                'duree_min_arret': duree_min_arret
+            }
+            self._save_state()
+            return True
+
+    @property
+    def last_timestamp(self):
+        value = self.state.get('last_timestamp')
+        return pd.Timestamp(value) if value else None
+
+    def process(self, df, seuil_arret_vibration, duree_min_arret):
+        """Traite les échantillons postérieurs au point de reprise et retourne les arrêts terminés"""
+        with self._lock:
+            # Un changement de paramètres invalide le point de reprise
+            if (self.state['seuil_arret_vibration'] != seuil_arret_vibration or
+                    self.state['duree_min_arret'] != duree_min_arret):
+                self.state = self._default_state()
+                self.state['seuil_arret_vibration'] = seuil_arret_vibration
+                self.state['duree_min_arret'] = duree_min_arret
+
+            ts_ns = timestamps_ns(df['timestamp']) if len(df) > 0 else np.empty(0, dtype=np.int64)
+            if self.last_timestamp is not None:
+                new_rows = ts_ns > self.last_timestamp.value
+                df, ts_ns = df[new_rows], ts_ns[new_rows]
+            if len(df) == 0:
+                return []
+
+            stopped = stopped_mask(df, seuil_arret_vibration)
+            starts, lengths, run_values = run_lengths(stopped)
+            ends = starts + lengths
+            n = len(stopped)
+
+            last_stopped = self.state['last_stopped']
+            open_stop_start = self.state['open_stop_start']
+
+            # Début de chaque segment d'arrêt; NaN si le début n'a pas été observé
+            stop_starts = starts[run_values]
+            stop_ends = ends[run_values]
+            debuts = ts_ns[stop_starts].astype(np.float64)
+            debut_en_cours = pd.Timestamp(open_stop_start).value if open_stop_start else np.nan
+            if len(stop_starts) > 0 and stop_starts[0] == 0:
+                if last_stopped is None:
+                    debuts[0] = np.nan  # Premier échantillon de l'historique: début inconnu
+                elif last_stopped:
+                    # Poursuite de l'arrêt en cours lors du traitement précédent
+                    debuts[0] = debut_en_cours
+            elif last_stopped:
+                # L'arrêt en cours s'est terminé au premier échantillon de ce lot
+                stop_starts = np.concatenate(([0], stop_starts))
+                stop_ends = np.concatenate(([0], stop_ends))
+                debuts = np.concatenate(([debut_en_cours], debuts))
+
+            # Les arrêts qui se terminent dans ce lot sont émis, le dernier peut rester ouvert
+            closed = stop_ends < n
+            fins = ts_ns[np.minimum(stop_ends[closed], n - 1)]
+            debuts_closed = debuts[closed]
+            durees = (fins - debuts_closed) / 60e9
+            keep = ~np.isnan(debuts_closed) & (durees >= duree_min_arret)
+            arrets = build_stop_records(debuts_closed[keep], fins[keep], durees[keep])
+
+            if len(stop_ends) > 0 and stop_ends[-1] == n:
+                debut_ouvert = debuts[-1]
+                self.state['open_stop_start'] = (
+                    None if np.isnan(debut_ouvert) else pd.Timestamp(int(debut_ouvert)).isoformat()
+                )
+            else:
+                self.state['open_stop_start'] = None
+            self.state['last_stopped'] = bool(stopped[-1])
+            self.state['last_timestamp'] = pd.Timestamp(ts_ns[-1]).isoformat()
+            self._save_state()
+
+            return arrets
@@ -0,0 +1,309 @@
+import pandas as pd
+import numpy as np
+import os
+import sqlite3
+from contextlib import closing
+
+# Colonnes des tables d'arrêts (ordre des DataFrames retournés)
+ARRETS_COLUMNS = [
+    'timestamp', 'type_arret', 'sous_categorie', 'piece_concernee',
+    'duree_minutes', 'commentaire', 'operateur', 'urgence', 'date_saisie'
+]
+ARRETS_AUTO_COLUMNS = [
+    'arret_id', 'debut_arret', 'fin_arret', 'duree_minutes', 'statut', 'necessite_classification',
+    'type_arret', 'sous_categorie', 'commentaire', 'operateur',
+    'classifie', 'date_detection', 'date_classification', 'urgence'
+]
+CLASSIFICATION_FIELDS = ['type_arret', 'sous_categorie', 'commentaire', 'operateur', 'urgence']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS arrets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    type_arret TEXT,
+    sous_categorie TEXT,
+    piece_concernee TEXT,
+    duree_minutes REAL,
+    commentaire TEXT,
+    operateur TEXT,
+    urgence TEXT,
+    date_saisie TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_arrets_timestamp ON arrets(timestamp);
+CREATE INDEX IF NOT EXISTS idx_arrets_type ON arrets(type_arret);
+CREATE INDEX IF NOT EXISTS idx_arrets_operateur ON arrets(operateur);
+
+CREATE TABLE IF NOT EXISTS arrets_auto (
+    arret_id INTEGER PRIMARY KEY,
+    debut_arret TEXT NOT NULL,
+    fin_arret TEXT,
+    duree_minutes REAL,
+    statut TEXT,
+    necessite_classification INTEGER,
+    type_arret TEXT,
+    sous_categorie TEXT,
+    commentaire TEXT,
+    operateur TEXT,
+    classifie INTEGER NOT NULL DEFAULT 0,
+    date_detection TEXT,
+    date_classification TEXT,
+    urgence TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_arrets_auto_debut ON arrets_auto(debut_arret);
+CREATE INDEX IF NOT EXISTS idx_arrets_auto_classifie ON arrets_auto(classifie, debut_arret);
+CREATE INDEX IF NOT EXISTS idx_arrets_auto_type ON arrets_auto(type_arret);
+CREATE INDEX IF NOT EXISTS idx_arrets_auto_operateur ON arrets_auto(operateur);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_TIME_COLUMNS = {
+    'arrets': ['timestamp', 'date_saisie'],
+    'arrets_auto': ['debut_arret', 'fin_arret', 'date_detection', 'date_classification']
+}
+
+
+def to_db_time(value):
+    """Horodatage au format texte à largeur fixe (ordre lexicographique = ordre chronologique)"""
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _to_db_value(value):
+    """Convertit une valeur Python/NumPy en valeur SQLite"""
+    if value is None:
+        return None
+    if isinstance(value, (np.bool_, bool)):
+        return int(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _record_values(table, record, columns):
+    """Valeurs SQLite d'un enregistrement (dictionnaire) dans l'ordre des colonnes"""
+    values = [
+        to_db_time(record.get(column)) if column in _TIME_COLUMNS[table] else _to_db_value(record.get(column))
+        for column in columns
+    ]
+    if 'classifie' in columns and values[columns.index('classifie')] is None:
+        values[columns.index('classifie')] = 0
+    return values
+
+
+class StopStore:
+    """Base SQLite des arrêts manuels (table arrets) et détectés automatiquement (table arrets_auto).
+
+    Chaque opération ouvre sa propre connexion: le magasin peut être partagé entre les threads
+    de l'application. Les filtres et la pagination sont exécutés par SQLite sur les index.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _read_query(self, table, sql, params=()):
+        """Exécute une requête de lecture et retourne un DataFrame typé"""
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        for column in _TIME_COLUMNS[table]:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        for column in ['classifie', 'necessite_classification']:
+            if column in df.columns:
+                df[column] = df[column].fillna(0).astype(bool)
+        return df
+
+    def _where(self, time_column, start=None, end=None, **filters):
+        """Construit la clause WHERE (intervalle de temps et listes de valeurs acceptées)"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f"{time_column} >= ?")
+            params.append(to_db_time(start))
+        if end is not None:
+            clauses.append(f"{time_column} <= ?")
+            params.append(to_db_time(end))
+        for column, values in filters.items():
+            if values is None:
+                continue
+            if isinstance(values, (bool, np.bool_)):
+                clauses.append(f"{column} = ?")
+                params.append(int(values))
+            elif len(values) > 0:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(_to_db_value(value) for value in values)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def _page(self, limit=None, offset=0):
+        if limit is None:
+            return "", []
+        return " LIMIT ? OFFSET ?", [int(limit), int(offset)]
+
+    # --- Arrêts manuels ---
+
+    def insert_arret(self, arret):
+        """Enregistre un arrêt manuel et retourne son identifiant"""
+        values = _record_values('arrets', arret, ARRETS_COLUMNS)
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                f"INSERT INTO arrets ({', '.join(ARRETS_COLUMNS)}) VALUES ({', '.join('?' * len(ARRETS_COLUMNS))})",
+                values
+            )
+            return cursor.lastrowid
+
+    def import_arrets(self, df):
+        """Importe des arrêts manuels existants en une transaction"""
+        rows = [_record_values('arrets', record, ARRETS_COLUMNS) for record in df.to_dict('records')]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT INTO arrets ({', '.join(ARRETS_COLUMNS)}) VALUES ({', '.join('?' * len(ARRETS_COLUMNS))})",
+                rows
+            )
+        return len(rows)
+
+    def query_arrets(self, start=None, end=None, types=None, operateurs=None, urgences=None, limit=None, offset=0):
+        """Arrêts manuels filtrés, du plus récent au plus ancien"""
+        where, params = self._where('timestamp', start, end, type_arret=types,
+                                    operateur=operateurs, urgence=urgences)
+        page, page_params = self._page(limit, offset)
+        return self._read_query(
+            'arrets',
+            f"SELECT {', '.join(ARRETS_COLUMNS)} FROM arrets{where} ORDER BY timestamp DESC{page}",
+            params + page_params
+        )
+
+    def count_arrets(self, start=None, end=None, types=None, operateurs=None, urgences=None):
+        """Nombre d'arrêts manuels correspondant aux filtres"""
+        where, params = self._where('timestamp', start, end, type_arret=types,
+                                    operateur=operateurs, urgence=urgences)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM arrets{where}", params).fetchone()[0]
+
+    def distinct_values(self, table, column):
+        """Valeurs distinctes d'une colonne (listes de choix des filtres)"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {column}"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- Arrêts détectés automatiquement ---
+
+    def insert_arrets_auto(self, arrets, tolerance_seconds=300):
+        """Insère des arrêts auto en une transaction, en ignorant les doublons.
+
+        Un arrêt dont le début est à moins de `tolerance_seconds` d'un arrêt déjà enregistré
+        (y compris un arrêt inséré plus tôt dans le même lot) est ignoré; la recherche utilise
+        l'index sur debut_arret. Retourne les arrêts insérés, complétés de leur arret_id.
+        """
+        tolerance = pd.Timedelta(seconds=tolerance_seconds)
+        columns = ARRETS_AUTO_COLUMNS[1:]
+        inseres = []
+        with closing(self._connect()) as conn, conn:
+            for arret in sorted(arrets, key=lambda a: pd.Timestamp(a['debut_arret'])):
+                debut = pd.Timestamp(arret['debut_arret'])
+                doublon = conn.execute(
+                    "SELECT 1 FROM arrets_auto WHERE debut_arret > ? AND debut_arret < ? LIMIT 1",
+                    (to_db_time(debut - tolerance), to_db_time(debut + tolerance))
+                ).fetchone()
+                if doublon is not None:
+                    continue
+
+                values = _record_values('arrets_auto', arret, columns)
+                cursor = conn.execute(
+                    f"INSERT INTO arrets_auto ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    values
+                )
+                arret['arret_id'] = cursor.lastrowid
+                inseres.append(arret)
+        return inseres
+
+    def import_arrets_auto(self, df):
+        """Importe des arrêts auto existants (identifiants conservés), sans déduplication"""
+        rows = [_record_values('arrets_auto', record, ARRETS_AUTO_COLUMNS) for record in df.to_dict('records')]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO arrets_auto ({', '.join(ARRETS_AUTO_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(ARRETS_AUTO_COLUMNS))})",
+                rows
+            )
+        return len(rows)
+
+    def query_arrets_auto(self, classifie=None, start=None, end=None, types=None, operateurs=None,
+                          limit=None, offset=0):
+        """Arrêts auto filtrés, du plus récent au plus ancien, indexés par arret_id"""
+        where, params = self._where('debut_arret', start, end, classifie=classifie,
+                                    type_arret=types, operateur=operateurs)
+        page, page_params = self._page(limit, offset)
+        df = self._read_query(
+            'arrets_auto',
+            f"SELECT {', '.join(ARRETS_AUTO_COLUMNS)} FROM arrets_auto{where} ORDER BY debut_arret DESC{page}",
+            params + page_params
+        )
+        df.index = df['arret_id'].to_numpy()
+        return df
+
+    def count_arrets_auto(self, classifie=None, start=None, end=None, types=None, operateurs=None):
+        """Nombre d'arrêts auto correspondant aux filtres"""
+        where, params = self._where('debut_arret', start, end, classifie=classifie,
+                                    type_arret=types, operateur=operateurs)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM arrets_auto{where}", params).fetchone()[0]
+
+    def classify_arrets_auto(self, arret_ids, classification, date_classification):
+        """Classifie des arrêts auto par identifiant; retourne le nombre d'arrêts mis à jour"""
+        assignments = ', '.join(f"{field} = ?" for field in CLASSIFICATION_FIELDS)
+        values = [_to_db_value(classification.get(field)) for field in CLASSIFICATION_FIELDS]
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.executemany(
+                f"UPDATE arrets_auto SET {assignments}, classifie = 1, date_classification = ? WHERE arret_id = ?",
+                [values + [to_db_time(date_classification), int(arret_id)] for arret_id in arret_ids]
+            )
+            return cursor.rowcount
+
+    # --- Maintenance ---
+
+    def delete_before(self, cutoff):
+        """Supprime les arrêts antérieurs à cutoff; retourne (arrêts manuels, arrêts auto) supprimés"""
+        cutoff = to_db_time(cutoff)
+        with closing(self._connect()) as conn, conn:
+            removed = conn.execute("DELETE FROM arrets WHERE timestamp < ?", (cutoff,)).rowcount
+            removed_auto = conn.execute("DELETE FROM arrets_auto WHERE debut_arret < ?", (cutoff,)).rowcount
+        return removed, removed_auto
+
+    def get_meta(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def size_bytes(self):
+        """Taille de la base sur disque (octets)"""
+        return sum(
+            os.path.getsize(path) for path in [self.db_path, self.db_path + '-wal']
+            if os.path.exists(path)
+        )
+
+    def backup(self, backup_dir, prefix):
+        """Copie cohérente de la base (API de sauvegarde SQLite)"""
+        backup_path = os.path.join(backup_dir, f"{prefix}_{os.path.basename(self.db_path)}")
+        with closing(self._connect()) as source, closing(sqlite3.connect(backup_path)) as target:
+            source.backup(target)
+        return [backup_path]
@@ -0,0 +1,469 @@
+import pandas as pd
+import os
+import shutil
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Colonnes des données machine
+MACHINE_COLUMNS = ['timestamp', 'etat_machine', 'vibration_x', 'vibration_y', 'vibration_z']
+VIBRATION_COLUMNS = ['vibration_x', 'vibration_y', 'vibration_z']
+MACHINE_STATES = ['en_marche', 'panne', 'arret_production', 'probleme_qualite']
+
+
+def normalize_machine_df(df):
+    """Convertit un DataFrame machine vers les types de colonnes attendus"""
+    df = df.copy()
+    # Horodatages en ns quel que soit le moteur (pandas>=3 lit les CSV en microsecondes)
+    df['timestamp'] = pd.to_datetime(df['timestamp']).astype('datetime64[ns]')
+    df['etat_machine'] = df['etat_machine'].astype(object)
+    for axis in VIBRATION_COLUMNS:
+        df[axis] = df[axis].astype('float64')
+    return df[MACHINE_COLUMNS]
+
+
+def compact_machine_df(df):
+    """Représentation mémoire compacte: état catégoriel (1 octet) et axes en float32"""
+    df = df.copy()
+    if 'etat_machine' in df.columns and not isinstance(df['etat_machine'].dtype, pd.CategoricalDtype):
+        extra_states = sorted(set(df['etat_machine'].dropna().unique()) - set(MACHINE_STATES))
+        df['etat_machine'] = pd.Categorical(df['etat_machine'], categories=MACHINE_STATES + extra_states)
+    for axis in VIBRATION_COLUMNS:
+        if axis in df.columns:
+            df[axis] = df[axis].astype('float32')
+    return df
+
+
+def _range_mask(timestamps, start=None, end=None):
+    """Masque des horodatages compris dans [start, end] (bornes incluses)"""
+    mask = pd.Series(True, index=timestamps.index)
+    if start is not None:
+        mask &= timestamps >= pd.to_datetime(start)
+    if end is not None:
+        mask &= timestamps <= pd.to_datetime(end)
+    return mask
+
+
+def _read_columns(columns):
+    """Colonnes à lire: l'horodatage est toujours inclus"""
+    if columns is None:
+        return list(MACHINE_COLUMNS)
+    return ['timestamp'] + [col for col in columns if col != 'timestamp']
+
+
+class CsvStorage:
+    """Stockage des données machine dans un fichier CSV unique"""
+    name = 'csv'
+
+    def __init__(self, data_dir='data'):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, 'machine_data.csv')
+
+    def exists(self):
+        """Indique si des données machine sont disponibles"""
+        return os.path.exists(self.path)
+
+    def read(self, start=None, end=None, columns=None):
+        """Charge les données machine (le CSV est lu en entier puis filtré)"""
+        df = pd.read_csv(self.path, usecols=_read_columns(columns))
+        df['timestamp'] = pd.to_datetime(df['timestamp']).astype('datetime64[ns]')
+        if 'etat_machine' in df.columns:
+            df['etat_machine'] = df['etat_machine'].astype(object)
+        if start is not None or end is not None:
+            df = df[_range_mask(df['timestamp'], start, end)].reset_index(drop=True)
+        return df[_read_columns(columns)]
+
+    def version(self, fingerprint_size=64):
+        """Version du fichier: taille, date de modification et empreinte des derniers octets"""
+        if not self.exists():
+            return None
+        stat = os.stat(self.path)
+        with open(self.path, 'rb') as f:
+            f.seek(max(0, stat.st_size - fingerprint_size))
+            fingerprint = f.read()
+        return (stat.st_size, stat.st_mtime_ns, fingerprint)
+
+    def read_changes(self, version):
+        """Lit les lignes ajoutées depuis `version`.
+
+        Retourne (depuis, df): les lignes du cache postérieures à `depuis` sont remplacées
+        par df (depuis=None: simple ajout), ou None si une relecture complète est nécessaire.
+        """
+        current = self.version()
+        # Un ajout agrandit toujours le fichier: à taille égale ou inférieure, il a été réécrit
+        if version is None or current is None or current[0] <= version[0]:
+            return None
+        old_size, _, old_fingerprint = version
+        with open(self.path, 'rb') as f:
+            # Le fichier n'a été modifié qu'en fin si les octets précédents sont inchangés
+            f.seek(old_size - len(old_fingerprint))
+            if f.read(len(old_fingerprint)) != old_fingerprint:
+                return None
+            df = pd.read_csv(f, header=None, names=MACHINE_COLUMNS)
+        return (None, normalize_machine_df(df))
+
+    def summary(self):
+        """Nombre de lignes et bornes temporelles des données"""
+        if not self.exists():
+            return {'rows': 0, 'first': None, 'last': None}
+        timestamps = pd.to_datetime(pd.read_csv(self.path, usecols=['timestamp'])['timestamp'])
+        return {
+            'rows': len(timestamps),
+            'first': timestamps.min() if len(timestamps) > 0 else None,
+            'last': timestamps.max() if len(timestamps) > 0 else None
+        }
+
+    def write(self, df):
+        """Réécrit l'ensemble des données machine"""
+        normalize_machine_df(df).to_csv(self.path, index=False)
+
+    def replace_range(self, df):
+        """Remplace les lignes de l'intervalle couvert par df (le fichier CSV est réécrit)"""
+        if len(df) == 0:
+            return
+        df = normalize_machine_df(df)
+        start, end = df['timestamp'].min(), df['timestamp'].max()
+        existing = self.read()
+        keep = existing[(existing['timestamp'] < start) | (existing['timestamp'] > end)]
+        self.write(pd.concat([keep, df], ignore_index=True).sort_values('timestamp', kind='stable'))
+
+    def append(self, df):
+        """Ajoute de nouvelles lignes en fin de fichier sans relire l'historique"""
+        if len(df) == 0:
+            return
+        header = not self.exists() or os.path.getsize(self.path) == 0
+        normalize_machine_df(df).to_csv(self.path, mode='a', header=header, index=False)
+
+    def last_timestamp(self, block_size=4096):
+        """Lit le dernier horodatage en ne parcourant que la fin du fichier"""
+        if not self.exists():
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            offset = max(0, end - block_size)
+            # Recule jusqu'à disposer d'au moins une ligne complète
+            while True:
+                f.seek(offset)
+                lines = f.read(end - offset).splitlines()
+                lines = [line for line in lines if line.strip()]
+                if offset == 0 or len(lines) >= 2:
+                    break
+                offset = max(0, offset - block_size)
+        if len(lines) == 0 or (offset == 0 and len(lines) == 1):
+            return None  # Fichier vide ou en-tête seul
+        return pd.to_datetime(lines[-1].decode('utf-8').split(',')[0])
+
+    def size_bytes(self):
+        """Taille occupée sur le disque (octets)"""
+        return os.path.getsize(self.path) if self.exists() else 0
+
+    def import_csv(self, source):
+        """Importe un fichier CSV (chemin ou buffer) en remplaçant les données"""
+        self.write(pd.read_csv(source))
+
+    def export_csv(self, destination):
+        """Exporte les données machine au format CSV"""
+        self.read().to_csv(destination, index=False)
+        return destination
+
+    def backup(self, backup_dir, prefix):
+        """Copie les données machine dans le dossier de sauvegarde"""
+        if not self.exists():
+            return []
+        backup_path = os.path.join(backup_dir, f"{prefix}_{os.path.basename(self.path)}")
+        shutil.copy2(self.path, backup_path)
+        return [backup_path]
+
+
+class ParquetStorage:
+    """Stockage columnaire compressé, partitionné par jour (data/machine_data/date=AAAA-MM-JJ/)"""
+    name = 'parquet'
+
+    def __init__(self, data_dir='data', compression='zstd', max_parts_per_day=24, row_group_size=10000):
+        self.data_dir = data_dir
+        self.root = os.path.join(data_dir, 'machine_data')
+        self.legacy_csv_path = os.path.join(data_dir, 'machine_data.csv')
+        self.compression = compression
+        # Au-delà de ce nombre de fichiers d'ajout, la partition du jour est compactée
+        self.max_parts_per_day = max_parts_per_day
+        # Groupes de lignes de taille modérée pour permettre le filtrage par statistiques
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ('timestamp', pa.timestamp('ns')),
+            ('etat_machine', pa.dictionary(pa.int8(), pa.string())),
+            ('vibration_x', pa.float64()),
+            ('vibration_y', pa.float64()),
+            ('vibration_z', pa.float64()),
+        ])
+
+    def _partition_dirs(self, root=None):
+        """Liste triée des dossiers de partition journalière"""
+        root = root or self.root
+        if not os.path.isdir(root):
+            return []
+        return sorted(
+            os.path.join(root, name) for name in os.listdir(root)
+            if name.startswith('date=')
+        )
+
+    def _partition_files(self, partition_dir):
+        """Liste triée des fichiers Parquet d'une partition"""
+        return sorted(
+            os.path.join(partition_dir, name) for name in os.listdir(partition_dir)
+            if name.endswith('.parquet')
+        )
+
+    def _all_files(self, start=None, end=None):
+        """Fichiers des partitions qui recouvrent l'intervalle [start, end]"""
+        start_day = pd.to_datetime(start).date().isoformat() if start is not None else None
+        end_day = pd.to_datetime(end).date().isoformat() if end is not None else None
+        files = []
+        for partition_dir in self._partition_dirs():
+            day = os.path.basename(partition_dir)[len('date='):]
+            if (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                continue
+            files.extend(self._partition_files(partition_dir))
+        return files
+
+    def _to_table(self, df):
+        """Convertit un DataFrame machine en table Arrow typée"""
+        df = normalize_machine_df(df)
+        df['etat_machine'] = df['etat_machine'].astype('category')
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+    def _write_partitions(self, df, root, part_name):
+        """Écrit un fichier par jour présent dans le DataFrame"""
+        df = normalize_machine_df(df).sort_values('timestamp', kind='stable')
+        written = []
+        for day, day_df in df.groupby(df['timestamp'].dt.floor('D'), sort=True):
+            partition_dir = os.path.join(root, f"date={day.date().isoformat()}")
+            os.makedirs(partition_dir, exist_ok=True)
+            path = os.path.join(partition_dir, part_name)
+            pq.write_table(self._to_table(day_df), path, compression=self.compression,
+                           row_group_size=self.row_group_size)
+            written.append(path)
+        return written
+
+    def _to_pandas(self, table):
+        df = table.to_pandas()
+        if 'etat_machine' in df.columns:
+            df['etat_machine'] = df['etat_machine'].astype(object)
+        return df
+
+    def exists(self):
+        """Indique si des données machine sont disponibles"""
+        return len(self._all_files()) > 0
+
+    def read(self, start=None, end=None, columns=None):
+        """Charge les données machine en ne lisant que les partitions et groupes de lignes utiles"""
+        columns = _read_columns(columns)
+        files = self._all_files(start, end)
+        if not files:
+            return normalize_machine_df(pd.DataFrame(columns=MACHINE_COLUMNS))[columns]
+
+        filters = []
+        if start is not None:
+            filters.append(('timestamp', '>=', pd.to_datetime(start)))
+        if end is not None:
+            filters.append(('timestamp', '<=', pd.to_datetime(end)))
+
+        table = pq.read_table(files, schema=self.schema, columns=columns, filters=filters or None)
+        return self._to_pandas(table)
+
+    def version(self):
+        """Version des partitions: (partition, fichier, taille, date de modification) de chaque fichier"""
+        entries = []
+        for partition_dir in self._partition_dirs():
+            for path in self._partition_files(partition_dir):
+                stat = os.stat(path)
+                entries.append((os.path.basename(partition_dir), os.path.basename(path),
+                                stat.st_size, stat.st_mtime_ns))
+        return tuple(entries) if entries else None
+
+    def read_changes(self, version):
+        """Lit les données modifiées depuis `version`.
+
+        Retourne (depuis, df): les lignes du cache postérieures à `depuis` sont remplacées
+        par df (depuis=None: simple ajout), ou None si une relecture complète est nécessaire.
+        """
+        current = self.version()
+        if version is None or current is None:
+            return None
+        old_entries, new_entries = set(version), set(current)
+        removed = old_entries - new_entries
+        added = sorted(new_entries - old_entries)
+        if not added and not removed:
+            return (None, normalize_machine_df(pd.DataFrame(columns=MACHINE_COLUMNS)))
+
+        last_cached_day = max(entry[0] for entry in version)
+        changed_days = {entry[0] for entry in removed} | {entry[0] for entry in added}
+        if min(changed_days) < last_cached_day:
+            return None  # Réécriture de l'historique
+
+        if not removed:
+            # Nouveaux fichiers d'ajout uniquement
+            files = [os.path.join(self.root, entry[0], entry[1]) for entry in added]
+            return (None, self._to_pandas(pq.read_table(files, schema=self.schema)))
+
+        # Partition de fin compactée: relecture des seuls jours concernés
+        since = pd.Timestamp(min(changed_days)[len('date='):])
+        return (since, self.read(start=since))
+
+    def summary(self):
+        """Nombre de lignes et bornes temporelles, lus dans les métadonnées Parquet"""
+        rows, first, last = 0, None, None
+        for path in self._all_files():
+            metadata = pq.read_metadata(path)
+            rows += metadata.num_rows
+            for i in range(metadata.num_row_groups):
+                stats = metadata.row_group(i).column(0).statistics
+                if stats is not None and stats.has_min_max:
+                    first = pd.Timestamp(stats.min) if first is None else min(first, pd.Timestamp(stats.min))
+                    last = pd.Timestamp(stats.max) if last is None else max(last, pd.Timestamp(stats.max))
+        return {'rows': rows, 'first': first, 'last': last}
+
+    def write(self, df):
+        """Réécrit l'ensemble des données machine (remplacement atomique du dossier)"""
+        tmp_root = self.root + '.tmp'
+        old_root = self.root + '.old'
+        for path in (tmp_root, old_root):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+        os.makedirs(tmp_root)
+        self._write_partitions(df, tmp_root, 'part-00000.parquet')
+
+        if os.path.exists(self.root):
+            os.rename(self.root, old_root)
+        os.rename(tmp_root, self.root)
+        if os.path.exists(old_root):
+            shutil.rmtree(old_root)
+
+    def append(self, df):
+        """Ajoute de nouvelles lignes dans un nouveau fichier de la partition du jour"""
+        if len(df) == 0:
+            return
+        df = normalize_machine_df(df).sort_values('timestamp', kind='stable')
+        for day, day_df in df.groupby(df['timestamp'].dt.floor('D'), sort=True):
+            partition_dir = os.path.join(self.root, f"date={day.date().isoformat()}")
+            os.makedirs(partition_dir, exist_ok=True)
+            files = self._partition_files(partition_dir)
+            next_part = int(os.path.basename(files[-1])[5:10]) + 1 if files else 0
+            path = os.path.join(partition_dir, f"part-{next_part:05d}.parquet")
+            pq.write_table(self._to_table(day_df), path, compression=self.compression,
+                           row_group_size=self.row_group_size)
+            if len(files) + 1 > self.max_parts_per_day:
+                self._compact_partition(partition_dir)
+
+    def write_part(self, df, part_name):
+        """Écrit des lignes dans des fichiers de nom donné (un par jour), sans lister les partitions.
+
+        Avec des noms uniques, plusieurs processus peuvent écrire en parallèle dans le même stockage.
+        Retourne les chemins écrits.
+        """
+        if len(df) == 0:
+            return []
+        return self._write_partitions(df, self.root, part_name)
+
+    def replace_range(self, df):
+        """Remplace les lignes de l'intervalle couvert par df en ne réécrivant que les jours concernés"""
+        if len(df) == 0:
+            return
+        df = normalize_machine_df(df).sort_values('timestamp', kind='stable')
+        start, end = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+        for day, day_df in df.groupby(df['timestamp'].dt.floor('D'), sort=True):
+            partition_dir = os.path.join(self.root, f"date={day.date().isoformat()}")
+            os.makedirs(partition_dir, exist_ok=True)
+            files = self._partition_files(partition_dir)
+            if files:
+                existing = self._to_pandas(pq.read_table(files, schema=self.schema))
+                keep = existing[(existing['timestamp'] < start) | (existing['timestamp'] > end)]
+                day_df = pd.concat([keep, day_df], ignore_index=True).sort_values('timestamp', kind='stable')
+
+            # Partition réécrite en un seul fichier, remplacé après écriture complète
+            tmp_path = os.path.join(partition_dir, 'replace.parquet.tmp')
+            pq.write_table(self._to_table(day_df), tmp_path, compression=self.compression,
+                           row_group_size=self.row_group_size)
+            for path in files:
+                os.remove(path)
+            os.rename(tmp_path, os.path.join(partition_dir, 'part-00000.parquet'))
+
+    def _compact_partition(self, partition_dir):
+        """Fusionne les fichiers d'une partition journalière en un seul"""
+        files = self._partition_files(partition_dir)
+        table = pq.read_table(files, schema=self.schema)
+        tmp_path = os.path.join(partition_dir, 'compact.parquet.tmp')
+        pq.write_table(table, tmp_path, compression=self.compression,
+                       row_group_size=self.row_group_size)
+        for path in files:
+            os.remove(path)
+        os.rename(tmp_path, os.path.join(partition_dir, 'part-00000.parquet'))
+
+    def last_timestamp(self):
+        """Lit le dernier horodatage depuis les statistiques Parquet de la dernière partition"""
+        for partition_dir in reversed(self._partition_dirs()):
+            last = None
+            for path in self._partition_files(partition_dir):
+                metadata = pq.read_metadata(path)
+                for i in range(metadata.num_row_groups):
+                    stats = metadata.row_group(i).column(0).statistics
+                    if stats is not None and stats.has_min_max:
+                        value = pd.Timestamp(stats.max)
+                        last = value if last is None else max(last, value)
+            if last is not None:
+                return last
+        return None
+
+    def size_bytes(self):
+        """Taille occupée sur le disque (octets)"""
+        return sum(os.path.getsize(path) for path in self._all_files())
+
+    def import_csv(self, source):
+        """Importe un fichier CSV (chemin ou buffer) en remplaçant les données"""
+        self.write(pd.read_csv(source))
+
+    def export_csv(self, destination):
+        """Exporte les données machine au format CSV"""
+        self.read().to_csv(destination, index=False)
+        return destination
+
+    def migrate_legacy_csv(self):
+        """Importe l'ancien fichier machine_data.csv si le stockage Parquet est vide"""
+        if not self.exists() and os.path.exists(self.legacy_csv_path):
+            try:
+                self.import_csv(self.legacy_csv_path)
+                print(f"✅ Données migrées de {self.legacy_csv_path} vers {self.root}")
+            except Exception as e:
+                print(f"Erreur lors de la migration CSV vers Parquet: {e}")
+
+    def backup(self, backup_dir, prefix):
+        """Copie les partitions dans le dossier de sauvegarde"""
+        if not self.exists():
+            return []
+        backup_path = os.path.join(backup_dir, f"{prefix}_{os.path.basename(self.root)}")
+        shutil.copytree(self.root, backup_path)
+        return [backup_path]
+
+
+def create_storage(backend=None, data_dir='data'):
+    """Instancie le moteur de stockage demandé ('parquet' par défaut si pyarrow est installé)"""
+    if backend is None:
+        backend = 'parquet' if PARQUET_AVAILABLE else 'csv'
+
+    if backend == 'parquet':
+        if not PARQUET_AVAILABLE:
+            print("⚠️ pyarrow non installé: utilisation du stockage CSV")
+            return CsvStorage(data_dir)
+        storage = ParquetStorage(data_dir)
+        storage.migrate_legacy_csv()
+        return storage
+
+    if backend == 'csv':
+        return CsvStorage(data_dir)
+
+    raise ValueError(f"Moteur de stockage inconnu: {backend}")